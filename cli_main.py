@@ -7,30 +7,48 @@
 import sys
 import os
 import argparse
+import itertools
+import threading
 import time
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from core.downloader import VideoDownloader
 from utils.logger import logger
 from core.config_manager import config_manager
 from utils.validators import URLValidator
+from utils.formatters import format_bytes, format_speed, format_duration
+from core.bandwidth import parse_rate_limit
+from core.daemon_client import DaemonClient, DaemonError, snapshot_from_dict
+
+# 注意：core.downloader 会间接导入 yt_dlp（耗时较长），只在需要下载或获取信息时
+# 于函数内部导入，保证 --version、--list-platforms、--help 等命令快速响应
+
+# 排队任务都在等待平台限流时，批量下载在途任务上限的放大倍数
+HOST_LOOKAHEAD = 8
+
+# 提交给下载守护进程时每个请求包含的URL数（不超过守护进程的 MAX_BATCH_URLS）
+DAEMON_BATCH_URLS = 1000
+
+# 只对本进程中的下载器生效的选项，指定了这些选项时不交给下载守护进程
+LOCAL_ONLY_OPTIONS = ('jobs', 'rate_limit', 'job_rate_limit', 'retries', 'fragments',
+                      'no_adaptive_fragments', 'no_cache', 'no_archive')
 
 
 def check_dependencies():
-    """检查依赖项"""
-    try:
-        import yt_dlp
-        import requests
-        logger.info("依赖项检查通过")
-        return True
-    except ImportError as e:
-        error_msg = f"缺少必要的依赖项: {e}\n\n请运行以下命令安装依赖:\npip install -r requirements.txt"
+    """检查依赖项（只查找模块，不实际导入）"""
+    import importlib.util
+
+    missing = [name for name in ('yt_dlp', 'requests') if importlib.util.find_spec(name) is None]
+    if missing:
+        error_msg = f"缺少必要的依赖项: {', '.join(missing)}\n\n请运行以下命令安装依赖:\npip install -r requirements.txt"
         logger.error(error_msg)
         print(error_msg)
         return False
 
+    logger.info("依赖项检查通过")
+    return True
+
 
 def create_directories():
     """创建必要的目录"""
@@ -53,8 +71,8 @@ def print_progress(progress):
     """打印下载进度"""
     if progress.status == 'downloading':
         percent = progress.progress if progress.progress is not None else 0
-        speed = progress.speed if progress.speed is not None else "未知"
-        eta = progress.eta if progress.eta is not None else "未知"
+        speed = format_speed(progress.speed) or "未知"
+        eta = format_duration(progress.eta) or "未知"
         
         # 清除当前行并打印进度
         sys.stdout.write("\r" + " " * 80)
@@ -62,11 +80,15 @@ def print_progress(progress):
         sys.stdout.flush()
     elif progress.status == 'completed':
         sys.stdout.write("\r" + " " * 80)
-        sys.stdout.write(f"\r✅ 下载完成: {progress.filename}\n")
+        sys.stdout.write(f"\r✅ 下载完成: {progress.title or progress.url}\n")
         sys.stdout.flush()
     elif progress.status == 'error':
         sys.stdout.write("\r" + " " * 80)
-        sys.stdout.write(f"\r❌ 下载失败: {progress.error}\n")
+        sys.stdout.write(f"\r❌ 下载失败: {progress.error_message}\n")
+        sys.stdout.flush()
+    elif progress.status == 'skipped':
+        sys.stdout.write("\r" + " " * 80)
+        sys.stdout.write(f"\r⏭️ 已下载过，跳过: {progress.title or progress.url}\n")
         sys.stdout.flush()
 
 
@@ -90,42 +112,35 @@ def download_video(url, args=None, get_info_only=False):
     if not args.quiet:
         print(f"🔍 检测到平台: {platform}")
 
+    # 下载守护进程正在运行时交给它处理，本进程不需要导入yt-dlp
+    client = attach_daemon(args)
+    if client is not None:
+        if get_info_only:
+            try:
+                return print_video_info(client.get_video_info(normalized_url))
+            except DaemonError as e:
+                print(f"❌ 获取视频信息失败: {e}")
+                return False
+        return download_via_daemon(client, [normalized_url], args)
+
     # 创建下载器
+    from core.downloader import VideoDownloader
     downloader = VideoDownloader()
+    if getattr(args, 'no_cache', False):
+        downloader.use_info_cache = False
+    apply_download_options(downloader, args)
 
     if get_info_only:
         # 仅获取视频信息
         try:
-            info = downloader.get_video_info(normalized_url)
-            if info:
-                print("\n📋 视频信息:")
-                print(f"标题: {info.get('title', '未知')}")
-                print(f"上传者: {info.get('uploader', '未知')}")
-                print(f"时长: {info.get('duration_string', '未知')}")
-                print(f"观看次数: {info.get('view_count', '未知')}")
-                print(f"上传日期: {info.get('upload_date', '未知')}")
-                
-                # 显示可用格式
-                if 'formats' in info:
-                    print("\n可用格式:")
-                    for i, fmt in enumerate(info['formats'][:5]):  # 只显示前5个格式
-                        print(f"  {i+1}. {fmt.get('format_id', '未知')} - "
-                              f"{fmt.get('ext', '未知')} - "
-                              f"{fmt.get('resolution', '未知')} - "
-                              f"{fmt.get('vcodec', '未知')}")
-                    if len(info['formats']) > 5:
-                        print(f"  ... 还有 {len(info['formats'])-5} 种格式")
-                
-                return True
-            else:
-                print("❌ 无法获取视频信息")
-                return False
+            return print_video_info(downloader.get_video_info(normalized_url))
         except Exception as e:
             logger.error(f"获取视频信息失败: {e}")
             print(f"❌ 获取视频信息失败: {e}")
             return False
     
     # 下载视频
+    download_id = None
     try:
         # 设置输出路径
         if args.output:
@@ -133,8 +148,8 @@ def download_video(url, args=None, get_info_only=False):
         else:
             download_path = config_manager.get_download_path()
         
-        # 创建下载任务
-        download_id = downloader.create_download(normalized_url, download_path)
+        # 创建下载任务并提交到调度队列
+        download_id = downloader.start_download(normalized_url, download_path)
         if not download_id:
             print("❌ 创建下载任务失败")
             return False
@@ -142,24 +157,24 @@ def download_video(url, args=None, get_info_only=False):
         print(f"✅ 创建下载任务: {download_id}")
         print(f"📂 下载路径: {download_path}")
         
-        # 开始下载
-        downloader.start_download(download_id)
-        
-        # 监控下载进度
+        # 监控下载进度（完成状态在合并、后处理和转码都结束后才出现）
         while True:
-            progress = downloader.get_progress(download_id)
+            progress = downloader.get_download_progress(download_id)
             print_progress(progress)
             
-            if progress.status in ['completed', 'error']:
+            if progress.status in ('completed', 'error', 'cancelled', 'skipped'):
                 break
             
             time.sleep(0.5)
         
-        return progress.status == 'completed'
+        return progress.status in ('completed', 'skipped')
     
     except KeyboardInterrupt:
         print("\n⚠️ 用户中断下载")
-        downloader.cancel_download(download_id)
+        if download_id:
+            downloader.cancel_download(download_id)
+        # 等待下载线程中断传输并删除临时文件
+        downloader.wait_idle(5)
         return False
     except Exception as e:
         logger.error(f"下载失败: {e}")
@@ -167,31 +182,438 @@ def download_video(url, args=None, get_info_only=False):
         return False
 
 
-def download_from_file(file_path, args=None):
-    """从文件批量下载"""
+def print_video_info(info):
+    """打印视频信息，返回是否获取成功"""
+    if not info:
+        print("❌ 无法获取视频信息")
+        return False
+    print("\n📋 视频信息:")
+    print(f"标题: {info.get('title', '未知')}")
+    print(f"上传者: {info.get('uploader', '未知')}")
+    print(f"时长: {info.get('duration_string', '未知')}")
+    print(f"观看次数: {info.get('view_count', '未知')}")
+    print(f"上传日期: {info.get('upload_date', '未知')}")
+
+    # 显示可用格式
+    if 'formats' in info:
+        print("\n可用格式:")
+        for i, fmt in enumerate(info['formats'][:5]):  # 只显示前5个格式
+            print(f"  {i+1}. {fmt.get('format_id', '未知')} - "
+                  f"{fmt.get('ext', '未知')} - "
+                  f"{fmt.get('resolution', '未知')} - "
+                  f"{fmt.get('vcodec', '未知')}")
+        if len(info['formats']) > 5:
+            print(f"  ... 还有 {len(info['formats'])-5} 种格式")
+    return True
+
+
+def iter_url_file(file_path):
+    """逐行读取URL文件（流式读取，不一次性载入内存）"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+
+class BatchStats:
+    """批量下载统计"""
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.submitted = 0
+        self.succeeded = 0
+        self.skipped = 0            # 已在下载归档中而跳过的任务
+        self.failures = []          # (url, 错误信息)
+        self.retries = 0            # 已结束任务的重试次数合计
+        self.recovered = 0          # 重试后成功的任务数
+        self.finished_bytes = 0     # 已结束任务的字节数
+        self.active_bytes = {}      # 进行中任务 -> 已下载字节数
+        self.paused = 0             # 已暂停的任务数
+        self._last_sample = (self.start_time, 0)
+        self.speed = 0.0
+
+    @property
+    def finished(self):
+        return self.succeeded + self.skipped + len(self.failures)
+
+    def track(self, download_id, url, progress):
+        """记录在途任务的最新快照，任务已结束时计入结果并返回True"""
+        if progress.status not in ('completed', 'error', 'cancelled', 'skipped'):
+            self.active_bytes[download_id] = progress.downloaded_bytes
+            return False
+        self.active_bytes.pop(download_id, None)
+        self.finished_bytes += progress.total_bytes or progress.downloaded_bytes
+        self.retries += progress.retries + progress.throttle_retries
+        if progress.status == 'completed':
+            self.succeeded += 1
+            self.recovered += bool(progress.retries or progress.throttle_retries)
+        elif progress.status == 'skipped':
+            self.skipped += 1
+        else:
+            self.failures.append((url, progress.error_message or progress.status))
+        return True
+
+    @property
+    def total_bytes(self):
+        return self.finished_bytes + sum(self.active_bytes.values())
+
+    def sample_speed(self):
+        """根据字节数增量计算聚合速度（指数平滑）"""
+        now = time.time()
+        last_time, last_bytes = self._last_sample
+        if now - last_time >= 1.0:
+            current = self.total_bytes
+            instant = max(0, current - last_bytes) / (now - last_time)
+            self.speed = instant if self.speed == 0 else 0.3 * instant + 0.7 * self.speed
+            self._last_sample = (now, current)
+        return self.speed
+
+
+def print_batch_progress(stats, downloader):
+    """打印一行聚合进度"""
+    queue = downloader.get_queue_stats()
+    schedule = f"时段 {queue['schedule']} | " if queue.get('schedule') else ""
+    backoff = [f"{key} {host['blocked_for']:.0f}s" for key, host in queue.get('hosts', {}).items()
+               if host['blocked_for'] > 0]
+    if backoff:
+        schedule += f"限流退避 {', '.join(backoff)} | "
+    line = (f"📦 [{stats.finished}/{stats.submitted}] {schedule}"
+            f"成功 {stats.succeeded} | 跳过 {stats.skipped} | 失败 {len(stats.failures)} | "
+            f"下载中 {queue['active']}/{queue['max_concurrent']} | 排队 {queue['queued']} | "
+            f"{f'暂停 {stats.paused} | ' if stats.paused else ''}转码 {queue['converting']} | "
+            f"速度 {format_speed(stats.sample_speed()) or '0 B/s'}"
+            f"{f' (限速 {format_speed(downloader.bandwidth.rate_limit)})' if downloader.bandwidth.rate_limit else ''} | "
+            f"已下载 {format_bytes(stats.total_bytes)}")
+    sys.stdout.write("\r" + line.ljust(100))
+    sys.stdout.flush()
+
+
+def print_batch_summary(stats):
+    """打印批量下载汇总"""
+    elapsed = max(time.time() - stats.start_time, 0.001)
+    print(f"\n📊 批量下载完成: {stats.succeeded}/{stats.submitted} 成功，"
+          f"{stats.skipped} 已下载过（跳过），{len(stats.failures)} 失败")
+    print(f"⏱️ 总耗时: {format_duration(elapsed)} | "
+          f"总数据量: {format_bytes(stats.total_bytes)} | "
+          f"平均吞吐: {format_speed(stats.total_bytes / elapsed) or '0 B/s'} | "
+          f"{stats.finished / elapsed * 60:.1f} 个/分钟")
+    if stats.retries:
+        print(f"🔁 重试 {stats.retries} 次，{stats.recovered} 个任务重试后下载成功")
+    if stats.failures:
+        print("❌ 失败列表:")
+        for url, error in stats.failures[:20]:
+            print(f"  {url} - {error}")
+        if len(stats.failures) > 20:
+            print(f"  ... 还有 {len(stats.failures) - 20} 个失败，详见日志")
+        for url, error in stats.failures:
+            logger.error(f"批量下载失败: {url} - {error}")
+
+
+def start_batch_console(downloader, jobs):
+    """
+    批量下载时在后台线程读取标准输入的任务控制命令（只在交互终端中启用）
+
+        p 序号   暂停任务（保留已下载的部分，腾出槽位给其他任务）
+        r 序号   继续已暂停的任务
+        l        列出未结束的任务及序号
+
+    序号可以写多个（空格分隔），写 all 表示全部任务
+
+    Args:
+        downloader: 共享的下载器
+        jobs: 按提交顺序排列的下载ID列表（序号从1开始，批量下载过程中持续追加）
+    """
+    if not sys.stdin or not sys.stdin.isatty():
+        return
+
+    def select(args):
+        if 'all' in args:
+            return list(jobs)
+        return [jobs[int(arg) - 1] for arg in args if arg.isdigit() and 0 < int(arg) <= len(jobs)]
+
+    def run():
+        for line in sys.stdin:
+            command, *args = line.split() or ['']
+            if command == 'p':
+                count = sum(downloader.pause_download(download_id) for download_id in select(args))
+                print(f"\n⏸️ 已暂停 {count} 个任务")
+            elif command == 'r':
+                count = sum(downloader.resume_download(download_id) for download_id in select(args))
+                print(f"\n▶️ 已继续 {count} 个任务")
+            elif command == 'l':
+                print()
+                job_ids = list(jobs)
+                snapshots = downloader.get_all_downloads(job_ids)
+                for number, download_id in enumerate(job_ids, 1):
+                    progress = snapshots.get(download_id)
+                    if progress and progress.status in ('waiting', 'downloading', 'paused', 'converting'):
+                        print(f"  {number:>4}. [{progress.status}] {progress.progress:5.1f}% "
+                              f"{progress.title or progress.url}")
+            elif command:
+                print("\n命令: p 序号 暂停 | r 序号 继续 | l 列出任务（序号可写 all）")
+
+    threading.Thread(target=run, daemon=True, name="batch-console").start()
+    print("💡 输入 p 序号 暂停、r 序号 继续、l 列出任务（序号可写 all）")
+
+
+def create_batch_downloader(args):
+    """创建批量模式共用的下载器"""
+    from core.downloader import VideoDownloader
+
+    jobs = getattr(args, 'jobs', None) or config_manager.get_max_concurrent_downloads()
+    downloader = VideoDownloader(max_concurrent=jobs)
+    if getattr(args, 'no_cache', False):
+        downloader.use_info_cache = False
+    if getattr(args, 'no_archive', False):
+        downloader.use_archive = False
+    apply_download_options(downloader, args)
+    return downloader
+
+
+def apply_download_options(downloader, args):
+    """应用命令行的限速、重试和分片并发选项（只影响本次运行，不写入配置文件）"""
+    if getattr(args, 'retries', None) is not None:
+        downloader.retry_policy.attempts = max(0, args.retries)
+    if getattr(args, 'rate_limit', None) is not None:
+        downloader.set_rate_limit(args.rate_limit)
+    if getattr(args, 'job_rate_limit', None) is not None:
+        downloader.bandwidth.set_default_job_rate_limit(args.job_rate_limit)
+    fragments = getattr(args, 'fragments', None)
+    if fragments:
+        downloader.fragment_concurrency = max(1, fragments)
+        downloader.fragment_concurrency_max = max(downloader.fragment_concurrency_max, fragments)
+    if getattr(args, 'no_adaptive_fragments', False):
+        downloader.adaptive_fragments = False
+
+
+def run_batch(downloader, submissions, quiet=False):
+    """
+    运行批量下载并显示聚合进度
+
+    Args:
+        downloader: 共享的下载器
+        submissions: 迭代器，每次迭代提交一个任务并产出 (download_id, url)，
+                     download_id为None表示提交失败；按需迭代以限制在途任务数
+        quiet: 是否隐藏进度行
+
+    Returns:
+        是否全部成功
+    """
+    stats = BatchStats()
+    pending = {}                              # download_id -> url
+    jobs = []                                 # 按提交顺序排列的下载ID，作为暂停/继续命令的序号
+    exhausted = False
+    if not quiet:
+        start_batch_console(downloader, jobs)
+
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        while True:
+            # 补充队列（在途任务上限随时间段规则调整的并发数变化）；
+            # 有空闲槽位但排队的任务都在等待平台限流时，多读入一些URL，让其他平台的任务先开始
+            scheduler = downloader.scheduler
+            window = scheduler.max_workers * 4
+            if scheduler.queue_depth and scheduler.active_count < scheduler.max_workers:
+                window *= HOST_LOOKAHEAD
+            while not exhausted and len(pending) < window:
+                item = next(submissions, None)
+                if item is None:
+                    exhausted = True
+                    break
+                download_id, url = item
+                stats.submitted += 1
+                if download_id and downloader.get_download_progress(download_id).status == 'skipped':
+                    # 归档命中在提交时即已确定，不占用在途名额
+                    stats.skipped += 1
+                elif download_id:
+                    pending[download_id] = url
+                    jobs.append(download_id)
+                else:
+                    stats.failures.append((url, "URL无效"))
 
-        if not urls:
-            print("❌ 文件中没有找到有效的URL")
-            return False
+            # 收集已结束的任务（一次取出所有在途任务的快照）
+            snapshots = downloader.get_all_downloads(pending)
+            for download_id, progress in snapshots.items():
+                if stats.track(download_id, pending[download_id], progress):
+                    del pending[download_id]
+            stats.paused = sum(1 for download_id in pending if snapshots[download_id].status == 'paused')
+
+            if exhausted and not pending:
+                break
+
+            # settings.ini 被修改后重新应用限速，无需重启正在进行的下载
+            if config_manager.reload_if_changed():
+                downloader.apply_bandwidth_config()
+                if not quiet:
+                    print(f"\n⚙️ 配置已更新，当前限速: {downloader.bandwidth.describe()}，"
+                          f"并发数: {downloader.scheduler.max_workers}")
+
+            if not quiet:
+                print_batch_progress(stats, downloader)
+            time.sleep(0.5)
+
+    except KeyboardInterrupt:
+        # 任务状态已写入任务日志，.part 文件保留，下次可用 --resume 续传
+        print("\n⚠️ 用户中断批量下载，未完成的任务已记录，可使用 --resume 继续")
+        for url in pending.values():
+            stats.failures.append((url, "已中断"))
+        print_batch_summary(stats)
+        return False
+
+    print_batch_summary(stats)
+    return not stats.failures
+
+
+def attach_daemon(args):
+    """
+    下载守护进程正在运行时返回它的客户端，否则返回None（在本进程中下载）
+
+    指定了 --no-daemon 或只对本进程生效的选项（并发数、限速、重试等）时不连接守护进程
+    """
+    if getattr(args, 'no_daemon', False):
+        return None
+    if any(getattr(args, option, None) not in (None, False) for option in LOCAL_ONLY_OPTIONS):
+        return None
+    return DaemonClient.connect(config_manager)
 
-        print(f"📋 找到 {len(urls)} 个URL，开始批量下载...")
 
-        success_count = 0
-        for i, url in enumerate(urls, 1):
-            if not args.quiet:
-                print(f"\n[{i}/{len(urls)}] 下载: {url}")
-            if download_video(url, args):
-                success_count += 1
+def download_via_daemon(client, urls, args):
+    """
+    把下载任务交给下载守护进程，跟随其进度事件显示聚合进度直到所有任务结束
+
+    Ctrl+C 只断开本进程，任务在守护进程中继续下载
+
+    Args:
+        client: 守护进程客户端
+        urls: URL迭代器（分批提交）
+        args: 命令行参数
+
+    Returns:
+        是否全部成功
+    """
+    download_path = getattr(args, 'output', None) or config_manager.get_download_path()
+    quiet = getattr(args, 'quiet', False)
+    stats = BatchStats()
+    pending = {}                              # download_id -> url
+    urls = iter(urls)
+    try:
+        # 先订阅事件再提交任务，很快结束（如归档命中）的任务也不会漏掉
+        events = client.events(initial=False)
+        while True:
+            chunk = list(itertools.islice(urls, DAEMON_BATCH_URLS))
+            if not chunk:
+                break
+            for url, download_id in zip(chunk, client.start_downloads(chunk, download_path)):
+                stats.submitted += 1
+                if download_id:
+                    pending[download_id] = url
+                else:
+                    stats.failures.append((url, "URL无效"))
+        print(f"📡 已提交 {stats.submitted} 个任务到下载守护进程 {client.base_url}")
+
+        downloading = {}                      # download_id -> 速度（下载中的任务）
+        printed = 0.0
+        if not pending:
+            events.close()
+            events = ()
+        for event, data in events:
+            download_id = data.get('download_id')
+            if event != 'progress' or download_id not in pending:
+                continue
+            snapshot = snapshot_from_dict(data)
+            if stats.track(download_id, pending[download_id], snapshot):
+                del pending[download_id]
+                downloading.pop(download_id, None)
+                if not pending:
+                    break
             else:
-                if not args.quiet:
-                    print(f"❌ 第 {i} 个视频下载失败")
+                if snapshot.status == 'downloading':
+                    downloading[download_id] = snapshot.speed
+                else:
+                    downloading.pop(download_id, None)
+            if not quiet and time.monotonic() - printed >= 0.5:
+                printed = time.monotonic()
+                line = (f"📦 [{stats.finished}/{stats.submitted}] "
+                        f"成功 {stats.succeeded} | 跳过 {stats.skipped} | 失败 {len(stats.failures)} | "
+                        f"下载中 {len(downloading)} | "
+                        f"速度 {format_speed(sum(downloading.values())) or '0 B/s'} | "
+                        f"已下载 {format_bytes(stats.total_bytes)}")
+                sys.stdout.write("\r" + line.ljust(100))
+                sys.stdout.flush()
+    except DaemonError as e:
+        print(f"\n❌ 下载守护进程出错: {e}")
+        for url in pending.values():
+            stats.failures.append((url, "守护进程不可用"))
+        print_batch_summary(stats)
+        return False
+    except KeyboardInterrupt:
+        print(f"\n⚠️ 已断开，{len(pending)} 个未结束的任务仍在下载守护进程中继续")
+        return False
+
+    print_batch_summary(stats)
+    return not stats.failures
+
+
+def run_daemon(args):
+    """在前台运行下载守护进程，Ctrl+C 停止"""
+    from core.daemon import DownloadDaemon
+
+    client = DaemonClient.from_config(config_manager)
+    if client.is_running():
+        print(f"✅ 下载守护进程已在运行: {client.base_url}")
+        return True
+
+    downloader = create_batch_downloader(args)
+    daemon = DownloadDaemon.from_config(config_manager, downloader)
+    try:
+        daemon.start()
+    except OSError as e:
+        print(f"❌ 无法启动下载守护进程: {e}")
+        return False
+    print(f"🛰️ 下载守护进程已启动: {daemon.address}（并发数: {downloader.scheduler.max_workers}），"
+          f"按 Ctrl+C 停止")
+
+    if config_manager.getboolean('DAEMON', 'resume_on_start', True):
+        resumed = downloader.resume_unfinished()
+        if resumed:
+            print(f"🔁 恢复 {len(resumed)} 个未完成的下载任务")
+
+    try:
+        while not daemon.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        print("\n⚠️ 正在停止下载守护进程，未完成的任务已记录，下次启动时继续")
+    daemon.stop()
+    # 不取消任务：任务日志中的状态和 .part 文件保留，下次启动时续传
+    downloader.shutdown(wait=5)
+    return True
+
+
+def stop_daemon():
+    """请求正在运行的下载守护进程退出"""
+    client = DaemonClient.from_config(config_manager)
+    if not client.is_running():
+        print("ℹ️ 下载守护进程没有运行")
+        return True
+    try:
+        client.shutdown()
+    except DaemonError as e:
+        print(f"❌ 停止下载守护进程失败: {e}")
+        return False
+    print("✅ 已请求下载守护进程退出")
+    return True
+
 
-        print(f"\n📊 批量下载完成: {success_count}/{len(urls)} 成功")
-        return success_count == len(urls)
+def download_from_file(file_path, args=None):
+    """从文件批量下载（共享一个下载器，N个任务并发执行）"""
+    download_path = getattr(args, 'output', None) or config_manager.get_download_path()
 
+    try:
+        url_iter = iter_url_file(file_path)
+        first_url = next(url_iter, None)
+        if first_url is None:
+            print("❌ 文件中没有找到有效的URL")
+            return False
     except FileNotFoundError:
         print(f"❌ 文件不存在: {file_path}")
         return False
@@ -199,6 +621,45 @@ def download_from_file(file_path, args=None):
         print(f"❌ 读取文件失败: {e}")
         return False
 
+    client = attach_daemon(args)
+    if client is not None:
+        print(f"📋 开始批量下载: {file_path}（由下载守护进程执行）")
+        return download_via_daemon(client, itertools.chain([first_url], url_iter), args)
+
+    downloader = create_batch_downloader(args)
+    print(f"📋 开始批量下载: {file_path}（并发数: {downloader.scheduler.max_workers}）")
+
+    submissions = ((downloader.start_download(url, download_path), url)
+                   for url in itertools.chain([first_url], url_iter))
+    return run_batch(downloader, submissions, getattr(args, 'quiet', False))
+
+
+def resume_downloads(args=None):
+    """恢复任务日志中未完成的下载"""
+    if attach_daemon(args) is not None:
+        # 任务日志和 .part 文件由守护进程管理，两个进程同时续传会互相覆盖
+        print("ℹ️ 下载守护进程正在运行，未完成的任务由它在启动时恢复")
+        return True
+
+    downloader = create_batch_downloader(args)
+    resumed = downloader.resume_unfinished()
+    if not resumed:
+        print("✅ 没有需要恢复的下载任务")
+        return True
+
+    print(f"🔁 恢复 {len(resumed)} 个未完成的下载任务（并发数: {downloader.scheduler.max_workers}）")
+    submissions = ((download_id, downloader.get_download_progress(download_id).url)
+                   for download_id in resumed)
+    return run_batch(downloader, submissions, getattr(args, 'quiet', False))
+
+
+def rate_limit_arg(text):
+    """argparse类型：速度上限，返回字节/秒"""
+    try:
+        return parse_rate_limit(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
 
 def parse_arguments():
     """解析命令行参数"""
@@ -230,6 +691,10 @@ def parse_arguments():
                        help='视频质量: best, 1080p, 720p, 480p, worst (默认: best)')
     parser.add_argument('-4', '--file', metavar='FILE',
                        help='从文件批量下载URL列表')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N',
+                       help='批量下载的并发任务数 (默认: 配置中的最大并发数)')
+    parser.add_argument('--resume', action='store_true',
+                       help='恢复上次中断的下载任务（续传 .part 文件）')
 
     # 格式选项 (数字5-8)
     parser.add_argument('-5', '--audio-only', action='store_true',
@@ -254,12 +719,36 @@ def parse_arguments():
                        help='不下载元数据')
     parser.add_argument('--proxy', metavar='URL',
                        help='使用代理服务器 (如: http://proxy:port)')
-    parser.add_argument('--rate-limit', metavar='RATE',
-                       help='限制下载速度 (如: 1M, 500K)')
-    parser.add_argument('--retries', type=int, metavar='N', default=3,
-                       help='重试次数 (默认: 3)')
+    parser.add_argument('--rate-limit', metavar='RATE', type=rate_limit_arg,
+                       help='所有下载共享的速度上限 (如: 1M, 500K，纯数字单位为KB/s，0表示不限速)')
+    parser.add_argument('--job-rate-limit', metavar='RATE', type=rate_limit_arg,
+                       help='每个下载任务的速度上限 (格式同 --rate-limit)')
+    parser.add_argument('--retries', type=int, metavar='N',
+                       help='下载失败后的重试次数，网络错误按指数退避重试 (默认: 配置中的重试次数)')
+    parser.add_argument('--fragments', type=int, metavar='N',
+                       help='HLS/DASH同时下载的分片数，自适应时为初始值 (默认: 配置中的分片并发数)')
+    parser.add_argument('--no-adaptive-fragments', action='store_true',
+                       help='固定分片并发数，不根据吞吐量和服务器错误自动调整')
     parser.add_argument('--list-formats', metavar='URL',
                        help='列出指定URL的所有可用格式')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='不使用视频信息缓存，强制重新获取')
+    parser.add_argument('--purge-cache', action='store_true',
+                       help='清空视频信息缓存')
+    parser.add_argument('--no-archive', action='store_true',
+                       help='忽略下载归档，重新下载已下载过的视频')
+    parser.add_argument('--rebuild-archive', metavar='DIR', nargs='?', const='',
+                       help='从下载目录中的 metadata/*.info.json 重建下载归档 (默认: 下载目录)')
+    parser.add_argument('--import-archive', metavar='FILE',
+                       help='导入yt-dlp格式的下载归档文件')
+    parser.add_argument('--export-archive', metavar='FILE',
+                       help='导出为yt-dlp格式的下载归档文件 (可用于 yt-dlp --download-archive)')
+    parser.add_argument('--daemon', action='store_true',
+                       help='在前台运行下载守护进程，其他命令行调用和GUI自动连接它')
+    parser.add_argument('--daemon-stop', action='store_true',
+                       help='停止正在运行的下载守护进程')
+    parser.add_argument('--no-daemon', action='store_true',
+                       help='不连接下载守护进程，在本进程中下载')
     parser.add_argument('--version', action='store_true',
                        help='显示版本信息')
     parser.add_argument('--verbose', action='store_true',
@@ -306,10 +795,43 @@ def main():
             print(f"\n📊 总计支持 1700+ 网站")
             return 0
 
+        # 清空视频信息缓存
+        if args.purge_cache:
+            from core.info_cache import InfoCache
+            count = InfoCache.from_config(config_manager).purge()
+            print(f"🧹 已清空视频信息缓存: {count} 条")
+            if not (args.url or args.file or args.list_formats):
+                return 0
+
+        # 下载归档维护
+        if args.rebuild_archive is not None or args.import_archive or args.export_archive:
+            from core.download_archive import DownloadArchive
+            archive = DownloadArchive.from_config(config_manager)
+            try:
+                if args.rebuild_archive is not None:
+                    root = args.rebuild_archive or args.output or config_manager.get_download_path()
+                    count = archive.rebuild_from_metadata(root)
+                    print(f"🗂️ 已从 {root} 的元数据重建下载归档: {count} 条")
+                if args.import_archive:
+                    count = archive.import_text(args.import_archive)
+                    print(f"📥 已导入下载归档: {count} 条")
+                if args.export_archive:
+                    count = archive.export_text(args.export_archive)
+                    print(f"📤 已导出下载归档: {count} 条 -> {args.export_archive}")
+            except OSError as e:
+                print(f"❌ 下载归档操作失败: {e}")
+                return 1
+            print(f"📊 下载归档共 {archive.count()} 条记录")
+            if not (args.url or args.file or args.list_formats):
+                return 0
+
         # 列出指定URL的格式
         if args.list_formats:
             try:
+                from core.downloader import VideoDownloader
                 downloader = VideoDownloader()
+                if args.no_cache:
+                    downloader.use_info_cache = False
                 info = downloader.get_video_info(args.list_formats)
                 if info and 'formats' in info:
                     print(f"📋 可用格式 - {info.get('title', '未知标题')}")
@@ -332,11 +854,24 @@ def main():
                 return 1
             return 0
         
+        if args.daemon_stop:
+            return 0 if stop_daemon() else 1
+
         if not check_dependencies():
             return 1
         
         create_directories()
+
+        # 运行下载守护进程
+        if args.daemon:
+            return 0 if run_daemon(args) else 1
         
+        # 恢复未完成的任务
+        if args.resume:
+            success = resume_downloads(args)
+            if not args.file:
+                return 0 if success else 1
+
         # 批量下载
         if args.file:
             success = download_from_file(args.file, args)
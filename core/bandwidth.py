@@ -0,0 +1,196 @@
+"""
+带宽管理模块
+令牌桶限速：全局上限由所有并发下载共享，每个任务还可以单独设置上限。
+下载线程按实际读取的字节数申请令牌，令牌不足时在该线程内等待，
+读取变慢后由TCP背压降低实际下载速度。限速值可在运行时修改，立即对进行中的下载生效
+"""
+import re
+import time
+import threading
+from typing import Any, Dict, Optional
+
+from utils.formatters import format_speed
+
+
+# 令牌桶容量（秒）：允许的瞬时突发量 = 速度上限 x 该时长
+BURST_SECONDS = 1.0
+
+# 等待令牌时的最长单次等待（秒），便于及时响应限速修改和任务结束
+MAX_WAIT_SLICE = 0.25
+
+_RATE_UNITS = {'': 1024, 'B': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_rate_limit(text) -> int:
+    """
+    解析速度上限，返回字节/秒（0表示不限速）
+
+    支持 "500K"、"1.5M"、"2MB/s" 等写法；不带单位的纯数字按KB/s处理，与设置界面一致
+
+    Raises:
+        ValueError: 格式无效或为负数
+    """
+    text = str(text or '').strip().upper().replace(' ', '')
+    if text in ('', '0'):
+        return 0
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([BKMG]?)(?:I?B)?(?:/S)?', text)
+    if not match:
+        raise ValueError(f"无效的速度限制: {text}")
+    return int(float(match.group(1)) * _RATE_UNITS[match.group(2)])
+
+
+class TokenBucket:
+    """令牌桶（rate为0表示不限速；由BandwidthManager加锁访问）"""
+
+    def __init__(self, rate: int = 0):
+        self.rate = 0
+        self.tokens = 0.0
+        self.last = time.monotonic()
+        self.set_rate(rate)
+
+    @property
+    def capacity(self) -> float:
+        return self.rate * BURST_SECONDS
+
+    def set_rate(self, rate: int):
+        """修改速度上限，已累积的欠账一并清零"""
+        self.rate = max(0, int(rate or 0))
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+
+    def reserve(self, nbytes: int) -> float:
+        """
+        预支nbytes个令牌，返回需要等待的秒数（令牌允许透支，等待期间补回）
+        """
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        self.tokens -= nbytes
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class BandwidthManager:
+    """全局 + 单任务带宽管理器（线程安全）"""
+
+    def __init__(self, rate_limit: int = 0, job_rate_limit: int = 0):
+        """
+        Args:
+            rate_limit: 全局速度上限（字节/秒），0表示不限速
+            job_rate_limit: 每个任务默认的速度上限（字节/秒），0表示不限速
+        """
+        self._cond = threading.Condition()
+        self._global = TokenBucket(rate_limit)
+        self._default_job_rate = max(0, int(job_rate_limit or 0))
+        self._jobs: Dict[str, TokenBucket] = {}
+        self._job_overrides: Dict[str, int] = {}   # 单独设置过上限的任务
+        self._generation = 0                       # 每次修改限速时递增，唤醒正在等待的线程
+        self.throttled_time = 0.0                  # 累计等待时长（秒）
+
+    @property
+    def rate_limit(self) -> int:
+        return self._global.rate
+
+    @property
+    def job_rate_limit(self) -> int:
+        return self._default_job_rate
+
+    def _changed(self):
+        """限速已修改（需持有锁）"""
+        self._generation += 1
+        self._cond.notify_all()
+
+    def set_rate_limit(self, rate: int):
+        """修改全局速度上限（字节/秒，0表示不限速）"""
+        with self._cond:
+            self._global.set_rate(rate)
+            self._changed()
+
+    def set_default_job_rate_limit(self, rate: int):
+        """修改每个任务默认的速度上限（不影响单独设置过上限的任务）"""
+        with self._cond:
+            self._default_job_rate = max(0, int(rate or 0))
+            for job_id, bucket in self._jobs.items():
+                if job_id not in self._job_overrides:
+                    bucket.set_rate(self._default_job_rate)
+            self._changed()
+
+    def set_job_rate_limit(self, job_id: str, rate: Optional[int]):
+        """
+        单独设置任务的速度上限
+
+        Args:
+            job_id: 任务ID
+            rate: 字节/秒，0表示该任务不限速，None表示恢复默认值
+        """
+        with self._cond:
+            if rate is None:
+                self._job_overrides.pop(job_id, None)
+                rate = self._default_job_rate
+            else:
+                self._job_overrides[job_id] = max(0, int(rate))
+            bucket = self._jobs.get(job_id)
+            if bucket is None:
+                self._jobs[job_id] = TokenBucket(rate)
+            else:
+                bucket.set_rate(rate)
+            self._changed()
+
+    def get_job_rate_limit(self, job_id: str) -> int:
+        with self._cond:
+            return self._job_overrides.get(job_id, self._default_job_rate)
+
+    def release_bucket(self, job_id: str):
+        """下载线程退出（暂停、重新排队）时释放任务的令牌桶，保留单独设置的上限"""
+        with self._cond:
+            self._jobs.pop(job_id, None)
+            self._changed()
+
+    def forget_job(self, job_id: str):
+        """任务结束（完成、失败、取消）后释放令牌桶并清除单独设置的上限"""
+        with self._cond:
+            self._jobs.pop(job_id, None)
+            self._job_overrides.pop(job_id, None)
+            self._changed()
+
+    def consume(self, job_id: str, nbytes: int):
+        """
+        下载线程读取nbytes字节后调用，超出全局或任务上限时阻塞等待
+
+        限速被修改或任务被移除时立即停止等待（按新的上限重新计算）
+        """
+        if nbytes <= 0:
+            return
+        with self._cond:
+            bucket = self._jobs.get(job_id)
+            if bucket is None:
+                bucket = self._jobs[job_id] = TokenBucket(self._job_overrides.get(job_id, self._default_job_rate))
+            wait = max(self._global.reserve(nbytes), bucket.reserve(nbytes))
+            if wait <= 0:
+                return
+            generation = self._generation
+            deadline = time.monotonic() + wait
+            start = time.monotonic()
+            while generation == self._generation:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(min(remaining, MAX_WAIT_SLICE))
+            self.throttled_time += time.monotonic() - start
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'rate_limit': self._global.rate,
+                'job_rate_limit': self._default_job_rate,
+                'jobs': len(self._jobs),
+                'throttled_time': self.throttled_time,
+            }
+
+    def describe(self) -> str:
+        """当前限速的可读描述"""
+        parts = [f"全局 {format_speed(self.rate_limit) or '不限速'}"]
+        if self.job_rate_limit:
+            parts.append(f"单任务 {format_speed(self.job_rate_limit)}")
+        return "，".join(parts)
@@ -0,0 +1,73 @@
+"""
+任务取消模块
+每个正在执行的下载任务持有一个取消令牌：取消时令牌被置位，下载线程在下一次进度回调
+（或带宽令牌申请）时抛出 JobCancelled 中断yt-dlp，随后清理未完成的临时文件并释放下载槽位
+"""
+import os
+import glob
+import threading
+from typing import Iterable
+
+from utils.logger import logger
+
+
+# 分段下载的状态文件后缀（同 core.segmented.STATE_SUFFIX，该模块依赖yt-dlp，不在此处导入）
+SEGMENT_STATE_SUFFIX = '.segments'
+
+
+class JobCancelled(Exception):
+    """任务已被取消（从进度回调中抛出，用于中断正在进行的传输）"""
+
+
+class CancelToken:
+    """单个任务的取消令牌（线程安全）"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """请求取消"""
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        """
+        已请求取消时抛出异常
+
+        Raises:
+            JobCancelled: 任务已被取消
+        """
+        if self._event.is_set():
+            raise JobCancelled("下载已取消")
+
+
+def remove_partial_files(tmpfilenames: Iterable[str]) -> int:
+    """
+    删除被取消任务留下的临时文件
+
+    包括 .part 文件本身、分段下载的状态文件（.segments）、分片下载的
+    状态文件（.ytdl）和尚未合并的分片文件（-Frag*）
+
+    Args:
+        tmpfilenames: 下载过程中出现过的临时文件名
+
+    Returns:
+        删除的文件数
+    """
+    removed = 0
+    for tmpfilename in set(filter(None, tmpfilenames)):
+        final = tmpfilename[:-len('.part')] if tmpfilename.endswith('.part') else tmpfilename
+        candidates = [tmpfilename, tmpfilename + SEGMENT_STATE_SUFFIX, final + '.ytdl',
+                      *glob.glob(glob.escape(tmpfilename) + '-Frag*')]
+        for path in candidates:
+            if path == final or not os.path.isfile(path):
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError as e:
+                logger.warning(f"删除临时文件失败 {path}: {e}")
+    return removed
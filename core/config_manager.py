@@ -9,10 +9,15 @@ from utils.logger import logger
 
 class ConfigManager:
     """配置管理器"""
+
+    # [HOSTS] 的固定选项，其余条目为按平台的覆盖设置
+    HOSTS_OPTIONS = ('per_host_concurrency', 'request_interval', 'backoff_base',
+                     'backoff_max', 'throttle_retries')
     
     def __init__(self, config_file="config/settings.ini"):
         self.config_file = config_file
         self.config = configparser.ConfigParser()
+        self._mtime = None  # 最近一次读取或写入时配置文件的修改时间
         self._load_default_config()
         self._load_config()
     
@@ -45,7 +50,59 @@ class ConfigManager:
             'proxy': '',
             'cookies_file': '',
             'rate_limit': '0',
-            'extract_flat': 'False'
+            'extract_flat': 'False',
+            'job_rate_limit': '0',
+            'segmented_download': 'False',
+            'segment_count': '4',
+            'fragment_concurrency': '4',
+            'fragment_concurrency_max': '16',
+            'adaptive_fragments': 'True',
+            'retry_base_delay': '2',
+            'retry_max_delay': '60',
+            'progress_interval': '0.5',
+            'speed_smoothing': '0.3'
+        }
+
+        self.config['CACHE'] = {
+            'info_cache_enabled': 'True',
+            'info_cache_ttl': '3600',
+            'info_cache_max_entries': '500',
+            'info_cache_max_size_mb': '100',
+            'download_reuse_max_age': '600'
+        }
+
+        self.config['CONVERT'] = {
+            'encoder': 'auto',
+            'preset': 'medium',
+            'threads': '0',
+            'workers': '0'
+        }
+
+        self.config['ARCHIVE'] = {
+            'enabled': 'True'
+        }
+
+        # 按平台限流（平台名 = 并发上限, 启动间隔 的条目覆盖默认值），见 core/host_limits.py
+        self.config['HOSTS'] = {
+            'per_host_concurrency': '2',
+            'request_interval': '1.0',
+            'backoff_base': '30',
+            'backoff_max': '600',
+            'throttle_retries': '3'
+        }
+
+        # 时间段规则（名称 = 开始-结束, 并发任务数, 速度上限），见 core/time_schedule.py
+        self.config['SCHEDULE'] = {
+            'enabled': 'False'
+        }
+
+        # 下载守护进程（所有前端共用一个下载队列），见 core/daemon.py
+        self.config['DAEMON'] = {
+            'host': '127.0.0.1',
+            'port': '8765',
+            'token': '',
+            'attach': 'True',
+            'resume_on_start': 'True'
         }
     
     def _load_config(self):
@@ -53,6 +110,7 @@ class ConfigManager:
         try:
             if os.path.exists(self.config_file):
                 self.config.read(self.config_file, encoding='utf-8')
+                self._mtime = self._file_mtime()
                 logger.info(f"配置文件加载成功: {self.config_file}")
             else:
                 self._save_config()
@@ -70,6 +128,7 @@ class ConfigManager:
             
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 self.config.write(f)
+            self._mtime = self._file_mtime()
             logger.info("配置文件保存成功")
         except Exception as e:
             logger.error(f"保存配置文件失败: {e}")
@@ -78,6 +137,20 @@ class ConfigManager:
         """公开的保存配置方法"""
         self._save_config()
 
+    def _file_mtime(self):
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload_if_changed(self) -> bool:
+        """配置文件被外部修改过时重新读取，返回是否重新读取了"""
+        mtime = self._file_mtime()
+        if mtime is None or mtime == self._mtime:
+            return False
+        self._load_config()
+        return True
+
     def get(self, section, key, fallback=None):
         """获取配置值"""
         try:
@@ -92,6 +165,13 @@ class ConfigManager:
         except Exception:
             return fallback
     
+    def getfloat(self, section, key, fallback=0.0):
+        """获取浮点数配置值"""
+        try:
+            return self.config.getfloat(section, key, fallback=fallback)
+        except Exception:
+            return fallback
+    
     def getboolean(self, section, key, fallback=False):
         """获取布尔配置值"""
         try:
@@ -137,6 +217,22 @@ class ConfigManager:
         """获取重试次数"""
         return self.getint('DEFAULT', 'retry_attempts', 3)
 
+    def _extra_items(self, section, known):
+        """获取节中除固定选项外的自定义条目，返回 [(名称, 值)]（按书写顺序）"""
+        if not self.config.has_section(section):
+            return []
+        defaults = self.config.defaults()
+        return [(name, value) for name, value in self.config.items(section)
+                if name not in known and name not in defaults]
+
+    def get_schedule_rules(self):
+        """获取 [SCHEDULE] 中的时间段规则，返回 [(名称, 规则文本)]（按书写顺序）"""
+        return self._extra_items('SCHEDULE', ('enabled',))
+
+    def get_host_overrides(self):
+        """获取 [HOSTS] 中按平台的限流设置，返回 [(平台, "并发上限, 启动间隔")]"""
+        return self._extra_items('HOSTS', self.HOSTS_OPTIONS)
+
 
 # 创建全局配置管理器实例
 config_manager = ConfigManager()
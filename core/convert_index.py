@@ -0,0 +1,141 @@
+"""
+转换索引模块
+按 路径 + 大小 + 修改时间 记录每个文件的探测结果和转换结果（SQLite，保存在媒体库目录下），
+批量转换重复运行时只需探测新增或修改过的文件
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from utils.logger import logger
+
+
+# 索引文件名（保存在媒体库根目录）
+INDEX_FILENAME = '.convert_index.sqlite3'
+
+
+class ConvertIndex:
+    """转换索引"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开数据库连接（需持有锁）"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    probe TEXT,
+                    action TEXT,
+                    reason TEXT,
+                    status TEXT,
+                    output TEXT,
+                    error TEXT,
+                    elapsed REAL,
+                    updated REAL NOT NULL
+                )
+            ''')
+            self._conn.commit()
+        return self._conn
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """一次性读取全部记录：路径 -> 记录（probe已解析为字典）"""
+        try:
+            with self._lock:
+                rows = self._connect().execute('SELECT * FROM files').fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"读取转换索引失败: {e}")
+            return {}
+        records = {}
+        for row in rows:
+            record = dict(row)
+            try:
+                record['probe'] = json.loads(record['probe']) if record['probe'] else None
+            except ValueError:
+                record['probe'] = None
+            records[record['path']] = record
+        return records
+
+    @staticmethod
+    def matches(record: Optional[Dict[str, Any]], size: int, mtime_ns: int) -> bool:
+        """记录是否对应当前文件（大小和修改时间都未变化）"""
+        return record is not None and record['size'] == size and record['mtime_ns'] == mtime_ns
+
+    def put_probes(self, items: Iterable[Dict[str, Any]]):
+        """
+        批量写入探测结果（文件已变化时清空旧的转换结果）
+
+        Args:
+            items: 字典序列，包含 path, size, mtime_ns, probe, action, reason
+        """
+        now = time.time()
+        rows = [(item['path'], item['size'], item['mtime_ns'],
+                 json.dumps(item['probe'], ensure_ascii=False) if item.get('probe') else None,
+                 item.get('action'), item.get('reason'), now)
+                for item in items]
+        if not rows:
+            return
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.executemany('''
+                    INSERT INTO files (path, size, mtime_ns, probe, action, reason, updated)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(path) DO UPDATE SET
+                        size = excluded.size, mtime_ns = excluded.mtime_ns, probe = excluded.probe,
+                        action = excluded.action, reason = excluded.reason, updated = excluded.updated,
+                        status = NULL, output = NULL, error = NULL, elapsed = NULL
+                ''', rows)
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写入转换索引失败: {e}")
+
+    def put_result(self, path: str, status: str, output: str = None, error: str = None,
+                   elapsed: float = None):
+        """写入转换结果"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute('UPDATE files SET status = ?, output = ?, error = ?, elapsed = ?, updated = ? '
+                             'WHERE path = ?', (status, output, error, elapsed, time.time(), path))
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写入转换索引失败: {e}")
+
+    def prune(self, existing_paths) -> int:
+        """删除已不存在的文件的记录，返回删除条数"""
+        existing_paths = set(existing_paths)
+        try:
+            with self._lock:
+                conn = self._connect()
+                stale = [row[0] for row in conn.execute('SELECT path FROM files')
+                         if row[0] not in existing_paths]
+                conn.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in stale])
+                conn.commit()
+            return len(stale)
+        except sqlite3.Error as e:
+            logger.warning(f"清理转换索引失败: {e}")
+            return 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @classmethod
+    def for_directory(cls, directory: str) -> 'ConvertIndex':
+        """媒体库目录下的索引"""
+        return cls(os.path.join(str(directory), INDEX_FILENAME))
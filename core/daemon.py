@@ -0,0 +1,400 @@
+"""
+下载守护进程模块
+一个常驻进程持有唯一的下载器（调度器、并发限制、带宽令牌桶、视频信息缓存），通过本机
+HTTP/JSON 接口接收任务；GUI 和命令行作为瘦客户端连接（见 core/daemon_client.py），
+同一台机器上的所有调用共享同一个下载队列和全局限制。
+
+接口（均以 /api 开头，请求和响应都是JSON）：
+
+    GET  /api/health                      守护进程状态
+    GET  /api/downloads[?status=a,b]      任务列表
+    POST /api/downloads                   添加任务 {"url"|"urls", "output_path", "priority"}
+    GET  /api/downloads/<id>              单个任务
+    POST /api/downloads/<id>/<操作>        cancel / pause / resume
+    GET|POST /api/downloads/<id>/rate-limit  查询/修改任务限速 {"rate": 字节/秒}
+    POST /api/clear                       清除已结束的任务
+    GET  /api/stats                       任务统计和队列状态
+    GET  /api/info?url=...                获取视频信息
+    POST /api/config/reload               重新读取配置文件
+    POST /api/shutdown                    停止守护进程（未完成的任务保留在任务日志中）
+    GET  /api/events[?initial=0]          进度事件流（Server-Sent Events）
+
+浏览器中的网页也能访问 localhost，因此只接受 Host 为本机地址的请求，POST 必须使用
+application/json（跨站请求无法不经预检发送），配置了 token 时还需携带
+Authorization: Bearer <token>
+"""
+import os
+import json
+import time
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from utils.logger import logger
+from core.config_manager import config_manager
+from core.progress_channel import ProgressChannel
+
+
+# 没有事件时，事件流发送保活注释的间隔（秒），客户端据此发现连接已断开
+KEEPALIVE_SECONDS = 15
+
+# 一次 POST /api/downloads 最多添加的任务数
+MAX_BATCH_URLS = 1000
+
+# 请求体大小上限（字节）
+MAX_BODY_BYTES = 4 * 1024 * 1024
+
+# 检查配置文件是否被修改的间隔（秒）
+CONFIG_CHECK_SECONDS = 2.0
+
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1', '[::1]')
+
+JOB_ACTIONS = ('cancel', 'pause', 'resume')
+
+
+class DaemonRequestError(Exception):
+    """请求无效（返回给客户端的HTTP错误）"""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class DownloadDaemon:
+    """下载守护进程：一个下载器 + 本机HTTP接口 + 进度事件广播"""
+
+    def __init__(self, downloader, host: str = '127.0.0.1', port: int = 8765, token: str = ''):
+        """
+        Args:
+            downloader: 守护进程持有的 VideoDownloader
+            host: 监听地址（只应使用本机地址）
+            port: 监听端口，0表示由系统分配
+            token: 访问令牌，空字符串表示不校验
+        """
+        self.downloader = downloader
+        self.host = host
+        self.port = port
+        self.token = token
+        self.started = time.time()
+        self.stop_requested = False  # 收到 /api/shutdown，响应发出后停止
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._subscribers = set()
+        self._subscribers_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._stop_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, downloader) -> 'DownloadDaemon':
+        """根据配置创建（[DAEMON] host / port / token）"""
+        return cls(
+            downloader,
+            host=config.get('DAEMON', 'host', '127.0.0.1'),
+            port=config.getint('DAEMON', 'port', 8765),
+            token=config.get('DAEMON', 'token', ''),
+        )
+
+    @property
+    def address(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """开始监听并启动事件广播线程（不阻塞）"""
+        server = ThreadingHTTPServer((self.host, self.port), _DaemonRequestHandler)
+        server.daemon_threads = True
+        server.download_daemon = self
+        self._server = server
+        self.port = server.server_address[1]
+        threading.Thread(target=self._pump_events, name="daemon-events", daemon=True).start()
+        threading.Thread(target=server.serve_forever, name="daemon-http", daemon=True).start()
+        logger.info(f"下载守护进程已启动: {self.address}（进程 {os.getpid()}）")
+
+    def wait(self, timeout: float = None) -> bool:
+        """等待守护进程停止，返回是否已停止"""
+        return self._stopped.wait(timeout)
+
+    def stop(self):
+        """停止接收请求（下载由调用方用 VideoDownloader.shutdown() 停止，任务日志保留，下次启动时恢复）"""
+        with self._stop_lock:
+            server, self._server = self._server, None
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            logger.info("下载守护进程已停止")
+        # 监听停止后才通知 wait()，避免主线程在停止过程中退出进程
+        self._stopped.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped.is_set()
+
+    # ---- 进度事件广播 ----
+
+    def subscribe(self) -> ProgressChannel:
+        """订阅进度事件：每个订阅者有自己的通道，消费慢时同一任务的多次变化合并为一条"""
+        channel = ProgressChannel()
+        with self._subscribers_lock:
+            self._subscribers.add(channel)
+        return channel
+
+    def unsubscribe(self, channel: ProgressChannel):
+        with self._subscribers_lock:
+            self._subscribers.discard(channel)
+
+    def broadcast(self, download_id: str, **fields):
+        """把任务变化发给所有订阅者"""
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for channel in subscribers:
+            channel.publish(download_id, **fields)
+
+    def _pump_events(self):
+        """取出下载器发布的进度变化，附上最新快照后转发给所有订阅者；顺便检查配置文件是否被修改"""
+        channel = self.downloader.progress_channel
+        config_checked = time.monotonic()
+        while not self._stopped.is_set():
+            try:
+                if channel.wait(1.0):
+                    changes = channel.drain()
+                    for download_id, progress in self.downloader.get_all_downloads(changes).items():
+                        self.broadcast(download_id, **progress._asdict())
+                if time.monotonic() - config_checked >= CONFIG_CHECK_SECONDS:
+                    config_checked = time.monotonic()
+                    if config_manager.reload_if_changed():
+                        self.apply_config()
+            except Exception as e:
+                logger.error(f"转发进度事件失败: {e}")
+
+    def apply_config(self):
+        """重新应用并发数、限速、时间段规则和重试设置"""
+        self.downloader.set_max_concurrent(config_manager.get_max_concurrent_downloads())
+        self.downloader.apply_bandwidth_config()
+        self.downloader.apply_retry_config()
+        logger.info(f"守护进程已应用新配置，当前限速: {self.downloader.bandwidth.describe()}，"
+                    f"并发数: {self.downloader.scheduler.max_workers}")
+
+    # ---- 接口实现 ----
+
+    def handle(self, method: str, path: str, query: Dict[str, list], body: Dict[str, Any]):
+        """
+        处理一个JSON请求
+
+        Returns:
+            (HTTP状态码, 响应数据)
+
+        Raises:
+            DaemonRequestError: 路径或参数无效
+        """
+        parts = [part for part in path.split('/') if part]
+        if not parts or parts[0] != 'api':
+            raise DaemonRequestError(HTTPStatus.NOT_FOUND, f"未知路径: {path}")
+        route = (method, '/'.join(parts[1:]))
+        downloader = self.downloader
+
+        if route == ('GET', 'health'):
+            return HTTPStatus.OK, {'status': 'ok', 'pid': os.getpid(), 'started': self.started,
+                                   'downloads': downloader.get_download_statistics()['total']}
+
+        if route == ('GET', 'downloads'):
+            statuses = set(','.join(query.get('status', [])).split(',')) - {''}
+            return HTTPStatus.OK, {'downloads': [
+                _job_dict(download_id, progress)
+                for download_id, progress in downloader.get_all_downloads().items()
+                if not statuses or progress.status in statuses
+            ]}
+
+        if route == ('POST', 'downloads'):
+            return self._add_downloads(body)
+
+        if len(parts) >= 3 and parts[1] == 'downloads':
+            return self._job_request(method, parts[2], parts[3:], body)
+
+        if route == ('POST', 'clear'):
+            cleared = downloader.clear_completed_downloads()
+            for download_id in cleared:
+                self.broadcast(download_id, removed=True)
+            return HTTPStatus.OK, {'cleared': len(cleared)}
+
+        if route == ('GET', 'stats'):
+            return HTTPStatus.OK, {'downloads': downloader.get_download_statistics(),
+                                   'queue': downloader.get_queue_stats()}
+
+        if route == ('GET', 'info'):
+            url = (query.get('url') or [''])[0]
+            if not url:
+                raise DaemonRequestError(HTTPStatus.BAD_REQUEST, "缺少参数 url")
+            use_cache = None if 'cache' not in query else query['cache'][0] not in ('0', 'false')
+            info = downloader.get_video_info(url, use_cache=use_cache)
+            if not info:
+                raise DaemonRequestError(HTTPStatus.NOT_FOUND, "无法获取视频信息")
+            return HTTPStatus.OK, info
+
+        if route == ('POST', 'config/reload'):
+            config_manager.reload_if_changed()
+            self.apply_config()
+            return HTTPStatus.OK, {'rate_limit': downloader.bandwidth.rate_limit,
+                                   'max_concurrent': downloader.scheduler.max_workers}
+
+        if route == ('POST', 'shutdown'):
+            # 请求处理线程写完响应后再停止，否则主线程可能在响应发出前退出进程
+            self.stop_requested = True
+            return HTTPStatus.OK, {'stopping': True}
+
+        raise DaemonRequestError(HTTPStatus.NOT_FOUND, f"未知接口: {method} {path}")
+
+    def _add_downloads(self, body: Dict[str, Any]):
+        """添加一个（url）或多个（urls）任务"""
+        urls = body.get('urls')
+        single = urls is None
+        if single:
+            urls = [body.get('url')]
+        if not isinstance(urls, list) or not urls or not all(isinstance(url, str) and url for url in urls):
+            raise DaemonRequestError(HTTPStatus.BAD_REQUEST, "url/urls 必须是非空字符串（列表）")
+        if len(urls) > MAX_BATCH_URLS:
+            raise DaemonRequestError(HTTPStatus.BAD_REQUEST, f"一次最多添加 {MAX_BATCH_URLS} 个任务")
+        output_path = body.get('output_path') or None
+        try:
+            priority = int(body.get('priority') or 0)
+        except (TypeError, ValueError):
+            raise DaemonRequestError(HTTPStatus.BAD_REQUEST, "priority 必须是整数")
+
+        download_ids = [self.downloader.start_download(url, output_path, priority=priority) for url in urls]
+        if single:
+            if download_ids[0] is None:
+                raise DaemonRequestError(HTTPStatus.BAD_REQUEST, f"无效的URL: {urls[0]}")
+            return HTTPStatus.CREATED, {'download_id': download_ids[0]}
+        return HTTPStatus.CREATED, {'download_ids': download_ids}
+
+    def _job_request(self, method: str, download_id: str, action: list, body: Dict[str, Any]):
+        """单个任务的查询和操作"""
+        downloader = self.downloader
+        progress = downloader.get_download_progress(download_id)
+        if progress is None:
+            raise DaemonRequestError(HTTPStatus.NOT_FOUND, f"任务不存在: {download_id}")
+        if not action and method == 'GET':
+            return HTTPStatus.OK, _job_dict(download_id, progress)
+        if len(action) != 1:
+            raise DaemonRequestError(HTTPStatus.NOT_FOUND, f"未知操作: {'/'.join(action)}")
+        action = action[0]
+        if action == 'rate-limit':
+            if method == 'POST':
+                rate = body.get('rate')
+                if rate is not None and (not isinstance(rate, int) or rate < 0):
+                    raise DaemonRequestError(HTTPStatus.BAD_REQUEST, "rate 必须是非负整数或null")
+                downloader.set_job_rate_limit(download_id, rate)
+            return HTTPStatus.OK, {'rate': downloader.get_job_rate_limit(download_id)}
+        if method == 'POST' and action in JOB_ACTIONS:
+            ok = getattr(downloader, f"{action}_download")(download_id)
+            return HTTPStatus.OK, {'ok': bool(ok)}
+        raise DaemonRequestError(HTTPStatus.NOT_FOUND, f"未知操作: {method} {action}")
+
+    def stream_events(self, handler: '_DaemonRequestHandler', initial: bool):
+        """把进度事件以SSE格式写给客户端，直到连接断开或守护进程停止"""
+        channel = self.subscribe()
+        try:
+            handler.send_response(HTTPStatus.OK)
+            handler.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+            handler.send_header('Cache-Control', 'no-cache')
+            handler.end_headers()
+            handler.wfile.write(b": connected\n\n")
+            handler.wfile.flush()
+            if initial:
+                # 先订阅再发送现有任务，两者之间的变化会在之后重复发送一次，不会丢失
+                for download_id, progress in self.downloader.get_all_downloads().items():
+                    handler.wfile.write(_sse('progress', _job_dict(download_id, progress)))
+                handler.wfile.flush()
+            while not self._stopped.is_set():
+                if not channel.wait(KEEPALIVE_SECONDS):
+                    handler.wfile.write(b": keepalive\n\n")
+                else:
+                    for download_id, fields in channel.drain().items():
+                        if fields.pop('removed', False):
+                            handler.wfile.write(_sse('removed', {'download_id': download_id}))
+                        else:
+                            handler.wfile.write(_sse('progress', {'download_id': download_id, **fields}))
+                handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+            pass
+        finally:
+            self.unsubscribe(channel)
+
+
+def _job_dict(download_id: str, progress) -> Dict[str, Any]:
+    return {'download_id': download_id, **progress._asdict()}
+
+
+def _host_name(host_header: str) -> str:
+    """Host 请求头中的主机名（去掉端口）"""
+    if host_header.startswith('['):
+        return host_header[:host_header.find(']') + 1]
+    return host_header.rsplit(':', 1)[0]
+
+
+def _sse(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+
+
+class _DaemonRequestHandler(BaseHTTPRequestHandler):
+    """HTTP请求处理（解析JSON、校验来源，交给 DownloadDaemon.handle）"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'VideoDownloaderDaemon'
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method: str):
+        daemon = self.server.download_daemon
+        try:
+            self._check_request(daemon, method)
+            url = urlsplit(self.path)
+            query = parse_qs(url.query)
+            if method == 'GET' and url.path.rstrip('/') == '/api/events':
+                self.close_connection = True
+                daemon.stream_events(self, initial=(query.get('initial') or ['1'])[0] not in ('0', 'false'))
+                return
+            status, data = daemon.handle(method, url.path, query, self._read_body() if method == 'POST' else {})
+        except DaemonRequestError as e:
+            status, data = e.status, {'error': str(e)}
+        except Exception as e:
+            logger.error(f"守护进程处理请求失败 {method} {self.path}: {e}")
+            status, data = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+        payload = json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        if daemon.stop_requested:
+            self.wfile.flush()
+            daemon.stop()
+
+    def _check_request(self, daemon: DownloadDaemon, method: str):
+        host = _host_name(self.headers.get('Host') or '')
+        if host not in LOCAL_HOSTS and host != daemon.host:
+            raise DaemonRequestError(HTTPStatus.FORBIDDEN, "只接受本机请求")
+        if daemon.token and self.headers.get('Authorization') != f"Bearer {daemon.token}":
+            raise DaemonRequestError(HTTPStatus.UNAUTHORIZED, "访问令牌无效")
+        if method == 'POST' and not (self.headers.get('Content-Type') or '').startswith('application/json'):
+            raise DaemonRequestError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "请求体必须是 application/json")
+
+    def _read_body(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            raise DaemonRequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "请求体过大")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise DaemonRequestError(HTTPStatus.BAD_REQUEST, "请求体不是有效的JSON")
+        if not isinstance(body, dict):
+            raise DaemonRequestError(HTTPStatus.BAD_REQUEST, "请求体必须是JSON对象")
+        return body
+
+    def log_message(self, format, *args):
+        logger.debug(f"守护进程请求: {self.address_string()} {format % args}")
@@ -0,0 +1,325 @@
+"""
+下载守护进程客户端模块
+通过本机HTTP接口连接下载守护进程（core/daemon.py），只依赖标准库，不导入yt-dlp，
+命令行每次调用只需要几次HTTP请求。RemoteDownloader 用守护进程的事件流在本地维护
+任务快照，提供与 VideoDownloader 相同的进度读取接口，GUI 可以直接替换使用
+"""
+import json
+import threading
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+from utils.logger import logger
+from core.progress_channel import ProgressChannel
+from core.progress_state import ProgressSnapshot
+
+
+# 检查守护进程是否在运行时的连接超时（秒），没有守护进程时本机连接会立即被拒绝
+PROBE_TIMEOUT = 0.5
+
+# 事件流的读取超时（秒），应大于守护进程的保活间隔
+EVENTS_TIMEOUT = 40
+
+# 事件流断开后重新连接前的等待时间（秒）
+RECONNECT_DELAY = 2.0
+
+# 守护进程只监听本机地址，请求不经过环境变量中配置的代理
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+
+class DaemonError(Exception):
+    """守护进程不可用或拒绝了请求"""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status  # 守护进程返回的HTTP状态码，连接失败时为None
+
+
+def snapshot_from_dict(data: Dict[str, Any]) -> ProgressSnapshot:
+    """把接口返回的任务数据转换为进度快照（忽略不认识的字段）"""
+    return ProgressSnapshot(**{name: data[name] for name in ProgressSnapshot._fields if name in data})
+
+
+class DaemonClient:
+    """下载守护进程的HTTP客户端"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8765, token: str = '', timeout: float = 10.0):
+        """
+        Args:
+            host: 守护进程地址
+            port: 守护进程端口
+            token: 访问令牌（与守护进程的 [DAEMON] token 一致）
+            timeout: 普通请求的超时时间（秒）
+        """
+        self.base_url = f"http://{host}:{port}"
+        self.token = token
+        self.timeout = timeout
+
+    @classmethod
+    def from_config(cls, config) -> 'DaemonClient':
+        """根据配置创建（[DAEMON] host / port / token）"""
+        return cls(
+            host=config.get('DAEMON', 'host', '127.0.0.1'),
+            port=config.getint('DAEMON', 'port', 8765),
+            token=config.get('DAEMON', 'token', ''),
+        )
+
+    @classmethod
+    def connect(cls, config) -> Optional['DaemonClient']:
+        """[DAEMON] attach 开启且守护进程正在运行时返回客户端，否则返回None（前端自己下载）"""
+        if not config.getboolean('DAEMON', 'attach', True):
+            return None
+        client = cls.from_config(config)
+        return client if client.is_running() else None
+
+    def _open(self, method: str, path: str, body: Any = None, timeout: float = None):
+        data = None
+        headers = {'Accept': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        if method == 'POST':
+            data = json.dumps(body or {}).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            return _opener.open(request, timeout=timeout or self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get('error') or e.reason
+            except ValueError:
+                message = e.reason
+            raise DaemonError(f"守护进程返回 {e.code}: {message}", e.code) from e
+        except (urllib.error.URLError, OSError) as e:
+            raise DaemonError(f"无法连接下载守护进程 {self.base_url}: {getattr(e, 'reason', e)}") from e
+
+    def _request(self, method: str, path: str, body: Any = None, timeout: float = None) -> Dict[str, Any]:
+        """
+        发送请求并解析JSON响应
+
+        Raises:
+            DaemonError: 连接失败或守护进程返回错误
+        """
+        with self._open(method, path, body, timeout) as response:
+            try:
+                return json.loads(response.read())
+            except ValueError as e:
+                raise DaemonError(f"守护进程响应无效: {e}") from e
+
+    @staticmethod
+    def _job_path(download_id: str, action: str = '') -> str:
+        return f"/api/downloads/{quote(download_id, safe='')}" + (f"/{action}" if action else '')
+
+    def is_running(self, timeout: float = PROBE_TIMEOUT) -> bool:
+        """守护进程是否正在运行"""
+        try:
+            return self._request('GET', '/api/health', timeout=timeout).get('status') == 'ok'
+        except DaemonError:
+            return False
+
+    def health(self) -> Dict[str, Any]:
+        return self._request('GET', '/api/health')
+
+    def start_download(self, url: str, output_path: str = None, priority: int = 0) -> Optional[str]:
+        """添加下载任务，返回下载ID（URL无效时返回None）"""
+        try:
+            return self._request('POST', '/api/downloads',
+                                 {'url': url, 'output_path': output_path, 'priority': priority})['download_id']
+        except DaemonError as e:
+            if e.status != 400:
+                raise
+            logger.error(f"守护进程拒绝了下载任务: {e}")
+            return None
+
+    def start_downloads(self, urls: List[str], output_path: str = None, priority: int = 0) -> List[Optional[str]]:
+        """一次添加多个下载任务，返回与 urls 一一对应的下载ID（无效的URL为None）"""
+        return self._request('POST', '/api/downloads',
+                             {'urls': list(urls), 'output_path': output_path, 'priority': priority})['download_ids']
+
+    def get_download(self, download_id: str) -> Optional[ProgressSnapshot]:
+        try:
+            return snapshot_from_dict(self._request('GET', self._job_path(download_id)))
+        except DaemonError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def list_downloads(self, statuses: Iterable[str] = None) -> Dict[str, ProgressSnapshot]:
+        """守护进程中的任务（可按状态过滤），返回 下载ID -> 进度快照"""
+        path = '/api/downloads' + (f"?{urlencode({'status': ','.join(statuses)})}" if statuses else '')
+        return {job['download_id']: snapshot_from_dict(job) for job in self._request('GET', path)['downloads']}
+
+    def cancel_download(self, download_id: str) -> bool:
+        return self._request('POST', self._job_path(download_id, 'cancel'))['ok']
+
+    def pause_download(self, download_id: str) -> bool:
+        return self._request('POST', self._job_path(download_id, 'pause'))['ok']
+
+    def resume_download(self, download_id: str) -> bool:
+        return self._request('POST', self._job_path(download_id, 'resume'))['ok']
+
+    def get_job_rate_limit(self, download_id: str) -> int:
+        return self._request('GET', self._job_path(download_id, 'rate-limit'))['rate']
+
+    def set_job_rate_limit(self, download_id: str, rate: Optional[int]):
+        self._request('POST', self._job_path(download_id, 'rate-limit'), {'rate': rate})
+
+    def clear_completed(self) -> int:
+        return self._request('POST', '/api/clear')['cleared']
+
+    def get_stats(self) -> Dict[str, Any]:
+        """任务统计（downloads）和队列状态（queue）"""
+        return self._request('GET', '/api/stats')
+
+    def get_video_info(self, url: str, use_cache: bool = None) -> Optional[Dict[str, Any]]:
+        query = {'url': url}
+        if use_cache is not None:
+            query['cache'] = '1' if use_cache else '0'
+        try:
+            return self._request('GET', f"/api/info?{urlencode(query)}", timeout=max(self.timeout, 120))
+        except DaemonError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def reload_config(self) -> Dict[str, Any]:
+        """让守护进程重新读取配置文件并应用并发数、限速等设置"""
+        return self._request('POST', '/api/config/reload')
+
+    def shutdown(self):
+        self._request('POST', '/api/shutdown')
+
+    def events(self, initial: bool = True) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        读取进度事件流，产出 (事件类型, 数据)
+
+        事件类型为 progress（数据是任务的全部字段）或 removed（任务已被清除）。
+        连接建立后才开始产出，调用方可以在取得第一个事件前提交任务而不丢失事件
+
+        Args:
+            initial: 是否先收到所有现有任务的 progress 事件
+
+        Raises:
+            DaemonError: 连接失败或中断
+        """
+        response = self._open('GET', f"/api/events?initial={int(initial)}", timeout=EVENTS_TIMEOUT)
+        return self._read_events(response)
+
+    @staticmethod
+    def _read_events(response) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        event, data = 'message', []
+        try:
+            with response:
+                for raw in response:
+                    line = raw.decode('utf-8').rstrip('\r\n')
+                    if not line:
+                        if data:
+                            yield event, json.loads('\n'.join(data))
+                        event, data = 'message', []
+                    elif line.startswith(':'):
+                        continue  # 注释（连接确认、保活）
+                    elif line.startswith('event:'):
+                        event = line[6:].strip()
+                    elif line.startswith('data:'):
+                        data.append(line[5:].strip())
+        except (OSError, ValueError) as e:
+            raise DaemonError(f"进度事件流中断: {e}") from e
+
+
+class RemoteDownloader:
+    """
+    连接到下载守护进程的下载器（供GUI使用）
+
+    后台线程读取守护进程的事件流，在本地保存所有任务的最新快照并发布到 progress_channel，
+    因此读取进度不需要发送请求；添加、暂停、取消等操作转发给守护进程
+    """
+
+    def __init__(self, client: DaemonClient):
+        self.client = client
+        self.progress_channel = ProgressChannel()
+        self._snapshots: Dict[str, ProgressSnapshot] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        threading.Thread(target=self._follow_events, name="daemon-events", daemon=True).start()
+
+    def _follow_events(self):
+        """持续读取事件流，断开后自动重连（重连时重新接收全部任务）"""
+        while not self._closed.is_set():
+            try:
+                for event, data in self.client.events(initial=True):
+                    download_id = data.get('download_id')
+                    if not download_id:
+                        continue
+                    with self._lock:
+                        if event == 'removed':
+                            self._snapshots.pop(download_id, None)
+                        else:
+                            self._snapshots[download_id] = snapshot_from_dict(data)
+                    self.progress_channel.publish(download_id)
+                    if self._closed.is_set():
+                        return
+            except DaemonError as e:
+                logger.warning(f"{e}，{RECONNECT_DELAY:.0f} 秒后重新连接")
+            self._closed.wait(RECONNECT_DELAY)
+
+    def close(self):
+        """停止读取事件流（守护进程中的任务不受影响）"""
+        self._closed.set()
+
+    def start_download(self, url: str, output_path: str = None, progress_callback=None,
+                       priority: int = 0) -> Optional[str]:
+        """添加下载任务（进度通过 progress_channel 获得，不支持 progress_callback）"""
+        return self.client.start_download(url, output_path, priority)
+
+    def get_video_info(self, url: str, use_cache: bool = None) -> Optional[Dict[str, Any]]:
+        try:
+            return self.client.get_video_info(url, use_cache)
+        except DaemonError as e:
+            logger.error(f"获取视频信息失败: {e}")
+            return None
+
+    def get_download_progress(self, download_id: str) -> Optional[ProgressSnapshot]:
+        with self._lock:
+            return self._snapshots.get(download_id)
+
+    def get_all_downloads(self, download_ids: Iterable[str] = None) -> Dict[str, ProgressSnapshot]:
+        with self._lock:
+            if download_ids is None:
+                return dict(self._snapshots)
+            return {download_id: self._snapshots[download_id]
+                    for download_id in download_ids if download_id in self._snapshots}
+
+    def get_download_statistics(self) -> Dict[str, int]:
+        with self._lock:
+            statuses = [progress.status for progress in self._snapshots.values()]
+        stats = dict.fromkeys(('waiting', 'downloading', 'paused', 'converting', 'completed',
+                               'error', 'cancelled', 'skipped'), 0)
+        for status in statuses:
+            if status in stats:
+                stats[status] += 1
+        stats['total'] = len(statuses)
+        return stats
+
+    def cancel_download(self, download_id: str) -> bool:
+        return self.client.cancel_download(download_id)
+
+    def pause_download(self, download_id: str) -> bool:
+        return self.client.pause_download(download_id)
+
+    def resume_download(self, download_id: str) -> bool:
+        return self.client.resume_download(download_id)
+
+    def get_job_rate_limit(self, download_id: str) -> int:
+        return self.client.get_job_rate_limit(download_id)
+
+    def set_job_rate_limit(self, download_id: str, rate: Optional[int]):
+        self.client.set_job_rate_limit(download_id, rate)
+
+    def clear_completed_downloads(self) -> list:
+        """清除守护进程中已结束的任务（事件流随后送来 removed 事件）"""
+        with self._lock:
+            finished = [download_id for download_id, progress in self._snapshots.items()
+                        if progress.status in ('completed', 'error', 'cancelled', 'skipped')]
+        self.client.clear_completed()
+        return finished
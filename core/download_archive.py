@@ -0,0 +1,201 @@
+"""
+下载归档模块
+以"提取器 + 视频ID"为键记录已下载的视频（SQLite索引），重复下载前直接跳过
+记录格式与yt-dlp的 download_archive 文件兼容（每行 "extractor id"）
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+from utils.logger import logger
+from utils.validators import URLValidator
+
+
+# URLValidator平台名 -> yt-dlp提取器名（归档中使用小写的ie_key）
+PLATFORM_EXTRACTORS = {
+    'youtube': 'youtube',
+    'twitter': 'twitter',
+    'instagram': 'instagram',
+    'tiktok': 'tiktok',
+    'bilibili': 'bilibili',
+}
+
+
+def archive_key_from_url(url: str) -> Optional[Tuple[str, str]]:
+    """不发起网络请求，从URL推断归档键 (extractor, video_id)"""
+    video_id = URLValidator.extract_video_id(url)
+    if not video_id:
+        return None
+    platform, vid = video_id
+    extractor = PLATFORM_EXTRACTORS.get(platform)
+    return (extractor, vid) if extractor else None
+
+
+def archive_key_from_info(info: dict) -> Optional[Tuple[str, str]]:
+    """从yt-dlp信息字典获取归档键 (extractor, video_id)"""
+    extractor = info.get('extractor_key') or info.get('ie_key') or info.get('extractor')
+    video_id = info.get('id')
+    if not extractor or not video_id:
+        return None
+    return extractor.lower(), str(video_id)
+
+
+class DownloadArchive:
+    """下载归档索引"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开数据库连接（需持有锁）"""
+        if self._conn is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir and not os.path.exists(db_dir):
+                os.makedirs(db_dir)
+            self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS archive (
+                    extractor TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    title TEXT,
+                    filename TEXT,
+                    added REAL NOT NULL,
+                    PRIMARY KEY (extractor, video_id)
+                ) WITHOUT ROWID
+            ''')
+            self._conn.commit()
+        return self._conn
+
+    def contains(self, extractor: str, video_id: str) -> bool:
+        """是否已下载"""
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    'SELECT 1 FROM archive WHERE extractor = ? AND video_id = ?',
+                    (extractor.lower(), str(video_id))).fetchone()
+            return row is not None
+        except Exception as e:
+            logger.warning(f"查询下载归档失败: {e}")
+            return False
+
+    def lookup_url(self, url: str) -> Optional[dict]:
+        """按URL查询归档记录（无需网络），未下载或无法识别返回None"""
+        key = archive_key_from_url(url)
+        if not key:
+            return None
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    'SELECT extractor, video_id, title, filename FROM archive WHERE extractor = ? AND video_id = ?',
+                    key).fetchone()
+        except Exception as e:
+            logger.warning(f"查询下载归档失败: {e}")
+            return None
+        if row is None:
+            return None
+        return {'extractor': row[0], 'video_id': row[1], 'title': row[2], 'filename': row[3]}
+
+    def add(self, extractor: str, video_id: str, title: str = None, filename: str = None):
+        """添加归档记录"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute('INSERT OR REPLACE INTO archive (extractor, video_id, title, filename, added) '
+                             'VALUES (?, ?, ?, ?, ?)',
+                             (extractor.lower(), str(video_id), title, filename, time.time()))
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"写入下载归档失败: {e}")
+
+    def record_download(self, url: str, info: dict, filename: str = None):
+        """记录一次成功的下载（同时写入信息中的键和URL推断的键）"""
+        title = info.get('title') if info else None
+        keys = {archive_key_from_info(info) if info else None, archive_key_from_url(url)}
+        for key in keys:
+            if key:
+                self.add(key[0], key[1], title, filename)
+
+    def count(self) -> int:
+        """归档记录数"""
+        try:
+            with self._lock:
+                return self._connect().execute('SELECT COUNT(*) FROM archive').fetchone()[0]
+        except Exception as e:
+            logger.warning(f"读取下载归档失败: {e}")
+            return 0
+
+    def _insert_many(self, rows) -> int:
+        """批量写入 (extractor, video_id, title, filename)，返回写入条数"""
+        now = time.time()
+        rows = [(extractor.lower(), str(video_id), title, filename, now)
+                for extractor, video_id, title, filename in rows]
+        with self._lock:
+            conn = self._connect()
+            conn.executemany('INSERT OR REPLACE INTO archive (extractor, video_id, title, filename, added) '
+                             'VALUES (?, ?, ?, ?, ?)', rows)
+            conn.commit()
+        return len(rows)
+
+    def rebuild_from_metadata(self, root: str) -> int:
+        """
+        从下载目录中的 *.info.json 元数据文件重建索引
+
+        Args:
+            root: 下载根目录（会递归查找，兼容 标题/metadata/标题.info.json 结构）
+
+        Returns:
+            写入的记录数
+        """
+        rows = []
+        for info_file in Path(root).rglob('*.info.json'):
+            try:
+                with open(info_file, 'r', encoding='utf-8') as f:
+                    info = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"无法读取元数据文件 {info_file}: {e}")
+                continue
+            if info.get('_type', 'video') != 'video':
+                continue
+            key = archive_key_from_info(info)
+            if key:
+                rows.append((key[0], key[1], info.get('title'), None))
+
+        count = self._insert_many(rows)
+        logger.info(f"从元数据重建下载归档: {count} 条")
+        return count
+
+    def import_text(self, archive_file: str) -> int:
+        """导入yt-dlp格式的归档文件（每行 "extractor id"）"""
+        rows = []
+        with open(archive_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.strip().split(None, 1)
+                if len(parts) == 2:
+                    rows.append((parts[0], parts[1], None, None))
+        count = self._insert_many(rows)
+        logger.info(f"导入下载归档 {archive_file}: {count} 条")
+        return count
+
+    def export_text(self, archive_file: str) -> int:
+        """导出为yt-dlp格式的归档文件，可直接用于 yt-dlp --download-archive"""
+        with self._lock:
+            rows = self._connect().execute(
+                'SELECT extractor, video_id FROM archive ORDER BY added').fetchall()
+        with open(archive_file, 'w', encoding='utf-8') as f:
+            for extractor, video_id in rows:
+                f.write(f"{extractor} {video_id}\n")
+        logger.info(f"导出下载归档 {archive_file}: {len(rows)} 条")
+        return len(rows)
+
+    @classmethod
+    def from_config(cls, config) -> 'DownloadArchive':
+        """根据配置创建归档实例"""
+        config_dir = os.path.dirname(config.config_file) or '.'
+        return cls(os.path.join(config_dir, 'archive.sqlite3'))
@@ -3,60 +3,112 @@
 使用yt-dlp实现多平台视频下载功能
 """
 import os
+import functools
+import itertools
 import threading
 import time
-import subprocess
-from datetime import datetime
-from typing import Callable, Dict, Any, Optional
-from pathlib import Path
+from typing import Callable, Dict, Any, Iterable, Optional
 
-import yt_dlp
 from utils.logger import logger
 from utils.validators import URLValidator
+from utils.formatters import format_bytes, format_speed
 from core.config_manager import config_manager
+from core.info_cache import InfoCache
+from core.job_journal import JobJournal
+from core.download_archive import DownloadArchive, archive_key_from_info
+from core.bandwidth import BandwidthManager
+from core.cancellation import CancelToken, remove_partial_files
+from core.progress_channel import ProgressChannel
+from core.progress_sampler import ProgressSampler
+from core.progress_state import DownloadProgress, ProgressSnapshot
+from core.ffmpeg_probe import get_ffmpeg_capabilities
+from core.scheduler import DownloadScheduler
+from core.host_limits import HostLimiter, host_key, throttle_status
+from core.retry import RETRYABLE, THROTTLED, FATAL, AttemptRecord, RetryPolicy, classify_error
+from core.time_schedule import CHECK_INTERVAL as SCHEDULE_CHECK_INTERVAL, load_schedule, active_rule
+from core.transcoder import Transcoder
 
 
-class DownloadProgress:
-    """下载进度信息"""
-    
-    def __init__(self):
-        self.url = ""
-        self.title = ""
-        self.status = "waiting"  # waiting, downloading, completed, error, cancelled
-        self.progress = 0.0
-        self.speed = ""
-        self.eta = ""
-        self.file_size = ""
-        self.downloaded_bytes = 0
-        self.total_bytes = 0
-        self.error_message = ""
-        self.start_time = None
-        self.end_time = None
+# 下载时每次读取的字节数
+READ_BUFFER_SIZE = 256 * 1024
+
+
+def _load_yt_dlp():
+    """延迟导入yt_dlp（导入耗时数百毫秒，只在真正提取/下载时加载）"""
+    import yt_dlp
+    return yt_dlp
+
+
+def _load_download_ydl_class():
+    """下载使用的YoutubeDL类（支持多连接分段下载，同样延迟导入）"""
+    from core.segmented import SegmentedYoutubeDL
+    return SegmentedYoutubeDL
 
 
 class VideoDownloader:
     """视频下载器"""
 
-    def __init__(self):
+    _id_counter = itertools.count(1)
+
+    def __init__(self, max_concurrent: int = None):
         self.downloads = {}  # 存储下载任务
         self.download_lock = threading.Lock()
-        self.active_downloads = 0
-        self.max_concurrent = config_manager.get_max_concurrent_downloads()
+        # 任务状态和进度的变化事件（按任务合并），界面据此只刷新变化的行
+        self.progress_channel = ProgressChannel()
+        # 进度回调按固定间隔采样，速度和剩余时间由原始字节数平滑计算
+        self.progress_sampler = ProgressSampler.from_config(config_manager)
+        self.max_concurrent = max_concurrent or config_manager.get_max_concurrent_downloads()
+        # 按平台限制并发和任务启动间隔，被限流（429/412/403）的平台自动退避
+        self.host_limiter = HostLimiter.from_config(config_manager)
+        self.scheduler = DownloadScheduler(self.max_concurrent, limiter=self.host_limiter)
+        self.info_cache = InfoCache.from_config(config_manager)
+        self.use_info_cache = config_manager.getboolean('CACHE', 'info_cache_enabled', True)
+        self.journal = JobJournal.from_config(config_manager)
+        self._journal_marks = {}  # download_id -> 上次写入进度的时间
+        self.archive = DownloadArchive.from_config(config_manager)
+        self.use_archive = config_manager.getboolean('ARCHIVE', 'enabled', True)
+        self.fragment_concurrency = max(1, config_manager.getint('ADVANCED', 'fragment_concurrency', 4))
+        self.fragment_concurrency_max = max(1, config_manager.getint('ADVANCED', 'fragment_concurrency_max', 16))
+        self.adaptive_fragments = config_manager.getboolean('ADVANCED', 'adaptive_fragments', True)
+        self.ffmpeg = get_ffmpeg_capabilities()
         self.ffmpeg_available = self._check_ffmpeg()
+        # 转码使用独立的线程池，不占用下载槽位
+        self.transcoder = Transcoder(self.ffmpeg)
+        # 失败重试（可重试的错误按指数退避重新排队）
+        self.retry_policy = RetryPolicy.from_config(config_manager)
+        # 全局和单任务限速（令牌桶，所有下载线程共享）
+        self.bandwidth = BandwidthManager()
+        self._throttle_lock = threading.Lock()
+        self._throttle_marks = {}  # download_id -> (文件名, 上次回调时的已下载字节数)
+        # 正在执行的任务的取消令牌和出现过的临时文件（取消后清理）
+        self._cancel_tokens: Dict[str, CancelToken] = {}
+        self._partial_files: Dict[str, set] = {}
+        # 未结束任务的提交参数（暂停后继续、暂停后又立即继续时用于重新排队）
+        self._submissions: Dict[str, tuple] = {}
+        # shutdown() 之后不再派发任务，被中断的任务保持原状态等待下次恢复
+        self._shutting_down = False
+        # 时间段规则：命中规则时覆盖基础并发数（max_concurrent）和基础全局限速
+        self._base_rate_limit = 0
+        self.schedule_rules = []
+        self.active_schedule = None
+        self._schedule_lock = threading.RLock()
+        self._schedule_thread = None
+        self._schedule_stop = threading.Event()  # 设置后时间段检查线程退出
+        self.apply_bandwidth_config()
+
+    @property
+    def active_downloads(self) -> int:
+        """正在进行的下载数"""
+        return self.scheduler.active_count
 
     def _check_ffmpeg(self) -> bool:
         """检查ffmpeg是否可用"""
         # 检查系统ffmpeg二进制文件（yt-dlp需要的是二进制文件，不是Python包）
-        try:
-            result = subprocess.run(['ffmpeg', '-version'],
-                                  capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                logger.info("检测到系统ffmpeg，支持高质量视频合并")
-                return True
-            else:
-                logger.warning("系统ffmpeg检测失败")
-        except (subprocess.TimeoutExpired, subprocess.CalledProcessError, FileNotFoundError):
-            logger.info("系统ffmpeg未安装或不在PATH中")
+        # 探测结果在进程内共享并持久化，多次创建下载器不会重复启动子进程
+        if self.ffmpeg.available:
+            logger.info("检测到系统ffmpeg，支持高质量视频合并")
+            return True
+        logger.info("系统ffmpeg未安装或不在PATH中")
 
         # 检查是否有python-ffmpeg包（仅用于提示）
         try:
@@ -221,6 +273,8 @@ class VideoDownloader:
             'audioquality': config_manager.get('DEFAULT', 'audio_quality', 'best'),
             # 根据ffmpeg可用性配置
             'prefer_ffmpeg': self.ffmpeg_available,
+            # 保留并续传 .part 文件，中断后恢复任务时无需从头下载
+            'continuedl': True,
             # 添加更多调试信息
             'verbose': True,
         }
@@ -235,8 +289,8 @@ class VideoDownloader:
                 }],
             }
 
-            # 尝试指定ffmpeg路径（对python-ffmpeg有帮助）
-            ffmpeg_location = self._get_ffmpeg_location()
+            # 尝试指定ffmpeg路径（对python-ffmpeg有帮助），否则使用已探测到的路径
+            ffmpeg_location = self._get_ffmpeg_location() or self.ffmpeg.ffmpeg_path
             if ffmpeg_location:
                 ffmpeg_opts['ffmpeg_location'] = ffmpeg_location
 
@@ -257,62 +311,220 @@ class VideoDownloader:
         if proxy:
             opts['proxy'] = proxy
         
+        # 网络超时和yt-dlp内部的重试次数（HTTP续传、分片、信息提取）：内部只重试少量次数，
+        # 任务级的重试由调度器按退避重新排队，总重试次数不会是两层相乘
+        opts['socket_timeout'] = max(1, config_manager.getint('DEFAULT', 'timeout', 30))
+        opts['retries'] = self.retry_policy.inner_retries
+        opts['fragment_retries'] = self.retry_policy.inner_retries
+        opts['extractor_retries'] = self.retry_policy.inner_retries
+        sleep_function = self.retry_policy.sleep_function()
+        opts['retry_sleep_functions'] = {'http': sleep_function, 'fragment': sleep_function,
+                                         'extractor': sleep_function}
+
+        # 限速在每次读取后按字节数申请令牌，固定读取块大小（yt-dlp默认会增大到4MB），
+        # 避免限速时按秒级的大块突发
+        opts['buffersize'] = READ_BUFFER_SIZE
+        opts['noresizebuffer'] = True
+
+        # 分段下载：直链格式使用多个连接并发请求不同的字节区间
+        if config_manager.getboolean('ADVANCED', 'segmented_download', False):
+            opts['segment_count'] = max(1, config_manager.getint('ADVANCED', 'segment_count', 4))
+            opts['segment_retries'] = self.retry_policy.inner_retries
+
+        # 分片并发：HLS/DASH同时下载的分片数。自适应时yt-dlp按上限创建线程池，
+        # 实际并发由控制器根据吞吐量和服务器错误在初始值和上限之间调整
+        if self.adaptive_fragments:
+            opts['concurrent_fragment_downloads'] = max(self.fragment_concurrency, self.fragment_concurrency_max)
+            opts['adaptive_fragments'] = True
+            opts['fragment_concurrency_initial'] = self.fragment_concurrency
+        else:
+            opts['concurrent_fragment_downloads'] = self.fragment_concurrency
+
         # 添加进度回调
         if progress_callback:
             opts['progress_hooks'] = [progress_callback]
         
         return opts
     
-    def _progress_hook(self, download_id: str, d: Dict[str, Any]):
-        """下载进度回调函数"""
-        if download_id not in self.downloads:
-            return
-        
-        progress = self.downloads[download_id]
+    def apply_bandwidth_config(self):
+        """
+        按配置更新限速（[ADVANCED] rate_limit / job_rate_limit，单位KB/s）和
+        时间段规则（[SCHEDULE]），进行中的下载立即生效
+        """
+        job_rate = max(0, config_manager.getint('ADVANCED', 'job_rate_limit', 0)) * 1024
+        if job_rate != self.bandwidth.job_rate_limit:
+            self.bandwidth.set_default_job_rate_limit(job_rate)
+            logger.info(f"下载限速: {self.bandwidth.describe()}")
+        with self._schedule_lock:
+            self.schedule_rules = load_schedule(config_manager)
+            self._base_rate_limit = max(0, config_manager.getint('ADVANCED', 'rate_limit', 0)) * 1024
+            self.apply_schedule()
+        if self.schedule_rules and self._schedule_thread is None:
+            self._schedule_thread = threading.Thread(target=self._schedule_loop, name="schedule", daemon=True)
+            self._schedule_thread.start()
+
+    def set_rate_limit(self, rate: int):
+        """修改所有下载共享的速度上限（字节/秒，0表示不限速；时间段规则指定了限速时以规则为准）"""
+        with self._schedule_lock:
+            self._base_rate_limit = max(0, int(rate))
+            self.apply_schedule()
+
+    def set_max_concurrent(self, max_concurrent: int):
+        """修改并发下载数（时间段规则指定了并发数时以规则为准）"""
+        with self._schedule_lock:
+            self.max_concurrent = max(1, int(max_concurrent))
+            self.apply_schedule()
+
+    def apply_schedule(self):
+        """按当前命中的时间段规则（未命中时使用基础设置）更新并发数和全局限速"""
+        with self._schedule_lock:
+            rule = active_rule(self.schedule_rules)
+            if rule is not self.active_schedule:
+                if rule:
+                    logger.info(f"进入时间段: {rule.describe()}")
+                elif self.active_schedule:
+                    logger.info(f"时间段 {self.active_schedule.name} 结束，恢复默认设置")
+                self.active_schedule = rule
+
+            max_concurrent = (rule and rule.max_concurrent) or self.max_concurrent
+            if max_concurrent != self.scheduler.max_workers:
+                self.scheduler.set_max_concurrent(max_concurrent)
+                logger.info(f"下载并发数: {max_concurrent}")
+
+            rate = rule.rate_limit if rule and rule.rate_limit is not None else self._base_rate_limit
+            if rate != self.bandwidth.rate_limit:
+                self.bandwidth.set_rate_limit(rate)
+                logger.info(f"下载限速: {self.bandwidth.describe()}")
+
+    def _schedule_loop(self):
+        """定期检查时间段是否切换，直到 shutdown() 设置 _schedule_stop"""
+        while not self._schedule_stop.wait(SCHEDULE_CHECK_INTERVAL) and not self._shutting_down:
+            try:
+                self.apply_schedule()
+            except Exception as e:
+                logger.error(f"应用时间段规则失败: {e}")
+
+    def apply_retry_config(self):
+        """按配置更新重试次数和退避时间（之后开始的尝试生效）"""
+        self.retry_policy = RetryPolicy.from_config(config_manager)
+
+    def set_job_rate_limit(self, download_id: str, rate: Optional[int]):
+        """修改单个任务的速度上限（字节/秒，0表示不限速，None表示恢复默认值）"""
+        self.bandwidth.set_job_rate_limit(download_id, rate)
+        logger.info(f"任务限速 {download_id}: {format_speed(self.bandwidth.get_job_rate_limit(download_id)) or '不限速'}")
+
+    def get_job_rate_limit(self, download_id: str) -> int:
+        """单个任务当前的速度上限（字节/秒，0表示不限速）"""
+        return self.bandwidth.get_job_rate_limit(download_id)
+
+    def _consume_bandwidth(self, download_id: str, token: CancelToken, nbytes: int):
+        """分段下载的各连接申请带宽令牌，任务已取消时中断该连接"""
+        token.check()
+        self.bandwidth.consume(download_id, nbytes)
+        token.check()
+
+    def _throttle(self, download_id: str, d: Dict[str, Any]):
+        """按两次进度回调之间新增的字节数申请带宽令牌（在下载线程中等待）"""
+        if d.get('_throttled'):
+            return  # 分段下载器已在各连接中自行申请
+        filename = d.get('tmpfilename') or d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        with self._throttle_lock:
+            last = self._throttle_marks.get(download_id)
+            self._throttle_marks[download_id] = (filename, max(downloaded, last[1]) if last and last[0] == filename else downloaded)
+        if last is None or last[0] != filename:
+            return  # 新文件的第一次回调可能包含续传的已有字节，只记录基准
+        self.bandwidth.consume(download_id, downloaded - last[1])
+
+    def _progress_hook(self, download_id: str, d: Dict[str, Any]) -> bool:
+        """
+        下载进度回调函数
+
+        取消检查和带宽令牌申请在每次回调中进行，进度字段按 progress_interval 采样更新
+
+        Returns:
+            是否更新了进度（未到采样间隔时返回False，不必通知调用方）
+        """
+        progress = self.downloads.get(download_id)
+        if progress is None:
+            return False
+        token = self._cancel_tokens.get(download_id)
+        if token is not None:
+            # 任务已取消时抛出异常中断yt-dlp的传输
+            token.check()
         
         if d['status'] == 'downloading':
-            progress.status = 'downloading'
-            
-            # 更新进度信息
-            if 'total_bytes' in d and d['total_bytes']:
-                progress.total_bytes = d['total_bytes']
-                progress.downloaded_bytes = d.get('downloaded_bytes', 0)
-                progress.progress = (progress.downloaded_bytes / progress.total_bytes) * 100
-            elif 'total_bytes_estimate' in d and d['total_bytes_estimate']:
-                progress.total_bytes = d['total_bytes_estimate']
-                progress.downloaded_bytes = d.get('downloaded_bytes', 0)
-                progress.progress = (progress.downloaded_bytes / progress.total_bytes) * 100
-            
-            # 更新速度和预计时间
-            progress.speed = d.get('_speed_str', '')
-            progress.eta = d.get('_eta_str', '')
-            
-            # 格式化文件大小
-            if progress.total_bytes > 0:
-                progress.file_size = self._format_bytes(progress.total_bytes)
+            tmpfilename = d.get('tmpfilename')
+            if tmpfilename:
+                self._partial_files.setdefault(download_id, set()).add(tmpfilename)
+            self._throttle(download_id, d)
+            if token is not None:
+                token.check()
+            if progress.status != 'downloading':
+                # 例如分离的音频流开始下载时；不覆盖刚被设置的暂停/取消状态
+                with self.download_lock:
+                    changed = progress.status not in ('downloading', 'paused', 'cancelled')
+                    if changed:
+                        progress.status = 'downloading'
+                if changed:
+                    self.progress_channel.publish(download_id, status='downloading')
+
+            downloaded = d.get('downloaded_bytes') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            sample = self.progress_sampler.sample(download_id, downloaded, total)
+            if sample is None:
+                return False
+
+            # 更新进度信息（只保存数值，显示时再格式化；在锁内一起修改，快照不会读到一半）
+            with self.download_lock:
+                progress.speed, progress.eta = sample
+                progress.downloaded_bytes = downloaded
+                if total:
+                    progress.total_bytes = total
+                    progress.progress = downloaded / total * 100
+
+            # 定期把字节偏移写入任务日志，崩溃后可以续传
+            now = time.time()
+            if now - self._journal_marks.get(download_id, 0) >= 2:
+                self._journal_marks[download_id] = now
+                self.journal.update(download_id, downloaded_bytes=progress.downloaded_bytes,
+                                    total_bytes=progress.total_bytes,
+                                    filename=d.get('filename'), tmpfilename=tmpfilename)
+            self.progress_channel.publish(download_id, downloaded_bytes=downloaded)
         
         elif d['status'] == 'finished':
-            progress.status = 'completed'
-            progress.progress = 100.0
-            progress.end_time = datetime.now()
-            logger.info(f"下载完成: {progress.title}")
+            # 只是一个文件下载完成：分离的视频/音频流可能还要继续下载，之后还有合并、后处理和转码，
+            # 任务由 _finish_download 标记为完成
+            with self.download_lock:
+                progress.progress = 100.0
+                progress.speed, progress.eta = 0.0, None
+            self.progress_channel.publish(download_id, downloaded_bytes=progress.downloaded_bytes)
+            logger.info(f"文件下载完成: {d.get('filename') or progress.title}")
         
         elif d['status'] == 'error':
-            progress.status = 'error'
-            progress.error_message = str(d.get('error', '未知错误'))
-            progress.end_time = datetime.now()
+            with self.download_lock:
+                progress.status = 'error'
+                progress.error_message = str(d.get('error', '未知错误'))
+                progress.end_time = time.time()
+            self.progress_channel.publish(download_id, status=progress.status)
             logger.error(f"下载失败: {progress.title} - {progress.error_message}")
+        return True
     
     def _format_bytes(self, bytes_value: int) -> str:
         """格式化字节数为可读格式"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if bytes_value < 1024.0:
-                return f"{bytes_value:.1f} {unit}"
-            bytes_value /= 1024.0
-        return f"{bytes_value:.1f} TB"
+        return format_bytes(bytes_value)
     
-    def get_video_info(self, url: str) -> Optional[Dict[str, Any]]:
-        """获取视频信息"""
+    def get_video_info(self, url: str, use_cache: bool = None) -> Optional[Dict[str, Any]]:
+        """
+        获取视频信息
+
+        Args:
+            url: 视频URL
+            use_cache: 是否使用磁盘缓存，默认跟随配置（use_info_cache）
+        """
+        if use_cache is None:
+            use_cache = self.use_info_cache
+
         try:
             # 验证URL
             normalized_url, error = URLValidator.validate_and_normalize(url)
@@ -320,43 +532,54 @@ class VideoDownloader:
                 logger.error(f"URL验证失败: {error}")
                 return None
 
-            # 配置yt-dlp选项
-            opts = {
-                'quiet': True,
-                'no_warnings': True,
-                'extract_flat': False,
-                'ignoreerrors': True,  # 忽略某些错误，继续获取可用信息
-            }
-
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(normalized_url, download=False)
-
-                if not info:
-                    logger.warning("无法获取视频信息")
-                    return None
-
-                # 安全地获取各种信息，处理可能的None值
-                return {
-                    'title': info.get('title', '未知标题'),
-                    'duration': info.get('duration', 0),
-                    'uploader': info.get('uploader', '未知上传者'),
-                    'upload_date': info.get('upload_date', ''),
-                    'view_count': info.get('view_count', 0),
-                    'description': info.get('description', ''),
-                    'thumbnail': info.get('thumbnail', ''),
-                    'formats': info.get('formats', []),
-                    'url': normalized_url
+            info = self.info_cache.get(normalized_url) if use_cache else None
+            if info:
+                logger.info(f"视频信息命中缓存: {normalized_url}")
+            else:
+                # 配置yt-dlp选项
+                opts = {
+                    'quiet': True,
+                    'no_warnings': True,
+                    'extract_flat': False,
+                    'ignoreerrors': True,  # 忽略某些错误，继续获取可用信息
                 }
 
+                with _load_yt_dlp().YoutubeDL(opts) as ydl:
+                    info = ydl.extract_info(normalized_url, download=False)
+
+                    if not info:
+                        logger.warning("无法获取视频信息")
+                        return None
+
+                    info = ydl.sanitize_info(info)
+                    self.info_cache.put(normalized_url, info)
+
+            # 安全地获取各种信息，处理可能的None值
+            return {
+                'title': info.get('title', '未知标题'),
+                'duration': info.get('duration', 0),
+                'uploader': info.get('uploader', '未知上传者'),
+                'upload_date': info.get('upload_date', ''),
+                'view_count': info.get('view_count', 0),
+                'description': info.get('description', ''),
+                'thumbnail': info.get('thumbnail', ''),
+                'formats': info.get('formats', []),
+                'url': normalized_url
+            }
+
         except Exception as e:
             logger.error(f"获取视频信息失败: {e}")
             return None
-    
-    def start_download(self, url: str, output_path: str = None, 
-                      progress_callback: Callable = None) -> str:
-        """开始下载视频"""
-        # 生成下载ID
-        download_id = f"download_{int(time.time() * 1000)}"
+
+    def purge_info_cache(self) -> int:
+        """清空视频信息缓存，返回删除的条目数"""
+        return self.info_cache.purge()
+
+    def start_download(self, url: str, output_path: str = None,
+                      progress_callback: Callable = None, priority: int = 0) -> str:
+        """开始下载视频（提交到调度队列，priority数值越小越先执行）"""
+        # 生成下载ID（计数器保证同一毫秒内提交的任务也不会重复）
+        download_id = f"download_{int(time.time() * 1000)}_{next(self._id_counter)}"
         
         # 验证URL
         normalized_url, error = URLValidator.validate_and_normalize(url)
@@ -367,277 +590,625 @@ class VideoDownloader:
         # 设置输出路径
         if not output_path:
             output_path = config_manager.get_download_path()
-        
-        # 创建下载进度对象
-        progress = DownloadProgress()
-        progress.url = normalized_url
-        progress.start_time = datetime.now()
-        
+
+        # 已下载过的视频直接跳过（只查本地索引，不发起任何网络请求）
+        if self.use_archive:
+            archived = self.archive.lookup_url(normalized_url)
+            if archived:
+                self._mark_skipped(download_id, normalized_url, archived.get('title'))
+                self.journal.record(download_id, normalized_url, output_path, status='skipped')
+                return download_id
+
+        self.journal.record(download_id, normalized_url, output_path)
+        self._enqueue(download_id, normalized_url, output_path, progress_callback, priority)
+        return download_id
+
+    def _enqueue(self, download_id: str, url: str, output_path: str,
+                 progress_callback: Callable = None, priority: int = 0,
+                 format_override: str = None, progress: DownloadProgress = None) -> DownloadProgress:
+        """创建进度对象（或使用预先填好的 progress）并提交到调度器，有空闲槽位时立即执行"""
+        progress = progress or DownloadProgress(url)
+        progress.start_time = progress.queued_at = time.time()
+
         with self.download_lock:
             self.downloads[download_id] = progress
-        
-        # 检查并发下载限制
-        if self.active_downloads >= self.max_concurrent:
-            progress.status = 'waiting'
+        self.progress_channel.publish(download_id, status=progress.status)
+
+        if self.scheduler.active_count >= self.scheduler.max_workers:
             logger.info(f"下载任务排队中: {download_id}")
-        
-        # 启动下载线程
-        download_thread = threading.Thread(
-            target=self._download_worker,
-            args=(download_id, normalized_url, output_path, progress_callback)
+        self._submit(download_id, url, output_path, progress_callback, priority, format_override)
+        return progress
+
+    def _submit(self, download_id: str, url: str, output_path: str,
+                progress_callback: Callable = None, priority: int = 0, format_override: str = None,
+                delay: float = 0.0):
+        """提交到调度器（按平台排队，delay秒后才可以开始）"""
+        self._submissions[download_id] = (url, output_path, progress_callback, priority, format_override)
+        self.scheduler.submit(
+            download_id,
+            lambda: self._download_worker(download_id, url, output_path, progress_callback,
+                                          format_override, priority),
+            priority,
+            key=host_key(url),
+            delay=delay
         )
-        download_thread.daemon = True
-        download_thread.start()
-        
-        return download_id
+
+    def _retry_later(self, download_id: str, url: str, output_path: str, error: Exception,
+                     progress_callback: Callable = None, priority: int = 0,
+                     format_override: str = None) -> bool:
+        """
+        下载失败后决定是否重试，并记录本次尝试的耗时和结果
+
+        平台限流（429/412/403）时让该平台退避后重新排队；其他可重试的错误按带抖动的
+        指数退避延迟重新排队（等待期间不占用下载槽位），沿用已选择的格式从 .part 文件续传
+
+        Returns:
+            是否已重新排队（不可重试或已达到重试次数上限时返回False）
+        """
+        kind, reason = classify_error(error)
+        with self.download_lock:
+            progress = self.downloads.get(download_id)
+            if progress is None:
+                return False
+            if kind == THROTTLED:
+                delay = self.host_limiter.record_throttled(host_key(url), throttle_status(error))
+                allowed = progress.throttle_retries < self.host_limiter.throttle_retries
+            elif kind == RETRYABLE:
+                allowed = progress.retries < self.retry_policy.attempts
+                delay = self.retry_policy.delay(progress.retries + 1) if allowed else 0.0
+            else:
+                allowed, delay = False, 0.0
+            attempt = progress.attempts[-1] if progress.attempts else AttemptRecord(1)
+            attempt.finish(error, kind, delay if allowed else 0.0)
+            if progress.status in ('cancelled', 'paused'):
+                return False
+            if not allowed:
+                if kind == FATAL:
+                    logger.info(f"下载失败（{reason}），不可重试: {download_id}")
+                else:
+                    logger.warning(f"下载失败（{reason}），已达到重试次数上限: {download_id}")
+                return False
+            if kind == THROTTLED:
+                progress.throttle_retries += 1
+                retry, limit = progress.throttle_retries, self.host_limiter.throttle_retries
+            else:
+                progress.retries += 1
+                retry, limit = progress.retries, self.retry_policy.attempts
+            progress.status = 'waiting'
+            progress.error_message = f"{reason}，约 {delay:.0f} 秒后重试 ({retry}/{limit})"
+            progress.queued_at = time.time() + (delay if kind == RETRYABLE else 0.0)
+            format_override = progress.format_id or format_override
+
+        self.progress_channel.publish(download_id, status='waiting')
+        self.journal.update(download_id, status='waiting', error_message=progress.error_message)
+        logger.warning(f"第 {attempt.number} 次尝试下载失败（{reason}），耗时 {attempt.duration:.1f} 秒，"
+                       f"约 {delay:.1f} 秒后重试 ({retry}/{limit}): {download_id}")
+        # 平台限流的等待由主机限流器控制，其他错误由调度器延迟派发
+        self._submit(download_id, url, output_path, progress_callback, priority, format_override,
+                     delay=delay if kind == RETRYABLE else 0.0)
+        return True
+
+    def _mark_skipped(self, download_id: str, url: str, title: str = None) -> DownloadProgress:
+        """创建"已跳过"状态的进度对象（视频已在下载归档中）"""
+        progress = DownloadProgress(url)
+        progress.title = title or ""
+        progress.status = 'skipped'
+        progress.progress = 100.0
+        progress.start_time = progress.end_time = time.time()
+        with self.download_lock:
+            self.downloads[download_id] = progress
+        self.progress_channel.publish(download_id, status=progress.status)
+        logger.info(f"视频已在下载归档中，跳过: {url}")
+        return progress
+
+    def resume_unfinished(self, progress_callback: Callable = None) -> list:
+        """
+        从任务日志中恢复未完成的下载任务
+
+        沿用原来的下载ID、输出目录和已选择的格式，yt-dlp会从 .part 文件
+        的末尾继续下载
+
+        Returns:
+            重新加入队列的下载ID列表
+        """
+        self.journal.prune()
+        resumed = []
+        for job in self.journal.get_unfinished():
+            download_id = job['download_id']
+            if download_id in self.downloads:
+                continue
+
+            filename = job['filename']
+            if job['status'] == 'converting' and filename and os.path.exists(filename):
+                # 文件已下载完成，只需重新转码
+                progress = DownloadProgress(job['url'])
+                progress.title = job['title'] or ""
+                progress.start_time = time.time()
+                with self.download_lock:
+                    self.downloads[download_id] = progress
+                self._start_conversion(download_id, job['url'], None, filename, progress_callback)
+                logger.info(f"恢复转码任务 {download_id}: {filename}")
+                resumed.append(download_id)
+                continue
+
+            tmpfilename = job['tmpfilename']
+            resumed_bytes = os.path.getsize(tmpfilename) if tmpfilename and os.path.exists(tmpfilename) else 0
+            progress = DownloadProgress(job['url'])
+            progress.title = job['title'] or ""
+            progress.total_bytes = job['total_bytes'] or 0
+            progress.resumed_bytes = progress.downloaded_bytes = resumed_bytes
+            self._enqueue(download_id, job['url'], job['output_path'], progress_callback,
+                          format_override=job['format'], progress=progress)
+            if resumed_bytes:
+                logger.info(f"恢复下载任务 {download_id}，从 {self._format_bytes(resumed_bytes)} 处续传: {job['url']}")
+            else:
+                logger.info(f"恢复下载任务 {download_id}: {job['url']}")
+            resumed.append(download_id)
+
+        if resumed:
+            logger.info(f"共恢复 {len(resumed)} 个未完成的下载任务")
+        return resumed
+
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """获取下载队列统计（排队数、运行数、等待时间）"""
+        stats = self.scheduler.get_stats()
+        transcode = self.transcoder.get_stats()
+        stats['converting'] = transcode['active']
+        stats['convert_queued'] = transcode['queued']
+        stats['schedule'] = self.active_schedule.name if self.active_schedule else None
+        stats['hosts'] = self.host_limiter.get_stats()
+        return stats
 
     def _download_worker(self, download_id: str, url: str, output_path: str,
-                        progress_callback: Callable = None):
-        """下载工作线程"""
+                        progress_callback: Callable = None, format_override: str = None,
+                        priority: int = 0):
+        """下载工作线程（由调度器在获得槽位后调用）"""
+        token = None
+        progress = None
         try:
-            # 等待下载槽位
-            while self.active_downloads >= self.max_concurrent:
-                time.sleep(1)
-
             with self.download_lock:
-                self.active_downloads += 1
-                progress = self.downloads[download_id]
+                progress = self.downloads.get(download_id)
+                if progress is None or progress.status in ('cancelled', 'paused'):
+                    return
+                token = self._cancel_tokens[download_id] = CancelToken()
                 progress.status = 'downloading'
+                progress.wait_time = time.time() - progress.queued_at
+                progress.attempts += (AttemptRecord(len(progress.attempts) + 1, progress.downloaded_bytes),)
+                progress.error_message = ""
+            self.progress_channel.publish(download_id, status='downloading')
+            if progress.wait_time >= 1:
+                logger.info(f"下载任务等待 {progress.wait_time:.1f} 秒后开始: {download_id}")
 
             # 创建进度回调包装器
             def wrapped_progress_hook(d):
-                self._progress_hook(download_id, d)
-                if progress_callback:
-                    progress_callback(download_id, progress)
+                if self._progress_hook(download_id, d) and progress_callback:
+                    progress_callback(download_id, self.get_download_progress(download_id))
 
             # 配置yt-dlp选项
             opts = self._get_ydl_opts(output_path, wrapped_progress_hook, url)
+            opts['bandwidth_throttle'] = functools.partial(self._consume_bandwidth, download_id, token)
+            if format_override:
+                # 恢复任务时优先选择上次的格式，才能续传已有的 .part 文件
+                opts['format'] = f"{format_override}/{opts['format']}"
+            self.journal.update(download_id, status='downloading')
 
             # 开始下载
-            with yt_dlp.YoutubeDL(opts) as ydl:
+            with _load_download_ydl_class()(opts) as ydl:
                 logger.info(f"开始下载视频: {url}")
                 logger.info(f"下载目录: {output_path}")
                 logger.info(f"使用格式选择器: {opts['format']}")
 
-                # 先尝试获取可用格式信息（调试用）
                 try:
-                    info_only = ydl.extract_info(url, download=False)
-                    if info_only and 'formats' in info_only:
-                        available_formats = [f"id:{f.get('format_id', 'unknown')} res:{f.get('height', 'unknown')}p ext:{f.get('ext', 'unknown')}"
-                                           for f in info_only['formats'][:5]]  # 只显示前5个
-                        logger.info(f"可用格式示例: {', '.join(available_formats)}")
-                except Exception as format_error:
-                    logger.warning(f"无法获取格式信息: {format_error}")
-
-                # 直接下载，让yt-dlp在下载过程中获取信息
-                try:
-                    # 使用下载模式，这样可以同时获取信息和下载文件
-                    info = ydl.extract_info(url, download=True)
-
-                    if info:
-                        progress.title = info.get('title', '未知标题')
-                        logger.info(f"下载完成: {progress.title}")
-
-                        # 检查文件是否真的存在
-                        expected_filename = ydl.prepare_filename(info)
-                        if os.path.exists(expected_filename):
-                            logger.info(f"文件保存成功: {expected_filename}")
-                            # 验证文件夹结构
-                            video_folder = os.path.dirname(expected_filename)
-                            logger.info(f"视频保存在文件夹: {video_folder}")
-                        else:
-                            # 尝试查找可能的文件
-                            self._find_downloaded_file_in_folder(output_path, info.get('title', '未知标题'))
+                    # 只提取一次信息：格式日志、文件名预测和实际下载共用同一份结果
+                    info = self._extract_for_download(ydl, url, progress)
+                    if not info:
+                        raise Exception("无法获取视频信息")
+
+                    progress.title = info.get('title', '未知标题')
+                    if self.use_archive:
+                        # URL无法直接识别视频ID时，提取后再按 extractor + id 检查一次
+                        archive_key = archive_key_from_info(info)
+                        if archive_key and self.archive.contains(*archive_key):
+                            with self.download_lock:
+                                progress.status = 'skipped'
+                                progress.progress = 100.0
+                                progress.end_time = time.time()
+                            self.journal.update(download_id, status='skipped', title=progress.title)
+                            self.progress_channel.publish(download_id, status='skipped')
+                            logger.info(f"视频已在下载归档中，跳过: {progress.title}")
+                            return
+
+                    # 信息提取期间无法中断，提取完成后再检查一次是否已取消
+                    token.check()
+                    self._log_available_formats(info)
+                    progress.format_id = info.get('format_id') or ""
+                    self.progress_channel.publish(download_id, title=progress.title)
+                    self.journal.update(download_id, title=progress.title, format=info.get('format_id'))
+
+                    # 通过yt-dlp的process_ie_result直接使用已提取的信息下载，不再重复请求页面
+                    try:
+                        info = ydl.process_ie_result(info, download=True)
+                    except Exception as cached_error:
+                        if not progress.info_from_cache:
+                            raise
+                        # 缓存中的媒体地址可能已失效，重新提取后再试一次
+                        logger.warning(f"使用缓存信息下载失败，重新提取: {cached_error}")
+                        self.info_cache.invalidate(url)
+                        info = self._extract_for_download(ydl, url, progress, use_cache=False)
+                        info = ydl.process_ie_result(info, download=True)
+                    self.host_limiter.record_success(host_key(url))
+                    attempt = progress.attempts[-1]
+                    attempt.finish()
+                    if attempt.number > 1:
+                        logger.info(f"第 {attempt.number} 次尝试下载成功，耗时 {attempt.duration:.1f} 秒"
+                                    f"（续传 {self._format_bytes(attempt.resumed_bytes)}）: {download_id}")
+                    if not progress.info_from_cache:
+                        logger.info(f"复用已提取的视频信息下载，节省一次信息提取（约 {progress.extract_time:.2f} 秒）")
+                    logger.info(f"下载完成: {progress.title}")
+
+                    # 检查文件是否真的存在
+                    expected_filename = self._resolve_downloaded_filename(ydl, info)
+                    if expected_filename and os.path.exists(expected_filename):
+                        logger.info(f"文件保存成功: {expected_filename}")
+                        # 验证文件夹结构
+                        video_folder = os.path.dirname(expected_filename)
+                        logger.info(f"视频保存在文件夹: {video_folder}")
                     else:
-                        progress.title = '未知标题'
-                        logger.warning("下载完成但无法获取视频信息")
+                        # 尝试查找可能的文件
+                        expected_filename = self._find_downloaded_file_in_folder(output_path, progress.title)
 
-                    # 下载成功，检查是否需要转换格式
+                    # 下载成功，需要转换格式时交给转码线程池，立即释放下载槽位
                     if progress.status != 'error':
-                        # 检查并转换AV1格式到H.264
-                        converted_file = self._convert_av1_to_h264_if_needed(expected_filename, info)
-                        if converted_file:
-                            logger.info(f"视频已自动转换为H.264格式: {converted_file}")
-
-                        progress.status = 'completed'
-                        progress.progress = 100.0
-                        progress.end_time = datetime.now()
+                        if expected_filename and self._needs_conversion(info):
+                            self._start_conversion(download_id, url, info, expected_filename, progress_callback)
+                        else:
+                            self._finish_download(download_id, url, info, expected_filename)
 
                 except Exception as download_error:
                     logger.error(f"下载过程中出错: {download_error}")
                     raise download_error
 
         except Exception as e:
+            if token is not None and token.cancelled:
+                if progress.status == 'cancelled':
+                    # yt-dlp已退出，临时文件不再被占用
+                    removed = remove_partial_files(self._partial_files.pop(download_id, ()))
+                    logger.info(f"已中断下载{f'并删除 {removed} 个临时文件' if removed else ''}: {download_id}")
+                elif self._shutting_down:
+                    logger.info(f"下载器停止，保留已下载的 {self._format_bytes(progress.downloaded_bytes)}，"
+                                f"下次启动时续传: {download_id}")
+                else:
+                    progress.attempts[-1].finish(kind='paused')
+                    logger.info(f"下载已暂停，保留已下载的 {self._format_bytes(progress.downloaded_bytes)}: {download_id}")
+                return
+            if self._retry_later(download_id, url, output_path, e, progress_callback,
+                                 priority, format_override):
+                return
             with self.download_lock:
                 progress = self.downloads[download_id]
                 progress.status = 'error'
                 progress.error_message = str(e)
-                progress.end_time = datetime.now()
+                progress.end_time = time.time()
+            self.progress_channel.publish(download_id, status='error')
+            self.journal.update(download_id, status='error', error_message=str(e))
             logger.error(f"下载失败: {e}")
 
         finally:
+            self._journal_marks.pop(download_id, None)
+            self.progress_sampler.remove(download_id)
+            self.bandwidth.release_bucket(download_id)
+            with self._throttle_lock:
+                self._throttle_marks.pop(download_id, None)
             with self.download_lock:
-                self.active_downloads -= 1
+                self._cancel_tokens.pop(download_id, None)
+                status = progress.status if progress else None
+                finished = status not in ('paused', 'waiting')
+                if finished:
+                    self._partial_files.pop(download_id, None)
+                    self._submissions.pop(download_id, None)
+                # 暂停后在本线程退出前又被继续：此时才重新排队，避免两个线程同时写同一个 .part 文件
+                resubmit = token is not None and token.cancelled and status == 'waiting'
+            if finished:
+                # 暂停和重试时保留任务单独设置的限速，任务结束后才清除
+                self.bandwidth.forget_job(download_id)
+            if resubmit:
+                self._submit(download_id, url, output_path, progress_callback, priority,
+                             progress.format_id or format_override)
+
+    def _needs_conversion(self, info: Dict[str, Any]) -> bool:
+        """是否需要进入转码阶段（yt-dlp已知编码且不是AV1时直接跳过）"""
+        if not config_manager.getboolean('DEFAULT', 'auto_convert_av1_to_h264'):
+            return False
+        if not (self.ffmpeg.available and self.ffmpeg.ffprobe_available):
+            logger.warning("ffmpeg或ffprobe未安装，无法进行格式转换")
+            return False
+        vcodec = (info or {}).get('vcodec') or ''
+        return not vcodec or vcodec == 'none' or vcodec.startswith(('av01', 'av1'))
+
+    def _start_conversion(self, download_id: str, url: str, info: Optional[Dict[str, Any]],
+                          filename: str, progress_callback: Callable = None):
+        """把已下载的文件交给转码线程池"""
+        progress = self.downloads[download_id]
+        progress.status = 'converting'
+        self.progress_channel.publish(download_id, status='converting')
+        self.journal.update(download_id, status='converting', filename=filename,
+                            downloaded_bytes=progress.downloaded_bytes)
+
+        def on_converted(result):
+            if self._shutting_down:
+                # 转码被 shutdown() 中断：任务日志保持 converting，下次启动时重新转码
+                return
+            with self.download_lock:
+                if progress.status == 'cancelled':
+                    return
+                progress.convert_action = result.action
+                progress.convert_time = result.elapsed
+            if result.converted:
+                logger.info(f"视频已自动转换为H.264格式（{result.description}，耗时 {result.elapsed:.1f} 秒）: {result.output}")
+            elif result.error:
+                logger.warning(f"自动转换失败，保留原文件: {result.error}")
+            self._finish_download(download_id, url, info, result.output if result.converted else filename)
+            if progress_callback:
+                progress_callback(download_id, self.get_download_progress(download_id))
+
+        self.transcoder.submit(download_id, filename, on_converted)
+
+    def _finish_download(self, download_id: str, url: str, info: Optional[Dict[str, Any]], filename: str):
+        """写入任务日志和下载归档后标记下载完成（调用方看到完成状态时输出文件已全部就绪）"""
+        progress = self.downloads[download_id]
+        if progress.status == 'cancelled':
+            return
+        self.journal.update(download_id, status='completed', filename=filename,
+                            downloaded_bytes=progress.downloaded_bytes)
+        self.archive.record_download(url, info, filename)
+        with self.download_lock:
+            if progress.status == 'cancelled':
+                return
+            progress.status = 'completed'
+            progress.progress = 100.0
+            progress.end_time = time.time()
+        self.progress_channel.publish(download_id, status='completed')
+
+    def _extract_for_download(self, ydl, url: str, progress: DownloadProgress,
+                              use_cache: bool = None) -> Optional[Dict[str, Any]]:
+        """
+        获取下载所需的视频信息
+
+        优先使用足够新的缓存（媒体地址通常带有时效签名，因此下载只复用
+        download_reuse_max_age 以内的缓存），否则提取并写入缓存
+        """
+        if use_cache is None:
+            use_cache = self.use_info_cache
+
+        progress.info_from_cache = False
+        if use_cache:
+            max_age = config_manager.getint('CACHE', 'download_reuse_max_age', 600)
+            info = self.info_cache.get(url, max_age=max_age)
+            if info:
+                progress.info_from_cache = True
+                logger.info(f"使用缓存的视频信息: {url}")
+                return info
+
+        extract_start = time.time()
+        info = ydl.extract_info(url, download=False)
+        progress.extract_time = time.time() - extract_start
+        if info:
+            info = ydl.sanitize_info(info)
+            self.info_cache.put(url, info)
+        return info
+
+    def _log_available_formats(self, info: Dict[str, Any]):
+        """记录可用格式示例（调试用）"""
+        formats = info.get('formats') or []
+        if formats:
+            available_formats = [f"id:{f.get('format_id', 'unknown')} res:{f.get('height', 'unknown')}p ext:{f.get('ext', 'unknown')}"
+                               for f in formats[:5]]  # 只显示前5个
+            logger.info(f"可用格式示例: {', '.join(available_formats)}")
+
+    def _resolve_downloaded_filename(self, ydl, info: Dict[str, Any]) -> Optional[str]:
+        """获取下载（及后处理）完成后的实际文件路径"""
+        if not info:
+            return None
+        for requested in info.get('requested_downloads') or []:
+            if requested.get('filepath'):
+                return requested['filepath']
+        try:
+            return ydl.prepare_filename(info)
+        except Exception:
+            return None
 
     def cancel_download(self, download_id: str) -> bool:
-        """取消下载"""
+        """
+        取消下载
+
+        排队中的任务直接移出队列；正在下载的任务在下一次进度回调时中断传输，
+        删除 .part 等临时文件后释放下载槽位，排队的任务随即开始；正在转码的任务终止ffmpeg进程
+        """
         try:
-            if download_id in self.downloads:
-                progress = self.downloads[download_id]
-                if progress.status in ['waiting', 'downloading']:
-                    progress.status = 'cancelled'
-                    progress.end_time = datetime.now()
-                    logger.info(f"下载已取消: {download_id}")
-                    return True
-            return False
+            with self.download_lock:
+                progress = self.downloads.get(download_id)
+                if progress is None or progress.status not in ['waiting', 'downloading', 'paused', 'converting']:
+                    return False
+                progress.status = 'cancelled'
+                progress.end_time = time.time()
+                token = self._cancel_tokens.get(download_id)
+                if token is None:
+                    # 没有正在执行的下载线程（排队中或已暂停），由这里清理之前留下的临时文件
+                    partial_files = self._partial_files.pop(download_id, ())
+                    self._submissions.pop(download_id, None)
+            if token is not None:
+                token.cancel()
+            else:
+                remove_partial_files(partial_files)
+            # 清除任务的令牌桶和单独设置的限速，同时唤醒正在等待带宽令牌的下载线程
+            self.bandwidth.forget_job(download_id)
+            self.scheduler.cancel(download_id)
+            self.transcoder.cancel(download_id)
+            self.progress_channel.publish(download_id, status='cancelled')
+            self.journal.update(download_id, status='cancelled')
+            logger.info(f"下载已取消: {download_id}")
+            return True
         except Exception as e:
             logger.error(f"取消下载失败: {e}")
             return False
 
-    def get_download_progress(self, download_id: str) -> Optional[DownloadProgress]:
-        """获取下载进度"""
-        return self.downloads.get(download_id)
+    def pause_download(self, download_id: str) -> bool:
+        """
+        暂停下载
+
+        正在下载的任务在下一次进度回调时中断传输，保留 .part 文件并释放下载槽位，
+        排队的任务随即开始；排队中的任务移出队列。resume_download() 继续时沿用已选择的
+        格式，从已下载的位置续传
+        """
+        with self.download_lock:
+            progress = self.downloads.get(download_id)
+            if (progress is None or progress.status not in ['waiting', 'downloading']
+                    or download_id not in self._submissions):
+                return False
+            progress.status = 'paused'
+            progress.speed, progress.eta = 0.0, None
+            token = self._cancel_tokens.get(download_id)
+        if token is not None:
+            token.cancel()
+            self.bandwidth.release_bucket(download_id)
+        self.scheduler.cancel(download_id)
+        self.progress_channel.publish(download_id, status='paused')
+        self.journal.update(download_id, status='paused', downloaded_bytes=progress.downloaded_bytes)
+        logger.info(f"下载已暂停: {download_id}")
+        return True
+
+    def resume_download(self, download_id: str) -> bool:
+        """继续已暂停的下载（按原来的优先级重新排队）"""
+        with self.download_lock:
+            progress = self.downloads.get(download_id)
+            submission = self._submissions.get(download_id)
+            if progress is None or progress.status != 'paused' or submission is None:
+                return False
+            progress.status = 'waiting'
+            progress.queued_at = time.time()
+            progress.error_message = ""
+            # 下载线程还在退出过程中时，由该线程退出后重新排队
+            running = download_id in self._cancel_tokens
+        self.progress_channel.publish(download_id, status='waiting')
+        self.journal.update(download_id, status='waiting')
+        if not running:
+            url, output_path, progress_callback, priority, format_override = submission
+            self._submit(download_id, url, output_path, progress_callback, priority,
+                         progress.format_id or format_override)
+        logger.info(f"继续下载: {download_id}")
+        return True
+
+    def cancel_all(self, wait: float = 0.0) -> int:
+        """
+        取消所有未结束的任务
+
+        Args:
+            wait: 最多等待多少秒，让下载线程和转码进程退出并清理临时文件
+
+        Returns:
+            取消的任务数
+        """
+        with self.download_lock:
+            download_ids = [download_id for download_id, progress in self.downloads.items()
+                            if progress.status in ['waiting', 'downloading', 'converting']]
+        cancelled = sum(1 for download_id in download_ids if self.cancel_download(download_id))
+        if wait > 0:
+            self.wait_idle(wait)
+        return cancelled
+
+    def shutdown(self, wait: float = 0.0) -> int:
+        """
+        停止所有下载和转码，但不取消任务（守护进程退出时使用）
+
+        与 cancel_all() 不同，任务日志中的状态保持 waiting/downloading/converting，
+        .part 文件保留，下次启动时由 resume_unfinished() 续传
+
+        Args:
+            wait: 最多等待多少秒，让下载线程和转码进程退出
+
+        Returns:
+            被中断的下载和转码数
+        """
+        self._shutting_down = True
+        self._schedule_stop.set()
+        # 排队中的任务不再开始
+        self.scheduler.shutdown()
+        self.transcoder.scheduler.shutdown()
+        with self.download_lock:
+            tokens = list(self._cancel_tokens.items())
+            converting = [download_id for download_id, progress in self.downloads.items()
+                          if progress.status == 'converting']
+        for download_id, token in tokens:
+            token.cancel()
+            # 唤醒正在等待带宽令牌的下载线程
+            self.bandwidth.release_bucket(download_id)
+        interrupted = len(tokens) + sum(1 for download_id in converting if self.transcoder.cancel(download_id))
+        if wait > 0:
+            self.wait_idle(wait)
+        logger.info(f"下载器已停止，中断了 {interrupted} 个任务，下次启动时继续")
+        return interrupted
+
+    def wait_idle(self, timeout: float) -> bool:
+        """等待正在进行的下载和转码结束，返回是否在超时前全部结束"""
+        deadline = time.monotonic() + timeout
+        while self.scheduler.active_count or self.transcoder.scheduler.active_count:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def get_download_progress(self, download_id: str) -> Optional[ProgressSnapshot]:
+        """获取下载进度的快照（不可变，不会随下载线程的更新而变化）"""
+        with self.download_lock:
+            progress = self.downloads.get(download_id)
+            return progress.snapshot() if progress is not None else None
+
+    def get_all_downloads(self, download_ids: Iterable[str] = None) -> Dict[str, ProgressSnapshot]:
+        """
+        获取下载任务的快照（在同一次加锁中复制，各任务的进度来自同一时刻）
+
+        Args:
+            download_ids: 只获取这些任务（不存在的ID被忽略），默认获取全部任务
 
-    def get_all_downloads(self) -> Dict[str, DownloadProgress]:
-        """获取所有下载任务"""
-        return self.downloads.copy()
+        Returns:
+            下载ID -> 进度快照
+        """
+        with self.download_lock:
+            if download_ids is None:
+                return {download_id: progress.snapshot() for download_id, progress in self.downloads.items()}
+            return {download_id: self.downloads[download_id].snapshot()
+                    for download_id in download_ids if download_id in self.downloads}
 
-    def clear_completed_downloads(self):
-        """清除已完成的下载任务"""
+    def clear_completed_downloads(self) -> list:
+        """清除已完成的下载任务，返回被清除的下载ID"""
         with self.download_lock:
             completed_ids = [
                 download_id for download_id, progress in self.downloads.items()
-                if progress.status in ['completed', 'error', 'cancelled']
+                if progress.status in ['completed', 'error', 'cancelled', 'skipped']
             ]
             for download_id in completed_ids:
                 del self.downloads[download_id]
             logger.info(f"清除了 {len(completed_ids)} 个已完成的下载任务")
+        return completed_ids
 
     def get_download_statistics(self) -> Dict[str, int]:
         """获取下载统计信息"""
+        with self.download_lock:
+            statuses = [progress.status for progress in self.downloads.values()]
         stats = {
-            'total': len(self.downloads),
+            'total': len(statuses),
             'waiting': 0,
             'downloading': 0,
+            'paused': 0,
+            'converting': 0,
             'completed': 0,
             'error': 0,
-            'cancelled': 0
+            'cancelled': 0,
+            'skipped': 0
         }
 
-        for progress in self.downloads.values():
-            if progress.status in stats:
-                stats[progress.status] += 1
+        for status in statuses:
+            if status in stats:
+                stats[status] += 1
 
         return stats
-
-    def _convert_av1_to_h264_if_needed(self, video_file_path: str, video_info: dict) -> str:
-        """
-        检查视频是否为AV1格式，如果是则自动转换为H.264格式
-
-        Args:
-            video_file_path: 视频文件路径
-            video_info: 视频信息字典
-
-        Returns:
-            转换后的文件路径，如果不需要转换则返回None
-        """
-        try:
-            # 检查是否启用自动转换
-            if not config_manager.getboolean('DEFAULT', 'auto_convert_av1_to_h264'):
-                logger.info("自动AV1转H.264功能已禁用")
-                return None
-            if not os.path.exists(video_file_path):
-                logger.warning(f"视频文件不存在，无法检查格式: {video_file_path}")
-                return None
-
-            # 检查视频编码格式
-            import subprocess
-
-            # 使用ffprobe检查视频编码
-            cmd = [
-                'ffprobe', '-v', 'quiet', '-select_streams', 'v:0',
-                '-show_entries', 'stream=codec_name', '-of', 'csv=p=0',
-                video_file_path
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
-
-            if result.returncode != 0:
-                logger.warning(f"无法检查视频编码格式: {video_file_path}")
-                return None
-
-            codec = result.stdout.strip().lower()
-            logger.info(f"检测到视频编码格式: {codec}")
-
-            # 如果不是AV1格式，不需要转换
-            if codec != 'av1':
-                logger.info(f"视频已是兼容格式({codec})，无需转换")
-                return None
-
-            logger.info(f"检测到AV1格式，开始自动转换为H.264...")
-
-            # 生成输出文件路径
-            video_path = Path(video_file_path)
-            output_path = video_path.parent / f"{video_path.stem}_h264{video_path.suffix}"
-
-            # FFmpeg转换命令
-            convert_cmd = [
-                'ffmpeg',
-                '-i', video_file_path,
-                '-c:v', 'libx264',           # 使用H.264编码器
-                '-preset', 'medium',         # 编码速度预设
-                '-crf', '23',                # 质量设置（中等质量）
-                '-c:a', 'aac',               # 音频使用AAC编码
-                '-b:a', '128k',              # 音频比特率
-                '-movflags', '+faststart',   # 优化网络播放
-                '-y',                        # 覆盖输出文件
-                str(output_path)
-            ]
-
-            logger.info(f"开始转换: {video_path.name} -> {output_path.name}")
-
-            # 执行转换
-            convert_result = subprocess.run(
-                convert_cmd,
-                capture_output=True,
-                text=True,
-                encoding='utf-8'
-            )
-
-            if convert_result.returncode == 0:
-                logger.info(f"✅ AV1转H.264转换成功: {output_path}")
-
-                # 显示文件大小对比
-                original_size = os.path.getsize(video_file_path) / (1024 * 1024)
-                converted_size = os.path.getsize(output_path) / (1024 * 1024)
-
-                logger.info(f"原文件大小: {original_size:.1f} MB")
-                logger.info(f"转换后大小: {converted_size:.1f} MB")
-
-                # 删除原始AV1文件，保留H.264版本
-                try:
-                    os.remove(video_file_path)
-                    logger.info(f"已删除原始AV1文件: {video_path.name}")
-
-                    # 重命名转换后的文件，去掉_h264后缀
-                    final_path = video_path
-                    os.rename(output_path, final_path)
-                    logger.info(f"已重命名为原文件名: {final_path.name}")
-
-                    return str(final_path)
-
-                except Exception as e:
-                    logger.warning(f"文件操作失败: {e}")
-                    return str(output_path)
-
-            else:
-                logger.error(f"❌ AV1转H.264转换失败")
-                logger.error(f"错误信息: {convert_result.stderr}")
-                return None
-
-        except FileNotFoundError:
-            logger.warning("ffmpeg或ffprobe未安装，无法进行格式转换")
-            return None
-        except Exception as e:
-            logger.error(f"格式转换过程中出错: {e}")
-            return None
@@ -0,0 +1,177 @@
+"""
+ffmpeg能力探测模块
+进程内只探测一次ffmpeg/ffprobe，并按二进制文件的修改时间持久化探测结果
+"""
+import os
+import json
+import shutil
+import threading
+import subprocess
+from typing import Dict, Any, List, Optional
+
+from utils.logger import logger
+
+
+# 探测结果缓存文件
+DEFAULT_CACHE_FILE = os.path.join('config', 'cache', 'ffmpeg_capabilities.json')
+
+# 硬件H.264编码器（按优先级排序）
+HW_H264_ENCODERS = ('h264_nvenc', 'h264_qsv', 'h264_vaapi')
+
+
+class FFmpegCapabilities:
+    """ffmpeg/ffprobe能力信息"""
+
+    def __init__(self, ffmpeg_path: str = None, ffprobe_path: str = None,
+                 version: str = "", encoders: List[str] = None):
+        self.ffmpeg_path = ffmpeg_path
+        self.ffprobe_path = ffprobe_path
+        self.version = version
+        self.encoders = set(encoders or [])
+
+    @property
+    def available(self) -> bool:
+        """ffmpeg是否可用"""
+        return bool(self.ffmpeg_path)
+
+    @property
+    def ffprobe_available(self) -> bool:
+        """ffprobe是否可用"""
+        return bool(self.ffprobe_path)
+
+    def has_encoder(self, name: str) -> bool:
+        """是否支持指定编码器"""
+        return name in self.encoders
+
+    @property
+    def hardware_h264_encoders(self) -> List[str]:
+        """可用的硬件H.264编码器（按优先级排序）"""
+        return [name for name in HW_H264_ENCODERS if name in self.encoders]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'ffmpeg_path': self.ffmpeg_path,
+            'ffprobe_path': self.ffprobe_path,
+            'version': self.version,
+            'encoders': sorted(self.encoders),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'FFmpegCapabilities':
+        return cls(data.get('ffmpeg_path'), data.get('ffprobe_path'),
+                   data.get('version', ''), data.get('encoders', []))
+
+
+def _binary_signature(path: Optional[str]) -> Optional[List[Any]]:
+    """二进制文件签名（路径 + 修改时间 + 大小），用于判断缓存是否失效"""
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+        return [path, stat.st_mtime_ns, stat.st_size]
+    except OSError:
+        return None
+
+
+def _run(cmd: List[str]) -> str:
+    """执行命令并返回标准输出"""
+    result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8',
+                            errors='replace', timeout=10)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, cmd)
+    return result.stdout
+
+
+def _parse_encoders(output: str) -> List[str]:
+    """解析 ffmpeg -encoders 的输出"""
+    encoders = []
+    started = False
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith('------'):
+            started = True
+            continue
+        parts = line.split()
+        if started and len(parts) >= 2:
+            encoders.append(parts[1])
+    return encoders
+
+
+def _probe(ffmpeg_path: Optional[str], ffprobe_path: Optional[str]) -> FFmpegCapabilities:
+    """实际探测ffmpeg版本和编码器"""
+    if not ffmpeg_path:
+        return FFmpegCapabilities(None, ffprobe_path)
+
+    try:
+        version_output = _run([ffmpeg_path, '-hide_banner', '-version'])
+        version = version_output.splitlines()[0] if version_output else ""
+        encoders = _parse_encoders(_run([ffmpeg_path, '-hide_banner', '-encoders']))
+        return FFmpegCapabilities(ffmpeg_path, ffprobe_path, version, encoders)
+    except (subprocess.TimeoutExpired, subprocess.CalledProcessError, OSError) as e:
+        logger.warning(f"ffmpeg探测失败: {e}")
+        return FFmpegCapabilities(None, ffprobe_path)
+
+
+def _load_cached(cache_file: str, signature: Dict[str, Any]) -> Optional[FFmpegCapabilities]:
+    """读取签名匹配的缓存结果"""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('signature') == signature:
+            return FFmpegCapabilities.from_dict(data.get('capabilities', {}))
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _save_cached(cache_file: str, signature: Dict[str, Any], capabilities: FFmpegCapabilities):
+    """保存探测结果"""
+    try:
+        cache_dir = os.path.dirname(cache_file)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump({'signature': signature, 'capabilities': capabilities.to_dict()}, f,
+                      ensure_ascii=False, indent=2)
+    except OSError as e:
+        logger.warning(f"保存ffmpeg探测结果失败: {e}")
+
+
+_capabilities = None
+_capabilities_lock = threading.Lock()
+
+
+def get_ffmpeg_capabilities(cache_file: str = DEFAULT_CACHE_FILE,
+                            refresh: bool = False) -> FFmpegCapabilities:
+    """
+    获取ffmpeg能力信息（进程内只探测一次）
+
+    探测结果按 ffmpeg/ffprobe 的路径、修改时间和大小持久化，二进制文件
+    未变化时后续运行直接读取缓存，无需启动子进程
+
+    Args:
+        cache_file: 探测结果缓存文件
+        refresh: 是否忽略缓存强制重新探测
+    """
+    global _capabilities
+
+    with _capabilities_lock:
+        if _capabilities is not None and not refresh:
+            return _capabilities
+
+        ffmpeg_path = shutil.which('ffmpeg')
+        ffprobe_path = shutil.which('ffprobe')
+        signature = {
+            'ffmpeg': _binary_signature(ffmpeg_path),
+            'ffprobe': _binary_signature(ffprobe_path),
+        }
+
+        capabilities = None if refresh else _load_cached(cache_file, signature)
+        if capabilities is None:
+            capabilities = _probe(ffmpeg_path, ffprobe_path)
+            _save_cached(cache_file, signature, capabilities)
+            if capabilities.available:
+                logger.info(f"ffmpeg探测完成: {capabilities.version}")
+
+        _capabilities = capabilities
+        return _capabilities
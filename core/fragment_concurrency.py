@@ -0,0 +1,215 @@
+"""
+分片并发控制模块
+HLS/DASH按分片下载时，由控制器动态决定同时下载的分片数：
+开始时并发翻倍增长（慢启动），之后吞吐量随并发提升时逐个增加，
+增加后没有收益时退回上一个并发数，服务器出错（429/5xx/超时等）时并发减半（AIMD）。
+同一主机上次收敛到的并发数会作为下一个任务的初始值
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from yt_dlp.networking.exceptions import HTTPError
+from yt_dlp.utils import DownloadError
+
+from utils.logger import logger
+from utils.formatters import format_speed
+
+
+# 吞吐量提升超过该比例才认为增加并发有收益
+GAIN_THRESHOLD = 0.05
+
+# 每个观测窗口至少包含的分片数和时长（秒）
+MIN_WINDOW_FRAGMENTS = 4
+MIN_WINDOW_SECONDS = 0.5
+
+# 增加并发无收益或出错后，保持当前并发的窗口数
+HOLD_WINDOWS = 3
+
+# 分片出错后重新申请槽位前的等待时间（秒，按重试次数翻倍）
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+
+# 各主机最近一次收敛到的并发数
+_learned_limits: Dict[str, int] = {}
+_learned_lock = threading.Lock()
+
+
+def _host(url: str) -> str:
+    return urlparse(url or '').hostname or ''
+
+
+def learned_limit(url: str) -> Optional[int]:
+    """主机上次使用的并发数"""
+    with _learned_lock:
+        return _learned_limits.get(_host(url))
+
+
+def remember_limit(url: str, limit: int):
+    """记录主机收敛到的并发数"""
+    with _learned_lock:
+        _learned_limits[_host(url)] = limit
+
+
+class AdaptiveConcurrency:
+    """分片并发控制器（线程安全）"""
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1, name: str = ""):
+        """
+        Args:
+            initial: 初始并发数
+            maximum: 并发上限（下载线程池的大小）
+            minimum: 并发下限
+            name: 日志中显示的名称
+        """
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.name = name
+        self.errors = 0
+        self.adjustments = 0
+        self._cond = threading.Condition()
+        self._active = 0
+        self._last_throughput = None
+        self._previous_limit = None  # 上次增加并发前的并发数（None表示上个窗口没有增加）
+        self._slow_start = True
+        self._hold = 0
+        self._reset_window()
+
+    def _reset_window(self):
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._window_fragments = 0
+
+    @contextmanager
+    def slot(self):
+        """占用一个下载槽位，超过当前并发数时等待"""
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify()
+
+    def _set_limit(self, limit: int, reason: str):
+        """修改并发数（需持有锁）"""
+        limit = min(max(limit, self.minimum), self.maximum)
+        if limit == self.limit:
+            return
+        logger.info(f"分片并发调整{f' [{self.name}]' if self.name else ''}: {self.limit} -> {limit}（{reason}）")
+        self.limit = limit
+        self.adjustments += 1
+        self._cond.notify_all()
+
+    def record_success(self, nbytes: int):
+        """记录一个成功下载的分片，窗口结束时根据吞吐量调整并发"""
+        with self._cond:
+            self._window_bytes += nbytes
+            self._window_fragments += 1
+            elapsed = time.monotonic() - self._window_start
+            if (self._window_fragments < max(MIN_WINDOW_FRAGMENTS, self.limit)
+                    or elapsed < MIN_WINDOW_SECONDS):
+                return
+
+            throughput = self._window_bytes / elapsed
+            last = self._last_throughput
+            self._last_throughput = throughput
+            self._reset_window()
+
+            previous = self._previous_limit
+            self._previous_limit = None
+            if self._hold > 0:
+                self._hold -= 1
+                return
+            if previous is not None and last and throughput < last * (1 + GAIN_THRESHOLD):
+                # 上次增加并发没有带来收益，退回并保持一段时间，之后只逐个增加
+                self._slow_start = False
+                self._hold = HOLD_WINDOWS
+                self._set_limit(previous, f"增加并发无收益，吞吐 {format_speed(throughput)}")
+            elif self.limit < self.maximum:
+                self._previous_limit = self.limit
+                step = self.limit if self._slow_start else 1
+                self._set_limit(self.limit + step, f"吞吐 {format_speed(throughput)}")
+
+    def record_error(self, error: Optional[Exception] = None):
+        """记录一次分片下载失败：并发减半"""
+        with self._cond:
+            self.errors += 1
+            self._previous_limit = None
+            self._slow_start = False
+            self._hold = HOLD_WINDOWS
+            self._last_throughput = None
+            self._reset_window()
+            self._set_limit(self.limit // 2, f"服务器错误: {error}" if error else "分片下载失败")
+
+
+class AdaptiveFragmentMixin:
+    """
+    为yt-dlp的分片下载器（HlsFD/DashSegmentsFD）加入并发控制。
+    yt-dlp按 concurrent_fragment_downloads 创建线程池（作为并发上限），
+    每个分片下载前再向控制器申请槽位；分片出错时先释放槽位，
+    等待后按降低后的并发重新申请，避免出错的请求立即在原有并发下重试
+    """
+
+    concurrency: Optional[AdaptiveConcurrency] = None
+
+    def real_download(self, filename, info_dict):
+        url = info_dict.get('url')
+        maximum = self.params.get('concurrent_fragment_downloads') or 1
+        initial = learned_limit(url) or self.params.get('fragment_concurrency_initial') or maximum
+        self.concurrency = AdaptiveConcurrency(initial, maximum, name=_host(url))
+        try:
+            return super().real_download(filename, info_dict)
+        finally:
+            remember_limit(url, self.concurrency.limit)
+            if self.concurrency.adjustments or self.concurrency.errors:
+                logger.info(f"分片并发: 最终 {self.concurrency.limit}，调整 {self.concurrency.adjustments} 次，"
+                            f"出错 {self.concurrency.errors} 次")
+
+    def _download_fragment(self, ctx, frag_url, info_dict, headers=None, request_data=None):
+        if self.concurrency is None:
+            return super()._download_fragment(ctx, frag_url, info_dict, headers, request_data)
+        retries = self.params.get('fragment_retries', 10)
+        attempt = 0
+        while True:
+            with self.concurrency.slot():
+                try:
+                    success = super()._download_fragment(ctx, frag_url, info_dict, headers, request_data)
+                    break
+                except (DownloadError, HTTPError) as e:
+                    # 4xx（如429）由HttpFD直接抛出HTTPError，5xx在HttpFD重试用尽后变为DownloadError
+                    self.concurrency.record_error(e)
+                    if attempt >= retries:
+                        raise
+            attempt += 1
+            delay = min(RETRY_BASE_DELAY * 2 ** (attempt - 1), RETRY_MAX_DELAY)
+            logger.warning(f"分片 {ctx.get('fragment_index')} 下载出错，{delay:.1f} 秒后重试 ({attempt}/{retries})")
+            time.sleep(delay)
+        if not success:
+            self.concurrency.record_error()
+            return success
+        try:
+            nbytes = os.path.getsize(ctx['fragment_filename_sanitized'])
+        except (OSError, KeyError):
+            nbytes = 0
+        self.concurrency.record_success(nbytes)
+        return success
+
+
+_adaptive_classes = {}
+
+
+def adaptive_downloader_class(fd_cls):
+    """为分片下载器类生成带并发控制的子类（按原类缓存）"""
+    cls = _adaptive_classes.get(fd_cls)
+    if cls is None:
+        cls = type(f'Adaptive{fd_cls.__name__}', (AdaptiveFragmentMixin, fd_cls), {})
+        _adaptive_classes[fd_cls] = cls
+    return cls
@@ -0,0 +1,207 @@
+"""
+主机限流模块
+按平台（URLValidator.detect_platform，无法识别时按主机名）限制同时进行的下载任务数和任务启动间隔。
+平台返回 429/412/403 时暂停向该平台派发任务（指数退避）并将其并发数减半，
+之后每成功一个任务恢复一个并发。调度器跳过暂时不能开始的平台，先派发其他平台的任务
+"""
+import re
+import time
+import random
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from utils.logger import logger
+from utils.validators import URLValidator
+
+
+# 视为平台限流/封禁的HTTP状态码
+THROTTLE_STATUSES = (429, 412, 403)
+
+# 退避时间的随机抖动比例，避免多个任务同时恢复
+BACKOFF_JITTER = 0.2
+
+_HTTP_STATUS = re.compile(r'HTTP Error (\d{3})')
+
+
+def host_key(url: str) -> str:
+    """任务所属的平台（无法识别平台时使用主机名）"""
+    platform = URLValidator.detect_platform(url)
+    if platform and platform != 'unknown':
+        return platform
+    return (urlparse(url or '').hostname or 'unknown').lower()
+
+
+def error_chain(error: BaseException):
+    """依次产出异常链上的异常（包括yt-dlp DownloadError中保存在exc_info里的原始异常）"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        exc_info = getattr(error, 'exc_info', None)
+        error = (exc_info[1] if exc_info else None) or error.__cause__ or error.__context__
+
+
+def http_status(error: BaseException) -> Optional[int]:
+    """单个异常表示的HTTP状态码：优先取status属性，否则从错误信息（HTTP Error 429等）中解析"""
+    status = getattr(error, 'status', None)
+    if isinstance(status, int):
+        return status
+    match = _HTTP_STATUS.search(str(error))
+    return int(match.group(1)) if match else None
+
+
+def throttle_status(error: BaseException) -> Optional[int]:
+    """从异常链中找出表示限流的HTTP状态码（429/412/403）"""
+    for exc in error_chain(error):
+        status = http_status(exc)
+        if status in THROTTLE_STATUSES:
+            return status
+    return None
+
+
+class HostState:
+    """单个平台的限流状态"""
+
+    def __init__(self, limit: int, interval: float):
+        self.max_limit = limit        # 配置的并发上限
+        self.limit = limit            # 当前并发上限（被限流后降低）
+        self.interval = interval      # 相邻两个任务开始的最小间隔（秒）
+        self.active = 0
+        self.strikes = 0              # 连续被限流的次数
+        self.blocked_until = 0.0
+        self.last_start = 0.0
+        self.started = 0
+        self.throttled = 0
+
+
+class HostLimiter:
+    """按平台的并发和请求频率限制（线程安全）"""
+
+    def __init__(self, max_per_host: int = 2, interval: float = 1.0, backoff_base: float = 30,
+                 backoff_max: float = 600, throttle_retries: int = 3,
+                 overrides: Dict[str, tuple] = None):
+        """
+        Args:
+            max_per_host: 每个平台同时进行的任务数上限，0表示不限制
+            interval: 同一平台相邻两个任务开始的最小间隔（秒）
+            backoff_base: 首次被限流后暂停的时长（秒），连续被限流时翻倍
+            backoff_max: 暂停时长上限（秒）
+            throttle_retries: 任务因限流失败后重新排队的最多次数
+            overrides: 平台 -> (并发上限, 启动间隔)，覆盖默认值
+        """
+        self.max_per_host = max(0, int(max_per_host))
+        self.interval = max(0.0, float(interval))
+        self.backoff_base = max(0.0, float(backoff_base))
+        self.backoff_max = max(self.backoff_base, float(backoff_max))
+        self.throttle_retries = max(0, int(throttle_retries))
+        self.overrides = dict(overrides or {})
+        self._hosts: Dict[str, HostState] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> 'HostLimiter':
+        """根据配置创建（[HOSTS]，"平台 = 并发上限, 启动间隔" 形式的条目覆盖默认值）"""
+        overrides = {}
+        for name, text in config.get_host_overrides():
+            try:
+                fields = [field.strip() for field in text.split(',')]
+                limit = int(fields[0])
+                interval = float(fields[1]) if len(fields) > 1 and fields[1] else None
+                overrides[name] = (limit, interval)
+            except (ValueError, IndexError):
+                logger.error(f"无效的平台限流设置 {name}: {text}")
+        return cls(
+            max_per_host=config.getint('HOSTS', 'per_host_concurrency', 2),
+            interval=config.getfloat('HOSTS', 'request_interval', 1.0),
+            backoff_base=config.getfloat('HOSTS', 'backoff_base', 30),
+            backoff_max=config.getfloat('HOSTS', 'backoff_max', 600),
+            throttle_retries=config.getint('HOSTS', 'throttle_retries', 3),
+            overrides=overrides,
+        )
+
+    def _state(self, key: str) -> HostState:
+        """获取平台状态（需持有锁）"""
+        state = self._hosts.get(key)
+        if state is None:
+            limit, interval = self.overrides.get(key, (self.max_per_host, None))
+            state = self._hosts[key] = HostState(limit, self.interval if interval is None else interval)
+        return state
+
+    def start_delay(self, key: str) -> Optional[float]:
+        """
+        平台的下一个任务还需等待多久才能开始
+
+        Returns:
+            0表示可以立即开始；正数为需要等待的秒数（退避或启动间隔）；
+            None表示已达到并发上限，需等待该平台的任务结束
+        """
+        with self._lock:
+            state = self._state(key)
+            if state.limit and state.active >= state.limit:
+                return None
+            now = time.monotonic()
+            return max(0.0, state.blocked_until - now, state.last_start + state.interval - now)
+
+    def active(self, key: str) -> int:
+        """平台正在进行的任务数"""
+        with self._lock:
+            state = self._hosts.get(key)
+            return state.active if state else 0
+
+    def acquire(self, key: str):
+        """任务开始"""
+        with self._lock:
+            state = self._state(key)
+            state.active += 1
+            state.started += 1
+            state.last_start = time.monotonic()
+
+    def release(self, key: str):
+        """任务结束"""
+        with self._lock:
+            state = self._state(key)
+            state.active = max(0, state.active - 1)
+
+    def record_throttled(self, key: str, status: int) -> float:
+        """
+        平台返回了限流状态码：暂停派发并将并发数减半
+
+        Returns:
+            暂停的秒数
+        """
+        with self._lock:
+            state = self._state(key)
+            state.strikes += 1
+            state.throttled += 1
+            backoff = min(self.backoff_base * 2 ** (state.strikes - 1), self.backoff_max)
+            backoff *= random.uniform(1 - BACKOFF_JITTER, 1 + BACKOFF_JITTER)
+            state.blocked_until = max(state.blocked_until, time.monotonic() + backoff)
+            if state.limit:
+                state.limit = max(1, state.limit // 2)
+            logger.warning(f"平台 {key} 返回 HTTP {status}，暂停派发 {backoff:.0f} 秒，并发上限降为 {state.limit or '不限制'}")
+            return backoff
+
+    def record_success(self, key: str):
+        """平台的任务成功完成：清除连续限流计数，逐步恢复并发上限"""
+        with self._lock:
+            state = self._state(key)
+            state.strikes = 0
+            if state.limit and state.limit < state.max_limit:
+                state.limit += 1
+                logger.info(f"平台 {key} 并发上限恢复为 {state.limit}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各平台的限流状态"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                key: {
+                    'active': state.active,
+                    'limit': state.limit,
+                    'started': state.started,
+                    'throttled': state.throttled,
+                    'blocked_for': max(0.0, state.blocked_until - now),
+                }
+                for key, state in self._hosts.items()
+            }
@@ -0,0 +1,189 @@
+"""
+视频信息缓存模块
+将yt-dlp提取的视频信息持久化到磁盘（SQLite），避免重复提取
+"""
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse, parse_qsl, urlencode
+
+from utils.logger import logger
+from utils.validators import URLValidator
+
+
+# 生成缓存键时忽略的跟踪参数
+_TRACKING_PARAMS = {'spm_id_from', 'vd_source', 'share_source', 'share_medium', 'share_plat',
+                    'share_session_id', 'share_tag', 'from', 'si', 'feature', 's', 't'}
+
+
+def make_cache_key(url: str) -> str:
+    """
+    生成缓存键
+
+    支持的平台使用 "平台:视频ID"，其他URL去掉协议、www前缀和跟踪参数后作为键，
+    保证同一视频的不同链接形式命中同一条缓存
+    """
+    video_id = URLValidator.extract_video_id(url)
+    if video_id:
+        return f"{video_id[0]}:{video_id[1]}"
+
+    parsed = urlparse(URLValidator.normalize_url(url))
+    host = parsed.netloc.lower()
+    for prefix in ('www.', 'm.', 'mobile.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    query = sorted((k, v) for k, v in parse_qsl(parsed.query)
+                   if k not in _TRACKING_PARAMS and not k.startswith('utm_'))
+    key = f"{host}{parsed.path.rstrip('/')}"
+    if query:
+        key += f"?{urlencode(query)}"
+    return key
+
+
+class InfoCache:
+    """基于SQLite的视频信息缓存（TTL过期 + LRU淘汰 + 容量上限）"""
+
+    def __init__(self, db_path: str, ttl: int = 3600, max_entries: int = 500,
+                 max_size_mb: int = 100):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_size_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开数据库连接（需持有锁）"""
+        if self._conn is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir and not os.path.exists(db_dir):
+                os.makedirs(db_dir)
+            self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS info_cache (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_info_cache_accessed ON info_cache(accessed)')
+            self._conn.commit()
+        return self._conn
+
+    def get(self, url: str, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存
+
+        Args:
+            url: 视频URL
+            max_age: 最大允许的缓存年龄（秒），默认使用TTL
+
+        Returns:
+            缓存的信息字典，未命中或已过期返回None
+        """
+        key = make_cache_key(url)
+        max_age = self.ttl if max_age is None else min(max_age, self.ttl)
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute('SELECT data, created FROM info_cache WHERE key = ?', (key,)).fetchone()
+                if row is None:
+                    return None
+                data, created = row
+                if now - created > max_age:
+                    return None
+                conn.execute('UPDATE info_cache SET accessed = ? WHERE key = ?', (now, key))
+                conn.commit()
+            return json.loads(zlib.decompress(data).decode('utf-8'))
+        except Exception as e:
+            logger.warning(f"读取信息缓存失败: {e}")
+            return None
+
+    def put(self, url: str, info: Dict[str, Any]):
+        """写入缓存，超出条目数或容量上限时按最近访问时间淘汰"""
+        key = make_cache_key(url)
+        try:
+            data = zlib.compress(json.dumps(info, ensure_ascii=False, default=str).encode('utf-8'))
+            now = time.time()
+            with self._lock:
+                conn = self._connect()
+                conn.execute('INSERT OR REPLACE INTO info_cache (key, url, data, size, created, accessed) '
+                             'VALUES (?, ?, ?, ?, ?, ?)', (key, url, data, len(data), now, now))
+                self._evict(conn, now)
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"写入信息缓存失败: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """删除过期条目并执行LRU淘汰（需持有锁）"""
+        conn.execute('DELETE FROM info_cache WHERE created < ?', (now - self.ttl,))
+        count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM info_cache').fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        rows = conn.execute('SELECT key, size FROM info_cache ORDER BY accessed').fetchall()
+        evicted = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany('DELETE FROM info_cache WHERE key = ?', evicted)
+        logger.debug(f"信息缓存淘汰 {len(evicted)} 条")
+
+    def invalidate(self, url: str):
+        """删除指定URL的缓存"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute('DELETE FROM info_cache WHERE key = ?', (make_cache_key(url),))
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"删除信息缓存失败: {e}")
+
+    def purge(self) -> int:
+        """清空缓存，返回删除的条目数"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                count = conn.execute('DELETE FROM info_cache').rowcount
+                conn.commit()
+                conn.execute('VACUUM')
+            logger.info(f"已清空信息缓存: {count} 条")
+            return count
+        except Exception as e:
+            logger.error(f"清空信息缓存失败: {e}")
+            return 0
+
+    def get_statistics(self) -> Dict[str, int]:
+        """获取缓存统计信息"""
+        try:
+            with self._lock:
+                count, total = self._connect().execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM info_cache').fetchone()
+            return {'entries': count, 'bytes': total}
+        except Exception as e:
+            logger.warning(f"读取缓存统计失败: {e}")
+            return {'entries': 0, 'bytes': 0}
+
+    @classmethod
+    def from_config(cls, config) -> 'InfoCache':
+        """根据配置创建缓存实例"""
+        config_dir = os.path.dirname(config.config_file) or '.'
+        return cls(
+            os.path.join(config_dir, 'cache', 'info_cache.sqlite3'),
+            ttl=config.getint('CACHE', 'info_cache_ttl', 3600),
+            max_entries=config.getint('CACHE', 'info_cache_max_entries', 500),
+            max_size_mb=config.getint('CACHE', 'info_cache_max_size_mb', 100),
+        )
@@ -0,0 +1,136 @@
+"""
+下载任务日志模块
+使用SQLite（WAL模式）持久化下载任务状态，程序崩溃或中断后可恢复未完成的任务
+"""
+import os
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, List
+
+from utils.logger import logger
+
+
+# 视为"未完成"、可以恢复的任务状态
+UNFINISHED_STATUSES = ('waiting', 'downloading', 'paused', 'converting')
+
+# 允许更新的字段
+_FIELDS = ('url', 'output_path', 'format', 'title', 'filename', 'tmpfilename',
+           'status', 'downloaded_bytes', 'total_bytes', 'error_message')
+
+
+class JobJournal:
+    """下载任务日志"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开数据库连接（需持有锁）"""
+        if self._conn is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir and not os.path.exists(db_dir):
+                os.makedirs(db_dir)
+            self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    download_id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    output_path TEXT,
+                    format TEXT,
+                    title TEXT,
+                    filename TEXT,
+                    tmpfilename TEXT,
+                    status TEXT NOT NULL,
+                    downloaded_bytes INTEGER DEFAULT 0,
+                    total_bytes INTEGER DEFAULT 0,
+                    error_message TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)')
+            self._conn.commit()
+        return self._conn
+
+    def record(self, download_id: str, url: str, output_path: str, status: str = 'waiting'):
+        """记录新任务（已存在时只更新状态，保留已下载的进度信息）"""
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute('''
+                    INSERT INTO jobs (download_id, url, output_path, status, created, updated)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(download_id) DO UPDATE SET status = excluded.status, updated = excluded.updated
+                ''', (download_id, url, output_path, status, now, now))
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"记录下载任务失败: {e}")
+
+    def update(self, download_id: str, **fields):
+        """更新任务字段"""
+        fields = {key: value for key, value in fields.items() if key in _FIELDS}
+        if not fields:
+            return
+        fields['updated'] = time.time()
+        assignments = ', '.join(f"{key} = ?" for key in fields)
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(f'UPDATE jobs SET {assignments} WHERE download_id = ?',
+                             (*fields.values(), download_id))
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"更新下载任务失败: {e}")
+
+    def get(self, download_id: str) -> Dict[str, Any]:
+        """获取单个任务记录"""
+        try:
+            with self._lock:
+                row = self._connect().execute('SELECT * FROM jobs WHERE download_id = ?',
+                                              (download_id,)).fetchone()
+            return dict(row) if row else None
+        except Exception as e:
+            logger.warning(f"读取下载任务失败: {e}")
+            return None
+
+    def get_unfinished(self) -> List[Dict[str, Any]]:
+        """获取所有未完成的任务（按创建时间排序）"""
+        placeholders = ', '.join('?' for _ in UNFINISHED_STATUSES)
+        try:
+            with self._lock:
+                rows = self._connect().execute(
+                    f'SELECT * FROM jobs WHERE status IN ({placeholders}) ORDER BY created',
+                    UNFINISHED_STATUSES).fetchall()
+            return [dict(row) for row in rows]
+        except Exception as e:
+            logger.warning(f"读取未完成任务失败: {e}")
+            return []
+
+    def prune(self, max_age_days: int = 7) -> int:
+        """删除早于指定天数的已结束任务，返回删除条数"""
+        placeholders = ', '.join('?' for _ in UNFINISHED_STATUSES)
+        cutoff = time.time() - max_age_days * 86400
+        try:
+            with self._lock:
+                conn = self._connect()
+                count = conn.execute(
+                    f'DELETE FROM jobs WHERE status NOT IN ({placeholders}) AND updated < ?',
+                    (*UNFINISHED_STATUSES, cutoff)).rowcount
+                conn.commit()
+            return count
+        except Exception as e:
+            logger.warning(f"清理下载任务日志失败: {e}")
+            return 0
+
+    @classmethod
+    def from_config(cls, config) -> 'JobJournal':
+        """根据配置创建任务日志实例"""
+        config_dir = os.path.dirname(config.config_file) or '.'
+        return cls(os.path.join(config_dir, 'jobs.sqlite3'))
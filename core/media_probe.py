@@ -0,0 +1,239 @@
+"""
+媒体探测与转换决策模块
+每个文件只调用一次ffprobe（JSON输出，包含全部流的编码和profile），
+据此决定直接封装（remux）、只转码音频还是完整转码
+"""
+import json
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.logger import logger
+
+
+# 目标格式：MP4容器 + H.264视频（8位4:2:0）+ AAC/MP3音频
+TARGET_VIDEO_CODECS = ('h264',)
+COMPATIBLE_AUDIO_CODECS = ('aac', 'mp3')
+COMPATIBLE_PIX_FMTS = ('yuv420p', 'yuvj420p')
+MP4_SUFFIXES = ('.mp4', '.m4v')
+
+
+class MediaInfo:
+    """ffprobe探测结果"""
+
+    def __init__(self, path: str, format_name: str = "", duration: float = 0.0,
+                 size: int = 0, streams: List[Dict[str, Any]] = None):
+        self.path = path
+        self.format_name = format_name
+        self.duration = duration
+        self.size = size
+        self.streams = streams or []
+
+    def _first(self, codec_type: str) -> Optional[Dict[str, Any]]:
+        for stream in self.streams:
+            if stream.get('codec_type') == codec_type:
+                return stream
+        return None
+
+    @property
+    def video(self) -> Optional[Dict[str, Any]]:
+        """第一个视频流"""
+        return self._first('video')
+
+    @property
+    def audio(self) -> Optional[Dict[str, Any]]:
+        """第一个音频流"""
+        return self._first('audio')
+
+    @property
+    def video_codec(self) -> str:
+        return (self.video or {}).get('codec_name', '').lower()
+
+    @property
+    def audio_codec(self) -> str:
+        return (self.audio or {}).get('codec_name', '').lower()
+
+    @property
+    def is_mp4(self) -> bool:
+        """是否为MP4容器（mov/mp4共用同一个demuxer，需结合扩展名判断）"""
+        return 'mp4' in self.format_name and Path(self.path).suffix.lower() in MP4_SUFFIXES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'format_name': self.format_name,
+            'duration': self.duration,
+            'size': self.size,
+            'streams': self.streams,
+        }
+
+    @classmethod
+    def from_dict(cls, path: str, data: Dict[str, Any]) -> 'MediaInfo':
+        return cls(path, data.get('format_name', ''), data.get('duration', 0.0),
+                   data.get('size', 0), data.get('streams', []))
+
+    @classmethod
+    def from_ffprobe(cls, path: str, data: Dict[str, Any]) -> 'MediaInfo':
+        """从 ffprobe -print_format json 的输出创建"""
+        fmt = data.get('format') or {}
+        streams = [
+            {key: stream[key] for key in ('index', 'codec_type', 'codec_name', 'profile', 'pix_fmt',
+                                          'width', 'height', 'bit_rate') if key in stream}
+            for stream in data.get('streams') or []
+        ]
+        try:
+            duration = float(fmt.get('duration') or 0)
+        except ValueError:
+            duration = 0.0
+        return cls(path, fmt.get('format_name', ''), duration, int(fmt.get('size') or 0), streams)
+
+
+def probe_media(ffprobe_path: str, path: str, timeout: int = 60) -> Optional[MediaInfo]:
+    """
+    用一次ffprobe调用获取文件的容器和全部流信息
+
+    Returns:
+        探测结果，ffprobe失败时返回None
+    """
+    cmd = [ffprobe_path, '-v', 'quiet', '-print_format', 'json',
+           '-show_format', '-show_streams', str(path)]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8',
+                                errors='replace', timeout=timeout)
+    except (subprocess.TimeoutExpired, OSError) as e:
+        logger.warning(f"ffprobe执行失败 {path}: {e}")
+        return None
+    if result.returncode != 0:
+        logger.warning(f"无法探测媒体信息: {path}")
+        return None
+    try:
+        return MediaInfo.from_ffprobe(str(path), json.loads(result.stdout or '{}'))
+    except ValueError as e:
+        logger.warning(f"解析ffprobe输出失败 {path}: {e}")
+        return None
+
+
+class ConversionPlan:
+    """转换决策"""
+
+    NONE = 'none'      # 已符合目标格式
+    REMUX = 'remux'    # 只更换容器，音视频流直接复制
+    AUDIO = 'audio'    # 复制视频流，只转码音频
+    FULL = 'full'      # 转码视频（兼容的音频流仍直接复制）
+
+    DESCRIPTIONS = {
+        NONE: '无需转换',
+        REMUX: '直接封装',
+        AUDIO: '仅转码音频',
+        FULL: '完整转码',
+    }
+
+    def __init__(self, action: str, reason: str = "", copy_audio: bool = True):
+        self.action = action
+        self.reason = reason
+        self.copy_audio = copy_audio
+
+    @property
+    def description(self) -> str:
+        return self.DESCRIPTIONS.get(self.action, self.action)
+
+    def __repr__(self):
+        return f"ConversionPlan({self.action!r}, {self.reason!r})"
+
+
+def plan_conversion(media: Optional[MediaInfo], source_codecs=None) -> ConversionPlan:
+    """
+    根据探测结果选择最省的转换路径
+
+    Args:
+        media: 探测结果，None表示探测失败（按完整转码处理）
+        source_codecs: 需要转码的视频编码（如 ('av1',)），None表示所有非H.264视频都转码
+
+    Returns:
+        转换决策
+    """
+    if media is None:
+        return ConversionPlan(ConversionPlan.FULL, "无法探测媒体信息", copy_audio=False)
+
+    video_codec = media.video_codec
+    audio_codec = media.audio_codec
+    audio_ok = not media.audio or audio_codec in COMPATIBLE_AUDIO_CODECS
+
+    if not media.video:
+        return ConversionPlan(ConversionPlan.NONE, "没有视频流")
+
+    if source_codecs is not None:
+        if video_codec not in source_codecs:
+            return ConversionPlan(ConversionPlan.NONE, f"视频编码为 {video_codec}，无需转换")
+        return ConversionPlan(ConversionPlan.FULL, f"视频编码为 {video_codec}", copy_audio=audio_ok)
+
+    if video_codec not in TARGET_VIDEO_CODECS:
+        return ConversionPlan(ConversionPlan.FULL, f"视频编码为 {video_codec}", copy_audio=audio_ok)
+
+    pix_fmt = media.video.get('pix_fmt')
+    profile = str(media.video.get('profile', ''))
+    if (pix_fmt and pix_fmt not in COMPATIBLE_PIX_FMTS) or any(tag in profile for tag in ('10', '4:2:2', '4:4:4')):
+        return ConversionPlan(ConversionPlan.FULL, f"H.264 {profile or pix_fmt} 兼容性差", copy_audio=audio_ok)
+
+    if not audio_ok:
+        return ConversionPlan(ConversionPlan.AUDIO, f"音频编码为 {audio_codec}")
+
+    if not media.is_mp4:
+        return ConversionPlan(ConversionPlan.REMUX, f"容器为 {media.format_name}")
+
+    return ConversionPlan(ConversionPlan.NONE, "已是H.264/MP4格式")
+
+
+def conversion_args(plan: ConversionPlan, video_codec_args: List[str]) -> List[str]:
+    """
+    生成输入和输出文件之间的ffmpeg参数
+
+    Args:
+        plan: 转换决策
+        video_codec_args: 完整转码时使用的视频编码参数
+    """
+    args = ['-map', '0:v:0', '-map', '0:a:0?']
+    if plan.action == ConversionPlan.REMUX:
+        args += ['-c', 'copy']
+    elif plan.action == ConversionPlan.AUDIO:
+        args += ['-c:v', 'copy', '-c:a', 'aac', '-b:a', '128k']
+    else:
+        args += video_codec_args
+        args += ['-c:a', 'copy'] if plan.copy_audio else ['-c:a', 'aac', '-b:a', '128k']
+    args += ['-movflags', '+faststart']
+    return args
+
+
+class ConversionResult:
+    """转换结果：实际采用的路径、耗时和输出文件"""
+
+    def __init__(self, action: str, output: str = None, elapsed: float = 0.0,
+                 encoder: str = None, reason: str = "", error: str = None):
+        self.action = action
+        self.output = output
+        self.elapsed = elapsed
+        self.encoder = encoder
+        self.reason = reason
+        self.error = error
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+    @property
+    def converted(self) -> bool:
+        """是否生成了新文件"""
+        return self.success and self.action != ConversionPlan.NONE
+
+    @property
+    def description(self) -> str:
+        return ConversionPlan.DESCRIPTIONS.get(self.action, self.action)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'action': self.action,
+            'output': self.output,
+            'elapsed': round(self.elapsed, 3),
+            'encoder': self.encoder,
+            'reason': self.reason,
+            'error': self.error,
+        }
@@ -0,0 +1,47 @@
+"""
+进度事件通道
+下载线程在任务状态或进度变化时发布事件，界面线程按自己的节奏批量取出。
+同一任务在两次取出之间的多次变化合并为一条（后发布的字段覆盖先发布的），
+任务再多、进度回调再频繁，界面每次也只需要更新真正变化过的行
+"""
+import threading
+from typing import Any, Dict, Optional
+
+
+class ProgressChannel:
+    """按任务合并的进度事件队列（线程安全）"""
+
+    def __init__(self):
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+
+    def publish(self, job_id: str, **changes):
+        """
+        发布任务变化
+
+        Args:
+            job_id: 任务ID
+            **changes: 变化的字段（可以为空，只表示任务有变化）
+        """
+        with self._cond:
+            pending = self._pending.get(job_id)
+            if pending is None:
+                self._pending[job_id] = changes
+            elif changes:
+                pending.update(changes)
+            self._cond.notify_all()
+
+    def drain(self) -> Dict[str, Dict[str, Any]]:
+        """取出并清空所有待处理的变化，返回 任务ID -> 合并后的变化字段（按首次变化的顺序）"""
+        with self._cond:
+            pending, self._pending = self._pending, {}
+            return pending
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待有待处理的变化，返回是否有变化（超时返回False）"""
+        with self._cond:
+            return bool(self._cond.wait_for(lambda: self._pending, timeout))
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._pending)
@@ -0,0 +1,81 @@
+"""
+进度采样模块
+yt-dlp每收到一块数据就调用一次进度回调，快速网络下每个任务每秒可达数千次。
+采样器按固定间隔放行进度更新，并用原始字节数计算指数加权平均（EWMA）速度和
+剩余时间，比yt-dlp按单次回调计算的瞬时速度更平稳
+"""
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+
+class _JobSample:
+    """单个任务的采样状态"""
+
+    def __init__(self, now: float, downloaded: int):
+        self.last_time = now
+        self.last_bytes = downloaded
+        self.speed = 0.0
+
+
+class ProgressSampler:
+    """按任务限制进度更新频率，并计算平滑后的速度和剩余时间（线程安全）"""
+
+    def __init__(self, interval: float = 0.5, smoothing: float = 0.3):
+        """
+        Args:
+            interval: 同一任务两次进度更新的最小间隔（秒），0表示每次回调都更新
+            smoothing: EWMA平滑系数（0~1），越大越接近瞬时速度
+        """
+        self.interval = max(0.0, float(interval))
+        self.smoothing = min(max(float(smoothing), 0.01), 1.0)
+        self._jobs: Dict[str, _JobSample] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> 'ProgressSampler':
+        """根据配置创建（[ADVANCED] progress_interval / speed_smoothing）"""
+        return cls(
+            interval=config.getfloat('ADVANCED', 'progress_interval', 0.5),
+            smoothing=config.getfloat('ADVANCED', 'speed_smoothing', 0.3),
+        )
+
+    def sample(self, job_id: str, downloaded: int, total: int = 0,
+               now: float = None) -> Optional[Tuple[float, Optional[float]]]:
+        """
+        记录一次进度回调
+
+        Args:
+            job_id: 任务ID
+            downloaded: 已下载字节数
+            total: 总字节数（未知时为0）
+            now: 当前时间（time.monotonic()），默认取当前时间
+
+        Returns:
+            距上次更新不足 interval 时返回None（本次回调可以跳过）；
+            否则返回 (速度 字节/秒, 剩余秒数)，速度未知时剩余秒数为None
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                self._jobs[job_id] = _JobSample(now, downloaded)
+                return 0.0, None
+            elapsed = now - job.last_time
+            if elapsed < self.interval or elapsed <= 0:
+                return None
+            if downloaded >= job.last_bytes:
+                instant = (downloaded - job.last_bytes) / elapsed
+                job.speed = instant if job.speed == 0 else (
+                    self.smoothing * instant + (1 - self.smoothing) * job.speed)
+            # 已下载字节数变小说明开始下载另一个文件（如音频流），只重置基准
+            job.last_time = now
+            job.last_bytes = downloaded
+            speed = job.speed
+        eta = max(0, total - downloaded) / speed if speed > 0 and total else None
+        return speed, eta
+
+    def remove(self, job_id: str):
+        """任务结束（或暂停）后清除其采样状态"""
+        with self._lock:
+            self._jobs.pop(job_id, None)
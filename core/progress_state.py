@@ -0,0 +1,52 @@
+"""
+下载进度状态模块
+DownloadProgress 是下载器内部持有、由下载线程修改的进度记录（__slots__，只保存数值，
+显示时再格式化）；界面和命令行通过 ProgressSnapshot 读取，它是在下载器的锁内一次性
+复制出来的不可变视图，不会读到只更新了一半的字段
+"""
+import operator
+from typing import NamedTuple, Optional
+
+
+class ProgressSnapshot(NamedTuple):
+    """某一时刻的下载进度（不可变）"""
+    url: str = ""
+    title: str = ""
+    status: str = "waiting"       # waiting, downloading, paused, converting, completed, error, cancelled, skipped
+    progress: float = 0.0
+    speed: float = 0.0            # 平滑后的下载速度（字节/秒）
+    eta: Optional[float] = None   # 预计剩余时间（秒），未知时为None
+    downloaded_bytes: int = 0
+    total_bytes: int = 0
+    error_message: str = ""
+    start_time: Optional[float] = None  # 开始时间（time.time()）
+    end_time: Optional[float] = None    # 结束时间（time.time()）
+    queued_at: Optional[float] = None   # 入队时间（time.time()）
+    wait_time: float = 0.0        # 排队等待时长（秒）
+    extract_time: float = 0.0     # 信息提取耗时（秒）
+    info_from_cache: bool = False  # 是否使用了缓存的视频信息
+    resumed_bytes: int = 0        # 恢复任务时已有的部分文件大小
+    throttle_retries: int = 0     # 因平台限流重新排队的次数
+    retries: int = 0              # 因可重试的错误重新排队的次数
+    format_id: str = ""           # 已选择的格式，重试时沿用以续传 .part 文件
+    convert_action: str = ""      # 转换路径（none/remux/audio/full）
+    convert_time: float = 0.0     # 转换耗时（秒）
+
+
+_read_fields = operator.attrgetter(*ProgressSnapshot._fields)
+
+
+class DownloadProgress:
+    """下载进度信息（下载器内部使用，需要在下载器的锁内修改多个相关字段）"""
+
+    __slots__ = ProgressSnapshot._fields + ('attempts',)
+
+    def __init__(self, url: str = ""):
+        for name, default in ProgressSnapshot._field_defaults.items():
+            setattr(self, name, default)
+        self.url = url
+        self.attempts = ()  # 每次尝试的记录（AttemptRecord 元组，开始新的尝试时追加），不包含在快照中
+
+    def snapshot(self) -> ProgressSnapshot:
+        """复制当前进度（调用方需持有下载器的锁，才能保证各字段来自同一时刻）"""
+        return ProgressSnapshot._make(_read_fields(self))
@@ -0,0 +1,157 @@
+"""
+重试模块
+把下载过程中的异常分为可重试（网络超时、连接中断、5xx等）、平台限流（429/412/403，
+交给主机限流器退避）和不可重试（视频不存在、私有视频、地区限制、磁盘已满等）三类；
+可重试的任务按带随机抖动的指数退避重新排队，从已有的 .part 文件续传
+"""
+import re
+import time
+import errno
+import random
+import socket
+from typing import Tuple
+
+from core.host_limits import THROTTLE_STATUSES, error_chain, http_status
+
+
+# 异常类别
+RETRYABLE = 'retryable'
+THROTTLED = 'throttled'
+FATAL = 'fatal'
+
+# 不可重试的HTTP状态码
+FATAL_HTTP_STATUSES = (400, 401, 404, 410, 451)
+
+# 不可重试的磁盘错误（重试也无法恢复）
+FATAL_ERRNOS = (errno.ENOSPC, errno.EACCES, errno.EROFS, errno.ENAMETOOLONG,
+                getattr(errno, 'EDQUOT', errno.ENOSPC))
+
+# 按错误信息判断的不可重试错误（视频本身不可用或需要登录）
+FATAL_PATTERNS = re.compile(
+    r'Unsupported URL|Video unavailable|Private video|This video is private|has been removed|'
+    r'not available in your country|geo.?restrict|Sign in to confirm|members.only|'
+    r'Requested format is not available|No video formats found|is not a valid URL|'
+    r'copyright|account.*terminated|This live event will begin',
+    re.IGNORECASE)
+
+# 按错误信息判断的可重试错误（网络问题）
+RETRYABLE_PATTERNS = re.compile(
+    r'timed out|timeout|Connection (?:reset|refused|aborted)|Remote end closed|IncompleteRead|'
+    r'Temporary failure in name resolution|Network is unreachable|EOF occurred|'
+    r'Did not get any data blocks|Unable to download (?:webpage|JSON|video data)|'
+    r'fragment .* not found|giving up after',
+    re.IGNORECASE)
+
+# yt-dlp内部（单个HTTP请求、分片、分段、信息提取）的重试次数上限：只处理瞬时的网络抖动，
+# 更持久的错误交给调度器按 RetryPolicy 的退避整体重新排队，避免两层重试相乘
+INNER_RETRIES = 1
+
+
+def classify_error(error: BaseException) -> Tuple[str, str]:
+    """
+    判断异常是否值得重试
+
+    Returns:
+        (类别, 原因)：类别为 RETRYABLE / THROTTLED / FATAL；无法识别的错误按可重试处理
+    """
+    from yt_dlp.networking.exceptions import TransportError
+    from yt_dlp.utils import (ContentTooShortError, GeoRestrictedError, PostProcessingError,
+                              UnsupportedError)
+
+    for exc in error_chain(error):
+        status = http_status(exc)
+        if status in THROTTLE_STATUSES:
+            return THROTTLED, f"HTTP {status}"
+        if status in FATAL_HTTP_STATUSES:
+            return FATAL, f"HTTP {status}"
+        if status is not None and (status >= 500 or status == 408):
+            return RETRYABLE, f"HTTP {status}"
+        if isinstance(exc, (GeoRestrictedError, UnsupportedError)):
+            return FATAL, type(exc).__name__
+        if isinstance(exc, PostProcessingError):
+            return FATAL, "后处理失败"
+        if isinstance(exc, OSError) and exc.errno in FATAL_ERRNOS:
+            return FATAL, f"磁盘错误: {exc.strerror or exc}"
+        if isinstance(exc, (socket.timeout, TimeoutError, ConnectionError, TransportError,
+                            ContentTooShortError)):
+            return RETRYABLE, type(exc).__name__
+
+    messages = [str(exc) for exc in error_chain(error)]
+    if any(FATAL_PATTERNS.search(message) for message in messages):
+        return FATAL, "视频不可用"
+    if any(RETRYABLE_PATTERNS.search(message) for message in messages):
+        return RETRYABLE, "网络错误"
+    if any(getattr(exc, 'expected', False) for exc in error_chain(error)):
+        # 提取器明确报告的错误（如需要登录、内容已删除），重试无法恢复
+        return FATAL, "提取器错误"
+    return RETRYABLE, "未知错误"
+
+
+class RetryPolicy:
+    """带随机抖动的指数退避（第n次重试等待 base * 2^(n-1)，上限max_delay，再随机缩放）"""
+
+    def __init__(self, attempts: int = 3, base_delay: float = 2.0, max_delay: float = 60.0,
+                 jitter: float = 0.5):
+        """
+        Args:
+            attempts: 失败后最多重试的次数，0表示不重试
+            base_delay: 第一次重试前的等待时间（秒）
+            max_delay: 等待时间上限（秒）
+            jitter: 随机抖动比例，实际等待时间在 [delay * (1 - jitter), delay] 之间
+        """
+        self.attempts = max(0, int(attempts))
+        self.base_delay = max(0.0, float(base_delay))
+        self.max_delay = max(self.base_delay, float(max_delay))
+        self.jitter = min(max(float(jitter), 0.0), 1.0)
+
+    @classmethod
+    def from_config(cls, config) -> 'RetryPolicy':
+        """根据配置创建（[DEFAULT] retry_attempts，[ADVANCED] retry_base_delay / retry_max_delay）"""
+        return cls(
+            attempts=config.getint('DEFAULT', 'retry_attempts', 3),
+            base_delay=config.getfloat('ADVANCED', 'retry_base_delay', 2.0),
+            max_delay=config.getfloat('ADVANCED', 'retry_max_delay', 60.0),
+        )
+
+    @property
+    def inner_retries(self) -> int:
+        """yt-dlp内部的重试次数（不超过任务级的重试次数，attempts为0时也不在内部重试）"""
+        return min(self.attempts, INNER_RETRIES)
+
+    def delay(self, retry: int) -> float:
+        """第retry次重试（从1开始）前的等待秒数"""
+        delay = min(self.base_delay * 2 ** max(0, retry - 1), self.max_delay)
+        return delay * random.uniform(1 - self.jitter, 1)
+
+    def sleep_function(self):
+        """yt-dlp retry_sleep_functions 使用的等待函数（参数为从0开始的重试次数）"""
+        return lambda n: self.delay(n + 1)
+
+
+class AttemptRecord:
+    """一次下载尝试的耗时和结果"""
+
+    def __init__(self, number: int, resumed_bytes: int = 0):
+        self.number = number                # 第几次尝试（从1开始）
+        self.resumed_bytes = resumed_bytes  # 开始时已下载的字节数（续传）
+        self.started = time.time()
+        self.duration = 0.0
+        self.error = ""
+        self.kind = ""                      # 失败类别，成功时为空
+        self.delay = 0.0                    # 失败后等待多久重试
+
+    def finish(self, error: BaseException = None, kind: str = "", delay: float = 0.0):
+        self.duration = time.time() - self.started
+        self.error = str(error) if error else ""
+        self.kind = kind
+        self.delay = delay
+
+    def to_dict(self):
+        return {
+            'attempt': self.number,
+            'duration': round(self.duration, 3),
+            'resumed_bytes': self.resumed_bytes,
+            'error': self.error,
+            'kind': self.kind,
+            'delay': round(self.delay, 3),
+        }
@@ -0,0 +1,223 @@
+"""
+任务调度模块
+优先级队列 + 固定大小的工作线程池，供下载和转码阶段共用；
+下载阶段按平台分队列，由主机限流器决定各平台的任务何时可以开始
+"""
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Dict, Any, Optional
+
+from utils.logger import logger
+
+
+class DownloadScheduler:
+    """
+    任务调度器（下载和转码阶段各使用一个实例）
+
+    优先级队列 + 工作线程池。每个工作线程同一时刻只执行一个任务，
+    正在执行的任务数不超过 max_workers（可在运行时修改）；
+    槽位释放后由条件变量立即唤醒下一个任务，不再依赖轮询。
+
+    提交任务时可指定key（平台），每个key一个优先级队列。设置了限流器时，
+    已达到并发上限或处于退避期的平台的任务暂不派发，空闲槽位先给其他平台；
+    优先级相同时优先派发正在进行任务较少的平台，使不同平台的任务交错执行。
+    """
+
+    def __init__(self, max_workers: int, name: str = "download", limiter=None):
+        """
+        Args:
+            max_workers: 并发数
+            name: 工作线程名前缀
+            limiter: 主机限流器（core.host_limits.HostLimiter），None表示不按平台限流
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.name = name
+        self.limiter = limiter
+        self._queues = {}  # key -> [(priority, seq, job_id)]，已取消的条目惰性跳过
+        self._delayed = []  # (ready_monotonic, seq, job_id, priority, key)，到期后移入对应队列
+        self._jobs = {}    # job_id -> (func, enqueue_monotonic, key)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._workers = []
+        self._active = 0
+        self._shutdown = False
+        # 等待时间统计
+        self._dispatched = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def submit(self, job_id: str, func: Callable[[], Any], priority: int = 0, key: Optional[str] = None,
+               delay: float = 0):
+        """
+        提交任务
+
+        Args:
+            job_id: 任务ID
+            func: 任务函数（无参数）
+            priority: 优先级，数值越小越先执行
+            key: 任务所属平台，用于按平台限流和交错派发
+            delay: 延迟多少秒后才可以开始（重试退避），等待期间不占用槽位
+        """
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("调度器已关闭")
+            self._ensure_workers()
+            now = time.monotonic()
+            self._jobs[job_id] = (func, now, key)
+            if delay > 0:
+                heapq.heappush(self._delayed, (now + delay, next(self._seq), job_id, priority, key))
+            else:
+                heapq.heappush(self._queues.setdefault(key, []), (priority, next(self._seq), job_id))
+            self._cond.notify()
+
+    def cancel(self, job_id: str) -> bool:
+        """从队列中移除尚未开始的任务，返回是否移除成功"""
+        with self._cond:
+            return self._jobs.pop(job_id, None) is not None
+
+    def is_queued(self, job_id: str) -> bool:
+        """任务是否仍在排队"""
+        with self._cond:
+            return job_id in self._jobs
+
+    @property
+    def active_count(self) -> int:
+        """正在执行的任务数"""
+        with self._cond:
+            return self._active
+
+    @property
+    def queue_depth(self) -> int:
+        """排队中的任务数"""
+        with self._cond:
+            return len(self._jobs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度统计信息（队列深度、并发数、等待时间）"""
+        with self._cond:
+            now = time.monotonic()
+            oldest_wait = max((now - enqueued for _, enqueued, _ in self._jobs.values()), default=0.0)
+            return {
+                'queued': len(self._jobs),
+                'delayed': sum(1 for entry in self._delayed if entry[2] in self._jobs),
+                'active': self._active,
+                'max_concurrent': self.max_workers,
+                'dispatched': self._dispatched,
+                'avg_wait': self._total_wait / self._dispatched if self._dispatched else 0.0,
+                'max_wait': self._max_wait,
+                'oldest_wait': oldest_wait,
+            }
+
+    def set_max_concurrent(self, max_workers: int):
+        """
+        修改并发数，立即生效
+
+        增大时启动新的工作线程；减小时正在执行的任务不受影响，
+        多出的工作线程在槽位降到新上限以下之前不再领取任务
+        """
+        with self._cond:
+            self.max_workers = max(1, int(max_workers))
+            if self._jobs:
+                self._ensure_workers()
+            self._cond.notify_all()
+
+    def shutdown(self):
+        """停止派发新任务（正在执行的任务不受影响）"""
+        with self._cond:
+            self._shutdown = True
+            self._jobs.clear()
+            self._queues.clear()
+            self._delayed.clear()
+            self._cond.notify_all()
+
+    def _ensure_workers(self):
+        """按需启动工作线程（需持有锁）"""
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"{self.name}-worker-{len(self._workers) + 1}",
+                daemon=True
+            )
+            self._workers.append(worker)
+            worker.start()
+
+    def _pop_next(self):
+        """
+        取出可以开始的优先级最高的任务（需持有锁）
+
+        Returns:
+            (job_id, job, 等待秒数)：没有可以开始的任务时job_id为None，
+            等待秒数为最近一个重试退避、平台退避或启动间隔结束的时间（None表示等待任务结束）
+        """
+        # 退避到期的任务移入对应平台的队列
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, seq, job_id, priority, key = heapq.heappop(self._delayed)
+            if job_id in self._jobs:
+                heapq.heappush(self._queues.setdefault(key, []), (priority, seq, job_id))
+        while self._delayed and self._delayed[0][2] not in self._jobs:
+            heapq.heappop(self._delayed)
+        delay = self._delayed[0][0] - now if self._delayed else None
+
+        best = best_rank = None
+        for key, queue in list(self._queues.items()):
+            while queue and queue[0][2] not in self._jobs:
+                heapq.heappop(queue)
+            if not queue:
+                del self._queues[key]
+                continue
+            priority, seq, _ = queue[0]
+            if key is not None and self.limiter is not None:
+                wait = self.limiter.start_delay(key)
+                if wait != 0:
+                    if wait is not None:
+                        delay = wait if delay is None else min(delay, wait)
+                    continue
+                rank = (priority, self.limiter.active(key), seq)
+            else:
+                rank = (priority, 0, seq)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = key, rank
+
+        if best_rank is None:
+            return None, None, delay
+        _, _, job_id = heapq.heappop(self._queues[best])
+        if best is not None and self.limiter is not None:
+            self.limiter.acquire(best)
+        return job_id, self._jobs.pop(job_id), None
+
+    def _worker_loop(self):
+        """工作线程主循环"""
+        while True:
+            with self._cond:
+                while True:
+                    if self._shutdown:
+                        return
+                    timeout = None
+                    if self._jobs and self._active < self.max_workers:
+                        job_id, job, timeout = self._pop_next()
+                        if job_id is not None:
+                            break
+                    self._cond.wait(timeout)
+                func, enqueued, key = job
+                wait = time.monotonic() - enqueued
+                self._active += 1
+                if self._jobs and self._active < self.max_workers:
+                    # 还有空闲槽位：唤醒下一个工作线程，由它等待其他平台或限流间隔结束
+                    self._cond.notify()
+                self._dispatched += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+            try:
+                func()
+            except Exception as e:
+                logger.error(f"调度任务执行异常 {job_id}: {e}")
+            finally:
+                with self._cond:
+                    self._active -= 1
+                    if key is not None and self.limiter is not None:
+                        self.limiter.release(key)
+                    self._cond.notify()
@@ -0,0 +1,366 @@
+"""
+分段下载模块
+对支持Range的直链格式（progressive），用多个连接并发请求不同的字节区间，
+写入预分配的临时文件（os.pwrite），每个分段独立重试。
+适用于按连接限速的CDN（如B站、Twitter视频CDN），单连接无法跑满带宽时使用
+"""
+import os
+import json
+import time
+import threading
+import importlib
+from typing import Any, Dict, List, Optional
+
+from yt_dlp import YoutubeDL
+from yt_dlp.downloader import get_suitable_downloader
+from yt_dlp.downloader.fragment import FragmentFD
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import RequestError
+from yt_dlp.utils import ContentTooShortError, parse_http_range
+from yt_dlp.utils.networking import HTTPHeaderDict
+
+from utils.logger import logger
+from core.fragment_concurrency import adaptive_downloader_class
+
+
+# yt-dlp的 YoutubeDL.dl 通过 yt_dlp.YoutubeDL 模块中的 get_suitable_downloader 选择下载器类。
+# 替换为先使用当前线程中 SegmentedYoutubeDL.dl 指定的类，未指定时调用原函数，
+# 这样 dl 的其余部分（进度回调、请求头等）仍由yt-dlp完成，不需要复制它的内部实现
+_ydl_module = importlib.import_module('yt_dlp.YoutubeDL')
+_selected_downloader = threading.local()
+
+
+def _get_suitable_downloader(*args, **kwargs):
+    fd_cls = getattr(_selected_downloader, 'fd_cls', None)
+    return fd_cls or get_suitable_downloader(*args, **kwargs)
+
+
+_ydl_module.get_suitable_downloader = _get_suitable_downloader
+
+# 每个分段的最小字节数，文件太小时分段带来的额外请求得不偿失
+MIN_SEGMENT_SIZE = 1024 * 1024
+
+# 单次读取的块大小
+READ_BLOCK_SIZE = 64 * 1024
+
+# 进度回调和状态文件的刷新间隔（秒）
+PROGRESS_INTERVAL = 0.5
+STATE_SAVE_INTERVAL = 1.0
+
+# 分段状态文件后缀（与临时文件放在一起，用于断点续传）
+STATE_SUFFIX = '.segments'
+
+
+class RangeNotSupported(Exception):
+    """服务器不支持Range请求或无法确定文件大小"""
+
+
+class Segment:
+    """字节区间 [start, end]，position为下一个待写入的偏移"""
+
+    def __init__(self, index: int, start: int, end: int, position: int = None):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.position = start if position is None else position
+
+    @property
+    def done(self) -> bool:
+        return self.position > self.end
+
+    @property
+    def downloaded(self) -> int:
+        return self.position - self.start
+
+
+def split_segments(total_size: int, count: int, offset: int = 0) -> List[Segment]:
+    """
+    把 [offset, total_size) 平均分成最多count段（每段不小于MIN_SEGMENT_SIZE）
+
+    Args:
+        total_size: 文件总大小
+        count: 期望的分段数
+        offset: 起始偏移（之前单连接下载已完成的部分）
+    """
+    remaining = total_size - offset
+    count = max(1, min(count, remaining // MIN_SEGMENT_SIZE))
+    step = remaining // count
+    segments = []
+    for index in range(count):
+        start = offset + index * step
+        end = total_size - 1 if index == count - 1 else start + step - 1
+        segments.append(Segment(index, start, end))
+    return segments
+
+
+class SegmentedHttpFD(HttpFD):
+    """多连接分段HTTP下载器，服务器不支持Range时回退到yt-dlp的单连接下载"""
+
+    FD_NAME = 'segmented'
+
+    def real_download(self, filename, info_dict):
+        segment_count = self.params.get('segment_count') or 1
+        tmpfilename = self.temp_name(filename)
+        state_path = tmpfilename + STATE_SUFFIX
+        headers = HTTPHeaderDict({'Accept-Encoding': 'identity'}, info_dict.get('http_headers'))
+        # 已经指定了Range（如只下载片段）的请求交给原下载器处理
+        if segment_count <= 1 or 'Range' in headers or tmpfilename == '-':
+            return super().real_download(filename, info_dict)
+
+        try:
+            total_size, last_modified = self._probe_size(info_dict, headers)
+        except RangeNotSupported as e:
+            logger.info(f"无法分段下载（{e}），使用单连接下载")
+            self._discard_state(tmpfilename, state_path)
+            return super().real_download(filename, info_dict)
+
+        segments = self._load_state(state_path, total_size)
+        if segments is None:
+            # 分段状态无法使用时临时文件的内容不可信；没有分段状态时，
+            # 已有的 .part 文件是单连接下载留下的连续数据，可以接着下载
+            self._discard_state(tmpfilename, state_path)
+            resume_len = 0
+            if self.params.get('continuedl', True) and os.path.isfile(tmpfilename):
+                resume_len = min(os.path.getsize(tmpfilename), total_size)
+            if total_size - resume_len < MIN_SEGMENT_SIZE * 2:
+                return super().real_download(filename, info_dict)
+            segments = split_segments(total_size, segment_count, resume_len)
+
+        self.report_destination(filename)
+        logger.info(f"分段下载: {len(segments)} 个连接, 文件大小 {total_size} 字节")
+        return self._download_segments(filename, tmpfilename, state_path, info_dict, headers,
+                                       segments, total_size, last_modified)
+
+    def _request(self, info_dict, headers, start: int, end: int):
+        """发送带Range的请求"""
+        request_headers = HTTPHeaderDict(headers, {'Range': f'bytes={start}-{end}'})
+        extensions = {}
+        # 浏览器伪装（impersonate）需要较新的yt-dlp，旧版本没有该方法时不伪装
+        get_impersonate_target = getattr(self, '_get_impersonate_target', None)
+        impersonate_target = get_impersonate_target(info_dict) if get_impersonate_target else None
+        if impersonate_target is not None:
+            extensions['impersonate'] = impersonate_target
+        return self.ydl.urlopen(Request(info_dict['url'], None, request_headers, extensions=extensions))
+
+    def _probe_size(self, info_dict, headers):
+        """用 bytes=0-0 请求确认服务器支持Range，并从Content-Range取得文件总大小"""
+        try:
+            response = self._request(info_dict, headers, 0, 0)
+        except RequestError as e:
+            raise RangeNotSupported(f"探测请求失败: {e}")
+        try:
+            if response.status != 206:
+                raise RangeNotSupported(f"服务器返回 {response.status}")
+            _, _, total_size = parse_http_range(response.headers.get('Content-Range'))
+            if not total_size:
+                raise RangeNotSupported("缺少文件总大小")
+            return total_size, response.headers.get('Last-Modified')
+        finally:
+            response.close()
+
+    def _load_state(self, state_path: str, total_size: int) -> Optional[List[Segment]]:
+        """读取上次中断时保存的分段进度（文件大小变化时作废）"""
+        if not self.params.get('continuedl', True) or not os.path.isfile(state_path):
+            return None
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('total_size') != total_size:
+                return None
+            segments = [Segment(index, start, end, position)
+                        for index, (start, position, end) in enumerate(state['segments'])]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if not os.path.isfile(state_path[:-len(STATE_SUFFIX)]):
+            return None
+        logger.info(f"恢复分段下载: 已完成 {sum(s.downloaded for s in segments)} / {total_size} 字节")
+        return segments
+
+    def _save_state(self, state_path: str, total_size: int, segments: List[Segment]):
+        """保存分段进度（先写临时文件再替换，避免中断时留下损坏的状态）"""
+        state = {
+            'total_size': total_size,
+            'segments': [[s.start, s.position, s.end] for s in segments],
+        }
+        try:
+            with open(state_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(state_path + '.tmp', state_path)
+        except OSError as e:
+            logger.warning(f"保存分段状态失败: {e}")
+
+    def _discard_state(self, tmpfilename: str, state_path: str):
+        """
+        删除分段状态文件。分段下载的临时文件是预分配的，大小不代表已下载的字节数，
+        不再按分段续传时必须一并删除
+        """
+        if not os.path.isfile(state_path):
+            return
+        for path in (state_path, tmpfilename):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _download_segments(self, filename, tmpfilename, state_path, info_dict, headers,
+                           segments: List[Segment], total_size: int, last_modified) -> bool:
+        # 预分配之前先写入状态，进程被强制结束时也不会把预分配的文件当成单连接下载的数据续传
+        self._save_state(state_path, total_size, segments)
+        fd = os.open(tmpfilename, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o666)
+        write_lock = threading.Lock()
+        stop = threading.Event()
+        errors = []
+
+        def write_at(data: bytes, offset: int):
+            if hasattr(os, 'pwrite'):
+                os.pwrite(fd, data, offset)
+            else:
+                # Windows没有pwrite，定位和写入需要在同一把锁内完成
+                with write_lock:
+                    os.lseek(fd, offset, os.SEEK_SET)
+                    os.write(fd, data)
+
+        def run_segment(segment: Segment):
+            try:
+                self._download_segment(segment, info_dict, headers, write_at, stop)
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+
+        try:
+            if os.fstat(fd).st_size != total_size:
+                os.ftruncate(fd, total_size)
+                if hasattr(os, 'posix_fallocate'):
+                    try:
+                        os.posix_fallocate(fd, 0, total_size)
+                    except OSError:
+                        pass  # 文件系统不支持时保留稀疏文件
+
+            start_time = time.time()
+            initial = sum(s.downloaded for s in segments)
+            threads = [threading.Thread(target=run_segment, args=(s,), daemon=True,
+                                        name=f"segment-{s.index}")
+                       for s in segments if not s.done]
+            for thread in threads:
+                thread.start()
+
+            last_save = start_time
+            try:
+                while any(thread.is_alive() for thread in threads):
+                    stop.wait(PROGRESS_INTERVAL)
+                    now = time.time()
+                    downloaded = sum(s.downloaded for s in segments)
+                    if now - last_save >= STATE_SAVE_INTERVAL:
+                        self._save_state(state_path, total_size, segments)
+                        last_save = now
+                    if stop.is_set():
+                        break
+                    speed = self.calc_speed(start_time, now, downloaded - initial)
+                    self._hook_progress({
+                        'status': 'downloading',
+                        'downloaded_bytes': downloaded,
+                        'total_bytes': total_size,
+                        'tmpfilename': tmpfilename,
+                        'filename': filename,
+                        'eta': self.calc_eta(speed, total_size - downloaded),
+                        'speed': speed,
+                        'elapsed': now - start_time,
+                        'ctx_id': info_dict.get('ctx_id'),
+                        '_throttled': bool(self.params.get('bandwidth_throttle')),
+                    }, info_dict)
+            finally:
+                # 进度回调抛出异常（如取消下载）时也要让分段线程退出
+                stop.set()
+                for thread in threads:
+                    thread.join()
+        finally:
+            os.close(fd)
+
+        if errors or not all(s.done for s in segments):
+            self._save_state(state_path, total_size, segments)
+            if errors:
+                raise errors[0]
+            return False
+
+        try:
+            os.remove(state_path)
+        except OSError:
+            pass
+        self.try_rename(tmpfilename, filename)
+        if self.params.get('updatetime'):
+            info_dict['filetime'] = self.try_utime(filename, last_modified)
+
+        self._hook_progress({
+            'downloaded_bytes': total_size,
+            'total_bytes': total_size,
+            'filename': filename,
+            'status': 'finished',
+            'elapsed': time.time() - start_time,
+            'ctx_id': info_dict.get('ctx_id'),
+        }, info_dict)
+        return True
+
+    def _download_segment(self, segment: Segment, info_dict, headers, write_at, stop: threading.Event):
+        """下载一个分段，连接出错时从当前位置重试"""
+        retries = self.params.get('segment_retries', 3)
+        # 带宽限制需要在各连接的读取循环中申请令牌，进度回调只在监控线程中调用
+        throttle = self.params.get('bandwidth_throttle')
+        attempt = 0
+        while not segment.done and not stop.is_set():
+            position = segment.position
+            try:
+                response = self._request(info_dict, headers, segment.position, segment.end)
+                try:
+                    if response.status != 206:
+                        raise RangeNotSupported(f"分段 {segment.index} 返回 {response.status}")
+                    while not stop.is_set() and not segment.done:
+                        data = response.read(min(READ_BLOCK_SIZE, segment.end - segment.position + 1))
+                        if not data:
+                            break
+                        write_at(data, segment.position)
+                        segment.position += len(data)
+                        if throttle:
+                            throttle(len(data))
+                finally:
+                    response.close()
+                if not segment.done and not stop.is_set():
+                    raise ContentTooShortError(segment.downloaded, segment.end - segment.start + 1)
+            except (RequestError, ContentTooShortError, OSError) as e:
+                # 本次连接有进展时重新计数，只有连续失败才会耗尽重试次数
+                attempt = 1 if segment.position > position else attempt + 1
+                if attempt > retries or stop.is_set():
+                    raise
+                delay = min(2 ** (attempt - 1), 10)
+                logger.warning(f"分段 {segment.index} 下载出错，{delay} 秒后重试 ({attempt}/{retries}): {e}")
+                stop.wait(delay)
+
+
+class SegmentedYoutubeDL(YoutubeDL):
+    """
+    下载使用的YoutubeDL：可分段的直链格式使用SegmentedHttpFD，
+    HLS/DASH分片格式使用带自适应并发控制的分片下载器，其余情况与YoutubeDL相同
+    """
+
+    def _downloader_class(self, info: Dict[str, Any]):
+        """选择替换的下载器类，None表示使用yt-dlp默认的下载器"""
+        if info.get('is_live'):
+            return None
+        fd_cls = get_suitable_downloader(info, self.params)
+        # 只替换yt-dlp本来就会用HttpFD/FragmentFD下载的格式（外部下载器等保持不变）
+        if fd_cls is HttpFD:
+            if (self.params.get('segment_count') or 1) > 1 and info.get('request_data') is None:
+                return SegmentedHttpFD
+        elif self.params.get('adaptive_fragments') and issubclass(fd_cls, FragmentFD):
+            return adaptive_downloader_class(fd_cls)
+        return None
+
+    def dl(self, name, info, subtitle=False, test=False):
+        fd_cls = None
+        if not (test or subtitle or name == '-' or not info.get('url')):
+            fd_cls = self._downloader_class(info)
+        _selected_downloader.fd_cls = fd_cls
+        try:
+            return super().dl(name, info, subtitle, test)
+        finally:
+            _selected_downloader.fd_cls = None
@@ -0,0 +1,122 @@
+"""
+时间段调度模块
+按一天中的时间段调整下载并发数和全局速度上限，规则写在 settings.ini 的 [SCHEDULE] 中：
+
+    [SCHEDULE]
+    enabled = True
+    day = 09:00-18:00, 2, 2M
+    night = 18:00-09:00, 8, 0
+
+每条规则为 "开始-结束, 并发任务数, 速度上限"：结束早于开始表示跨过午夜；
+速度上限格式同 --rate-limit（纯数字按KB/s，0表示不限速）；
+并发数或速度上限写 "-" 表示沿用基础设置。多条规则重叠时按书写顺序取第一条，
+不在任何时间段内时使用基础设置（max_concurrent_downloads / rate_limit）
+"""
+import re
+from datetime import datetime
+from typing import List, Optional
+
+from utils.logger import logger
+from utils.formatters import format_speed
+from core.bandwidth import parse_rate_limit
+
+
+# 检查时间段是否切换的间隔（秒）
+CHECK_INTERVAL = 30
+
+_TIME_RANGE = re.compile(r'(\d{1,2}):(\d{2})\s*[-–~]\s*(\d{1,2}):(\d{2})')
+
+
+def _minutes(hour: str, minute: str) -> int:
+    value = int(hour) * 60 + int(minute)
+    if int(minute) >= 60 or value > 24 * 60:
+        raise ValueError(f"无效的时间: {hour}:{minute}")
+    return value
+
+
+class ScheduleRule:
+    """一个时间段规则，start/end为当天的分钟数，区间为 [start, end)"""
+
+    def __init__(self, name: str, start: int, end: int,
+                 max_concurrent: Optional[int] = None, rate_limit: Optional[int] = None):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.max_concurrent = max_concurrent  # None表示沿用基础设置
+        self.rate_limit = rate_limit          # 字节/秒，0表示不限速，None表示沿用基础设置
+
+    @classmethod
+    def parse(cls, name: str, text: str) -> 'ScheduleRule':
+        """
+        解析 "09:00-18:00, 2, 2M" 格式的规则
+
+        Raises:
+            ValueError: 格式无效
+        """
+        fields = [field.strip() for field in str(text).split(',')]
+        match = _TIME_RANGE.fullmatch(fields[0])
+        if not match or len(fields) > 3:
+            raise ValueError(f"无效的时间段规则 {name}: {text}")
+        start = _minutes(match.group(1), match.group(2))
+        end = _minutes(match.group(3), match.group(4))
+        if start == end:
+            raise ValueError(f"时间段规则 {name} 的开始和结束时间相同: {text}")
+
+        max_concurrent = rate_limit = None
+        if len(fields) > 1 and fields[1] not in ('', '-'):
+            if not fields[1].isdigit() or int(fields[1]) < 1:
+                raise ValueError(f"时间段规则 {name} 的并发数必须是正整数: {text}")
+            max_concurrent = int(fields[1])
+        if len(fields) > 2 and fields[2] not in ('', '-'):
+            try:
+                rate_limit = parse_rate_limit(fields[2])
+            except ValueError:
+                raise ValueError(f"时间段规则 {name} 的速度上限无效: {text}") from None
+        return cls(name, start, end, max_concurrent, rate_limit)
+
+    def contains(self, minute: int) -> bool:
+        """当天第minute分钟是否在该时间段内"""
+        if self.start < self.end:
+            return self.start <= minute < self.end
+        return minute >= self.start or minute < self.end
+
+    def describe(self) -> str:
+        """规则的可读描述"""
+        window = f"{self.start // 60:02d}:{self.start % 60:02d}-{self.end // 60:02d}:{self.end % 60:02d}"
+        jobs = f"{self.max_concurrent} 个任务" if self.max_concurrent else "默认并发"
+        if self.rate_limit is None:
+            rate = "默认限速"
+        else:
+            rate = format_speed(self.rate_limit) or "不限速"
+        return f"{self.name} ({window}，{jobs}，{rate})"
+
+
+def load_schedule(config) -> List[ScheduleRule]:
+    """
+    从配置读取时间段规则（[SCHEDULE] enabled 为False时返回空列表）
+
+    Args:
+        config: 配置管理器
+
+    Returns:
+        规则列表，格式无效的规则记录错误后跳过
+    """
+    if not config.getboolean('SCHEDULE', 'enabled', False):
+        return []
+    rules = []
+    for name, text in config.get_schedule_rules():
+        try:
+            rules.append(ScheduleRule.parse(name, text))
+        except ValueError as e:
+            logger.error(str(e))
+    return rules
+
+
+def active_rule(rules: List[ScheduleRule], now: datetime = None) -> Optional[ScheduleRule]:
+    """当前时间命中的第一条规则"""
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute
+    for rule in rules:
+        if rule.contains(minute):
+            return rule
+    return None
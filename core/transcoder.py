@@ -0,0 +1,332 @@
+"""
+视频转码模块
+独立的转码工作线程池：下载线程把文件交给转码阶段后立即释放下载槽位，
+下载和转码可以重叠进行。能直接封装或只转码音频时不重新编码视频；
+需要完整转码时优先使用可用的硬件H.264编码器（NVENC/QSV/VAAPI），
+不可用时回退到libx264。取消正在进行的转码时终止ffmpeg进程并删除未完成的输出文件
+"""
+import os
+import time
+import threading
+import subprocess
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from utils.logger import logger
+from core.config_manager import config_manager
+from core.ffmpeg_probe import FFmpegCapabilities
+from core.scheduler import DownloadScheduler
+from core.media_probe import (ConversionPlan, ConversionResult, conversion_args,
+                               plan_conversion, probe_media)
+
+
+# VAAPI渲染设备
+VAAPI_DEVICE = '/dev/dri/renderD128'
+
+# libx264预设 -> NVENC预设（p1最快，p7质量最好）
+NVENC_PRESETS = {
+    'ultrafast': 'p1', 'superfast': 'p2', 'veryfast': 'p3', 'faster': 'p3',
+    'fast': 'p4', 'medium': 'p5', 'slow': 'p6', 'slower': 'p7', 'veryslow': 'p7',
+}
+
+# QSV不支持的libx264预设
+QSV_PRESET_FALLBACK = {'ultrafast': 'veryfast', 'superfast': 'veryfast'}
+
+
+def default_workers() -> int:
+    """默认转码并发数：每个libx264进程本身是多线程的，按每4个核心一个任务估算"""
+    return max(1, (os.cpu_count() or 1) // 4)
+
+
+class Transcoder:
+    """H.264转码器"""
+
+    def __init__(self, ffmpeg: FFmpegCapabilities, workers: int = None, threads: int = None,
+                 preset: str = None, crf: str = None, encoder: str = None):
+        """
+        Args:
+            ffmpeg: ffmpeg能力信息
+            workers: 转码并发数，默认读取 [CONVERT] workers（0表示按CPU核心数自动计算）
+            threads: 每个转码任务的线程数，默认读取 [CONVERT] threads（0表示平分CPU核心）
+            preset: 编码预设，默认读取 [CONVERT] preset
+            crf: 质量参数，默认读取 convert_quality_crf
+            encoder: 编码器名称，auto表示自动选择
+        """
+        self.ffmpeg = ffmpeg
+        self.workers = workers or config_manager.getint('CONVERT', 'workers', 0) or default_workers()
+        self.threads = (threads or config_manager.getint('CONVERT', 'threads', 0)
+                        or max(1, (os.cpu_count() or 1) // self.workers))
+        self.preset = preset or config_manager.get('CONVERT', 'preset', 'medium')
+        self.crf = str(crf or config_manager.get('DEFAULT', 'convert_quality_crf', '23'))
+        self.requested_encoder = encoder or config_manager.get('CONVERT', 'encoder', 'auto')
+        self.scheduler = DownloadScheduler(self.workers, name="transcode")
+        self._encoder = None
+        self._encoder_lock = threading.Lock()
+        self._process_lock = threading.Lock()
+        self._running: Dict[str, Optional[subprocess.Popen]] = {}  # 已提交的任务 -> ffmpeg进程（未启动时为None）
+        self._cancelled = set()
+
+    @property
+    def encoder(self) -> str:
+        """实际使用的H.264编码器（首次访问时探测）"""
+        with self._encoder_lock:
+            if self._encoder is None:
+                self._encoder = self._select_encoder()
+            return self._encoder
+
+    def _select_encoder(self) -> str:
+        """选择编码器：ffmpeg编译了硬件编码器不代表机器上有对应硬件，需实际试编码一帧"""
+        if self.requested_encoder and self.requested_encoder != 'auto':
+            candidates = [self.requested_encoder]
+        else:
+            candidates = self.ffmpeg.hardware_h264_encoders
+
+        for name in candidates:
+            if name == 'libx264' or self._test_encoder(name):
+                logger.info(f"转码使用编码器: {name}")
+                return name
+            logger.info(f"编码器 {name} 不可用，尝试下一个")
+
+        logger.info("转码使用编码器: libx264")
+        return 'libx264'
+
+    def _test_encoder(self, name: str) -> bool:
+        """用一帧测试画面验证编码器是否可用"""
+        if not self.ffmpeg.has_encoder(name):
+            return False
+        cmd = [
+            self.ffmpeg.ffmpeg_path, '-hide_banner', '-v', 'error',
+            *self._input_args(name),
+            '-f', 'lavfi', '-i', 'color=black:s=256x144:d=0.1',
+            *self._filter_args(name),
+            '-frames:v', '1', '-c:v', name, '-f', 'null', '-'
+        ]
+        try:
+            return subprocess.run(cmd, capture_output=True, timeout=15).returncode == 0
+        except (subprocess.TimeoutExpired, OSError):
+            return False
+
+    def _input_args(self, encoder: str) -> List[str]:
+        """输入前的硬件设备参数"""
+        if encoder == 'h264_vaapi':
+            return ['-vaapi_device', VAAPI_DEVICE]
+        return []
+
+    def _filter_args(self, encoder: str) -> List[str]:
+        """编码前的像素格式/上传滤镜"""
+        if encoder == 'h264_vaapi':
+            return ['-vf', 'format=nv12,hwupload']
+        return []
+
+    def video_codec_args(self, encoder: str = None) -> List[str]:
+        """视频编码参数"""
+        encoder = encoder or self.encoder
+        if encoder == 'h264_nvenc':
+            return ['-c:v', 'h264_nvenc', '-preset', NVENC_PRESETS.get(self.preset, 'p5'),
+                    '-rc', 'vbr', '-cq', self.crf, '-b:v', '0']
+        if encoder == 'h264_qsv':
+            return ['-c:v', 'h264_qsv', '-preset', QSV_PRESET_FALLBACK.get(self.preset, self.preset),
+                    '-global_quality', self.crf]
+        if encoder == 'h264_vaapi':
+            return [*self._filter_args(encoder), '-c:v', 'h264_vaapi', '-qp', self.crf]
+        # 10位等源转为8位4:2:0，保证播放器兼容
+        return ['-c:v', 'libx264', '-preset', self.preset, '-crf', self.crf,
+                '-pix_fmt', 'yuv420p', '-threads', str(self.threads)]
+
+    def build_command(self, input_path: str, output_path: str, plan: ConversionPlan = None,
+                      encoder: str = None) -> List[str]:
+        """生成转换命令（默认完整转码）"""
+        plan = plan or ConversionPlan(ConversionPlan.FULL, copy_audio=False)
+        input_args = []
+        video_args = []
+        if plan.action == ConversionPlan.FULL:
+            encoder = encoder or self.encoder
+            input_args = self._input_args(encoder)
+            video_args = self.video_codec_args(encoder)
+        return [
+            self.ffmpeg.ffmpeg_path, '-hide_banner',
+            *input_args,
+            '-i', str(input_path),
+            *conversion_args(plan, video_args),
+            '-y',                        # 覆盖输出文件
+            str(output_path)
+        ]
+
+    def convert(self, input_path: str, output_path: str = None, source_codecs=None,
+                replace: bool = False, job_id: str = None) -> ConversionResult:
+        """
+        探测文件并按决策执行直接封装、音频转码或完整转码
+
+        Args:
+            input_path: 输入文件
+            output_path: 输出文件，默认为同目录下的 <文件名>_h264.mp4
+            source_codecs: 需要转码的视频编码，None表示所有非H.264视频
+            replace: 成功后是否用输出文件替换原文件（扩展名改为.mp4）
+            job_id: 任务ID，指定时可以通过 cancel() 终止转码
+
+        Returns:
+            转换结果（采用的路径、耗时、输出文件）
+        """
+        input_path = Path(input_path)
+        if not input_path.exists():
+            return ConversionResult(ConversionPlan.NONE, error=f"文件不存在: {input_path}")
+        if not self.ffmpeg.available:
+            return ConversionResult(ConversionPlan.NONE, error="ffmpeg未安装")
+
+        media = probe_media(self.ffmpeg.ffprobe_path, input_path) if self.ffmpeg.ffprobe_available else None
+        if media is None and source_codecs is not None:
+            # 只转换特定编码时，无法确认编码就不冒险转码
+            return ConversionResult(ConversionPlan.NONE, str(input_path), reason="无法探测媒体信息")
+        plan = plan_conversion(media, source_codecs)
+        if plan.action == ConversionPlan.NONE:
+            logger.info(f"{input_path.name}: {plan.reason}，无需转换")
+            return ConversionResult(plan.action, str(input_path), reason=plan.reason)
+
+        output_path = Path(output_path) if output_path else input_path.with_name(f"{input_path.stem}_h264.mp4")
+        encoder = self.encoder if plan.action == ConversionPlan.FULL else None
+        logger.info(f"{input_path.name}: {plan.reason}，采用{plan.description}"
+                    f"{f'（编码器: {encoder}）' if encoder else ''} -> {output_path.name}")
+
+        start = time.time()
+        try:
+            returncode, stderr = self._run_ffmpeg(self.build_command(input_path, output_path, plan, encoder),
+                                                  job_id)
+        except OSError as e:
+            return ConversionResult(plan.action, elapsed=time.time() - start, encoder=encoder,
+                                    reason=plan.reason, error=str(e))
+        elapsed = time.time() - start
+        if self._is_cancelled(job_id):
+            if output_path != input_path:
+                self._remove_output(output_path)
+            logger.info(f"{plan.description}已取消: {input_path.name}")
+            return ConversionResult(plan.action, elapsed=elapsed, encoder=encoder, reason=plan.reason,
+                                    error="已取消")
+        if returncode != 0:
+            logger.error(f"❌ {plan.description}失败: {input_path.name}")
+            logger.error(f"错误信息: {stderr[-2000:]}")
+            return ConversionResult(plan.action, elapsed=elapsed, encoder=encoder, reason=plan.reason,
+                                    error=stderr.strip().splitlines()[-1] if stderr.strip() else "ffmpeg失败")
+
+        original_size = input_path.stat().st_size / (1024 * 1024)
+        converted_size = output_path.stat().st_size / (1024 * 1024)
+        logger.info(f"✅ {plan.description}完成，耗时 {elapsed:.1f} 秒: {output_path}")
+        logger.info(f"原文件大小: {original_size:.1f} MB，转换后大小: {converted_size:.1f} MB")
+
+        final_path = output_path
+        if replace:
+            # 删除原文件，转换结果改回原文件名
+            target = input_path.with_suffix('.mp4')
+            try:
+                os.replace(output_path, target)
+                if target != input_path:
+                    os.remove(input_path)
+                final_path = target
+                logger.info(f"已替换原文件: {target.name}")
+            except OSError as e:
+                logger.warning(f"文件操作失败: {e}")
+
+        return ConversionResult(plan.action, str(final_path), elapsed, encoder, plan.reason)
+
+    def _run_ffmpeg(self, cmd: List[str], job_id: str = None):
+        """
+        执行ffmpeg命令，运行期间登记进程以便取消
+
+        Returns:
+            (返回码, 标准错误输出)
+        """
+        with self._process_lock:
+            if job_id in self._cancelled:
+                return -1, ""
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                       text=True, encoding='utf-8', errors='replace')
+            if job_id is not None:
+                self._running[job_id] = process
+        try:
+            _, stderr = process.communicate()
+        finally:
+            if job_id is not None:
+                with self._process_lock:
+                    if self._running.get(job_id) is process:
+                        self._running[job_id] = None
+        return process.returncode, stderr
+
+    def _is_cancelled(self, job_id: str) -> bool:
+        with self._process_lock:
+            return job_id is not None and job_id in self._cancelled
+
+    @staticmethod
+    def _remove_output(output_path: Path):
+        """删除未完成的输出文件"""
+        try:
+            if output_path.exists():
+                os.remove(output_path)
+        except OSError as e:
+            logger.warning(f"删除未完成的转码文件失败 {output_path}: {e}")
+
+    def convert_if_needed(self, video_file_path: str, job_id: str = None) -> ConversionResult:
+        """下载完成后的自动转换：只把AV1转为H.264，并替换原文件"""
+        try:
+            return self.convert(video_file_path, source_codecs=('av1',), replace=True, job_id=job_id)
+        except Exception as e:
+            logger.error(f"格式转换过程中出错: {e}")
+            return ConversionResult(ConversionPlan.NONE, error=str(e))
+
+    def submit(self, job_id: str, video_file_path: str,
+               callback: Callable[[ConversionResult], None] = None):
+        """
+        提交转码任务（大文件优先，缩短整批的尾部等待）
+
+        Args:
+            job_id: 任务ID
+            video_file_path: 视频文件路径
+            callback: 完成回调，参数为转换结果
+        """
+        def run():
+            try:
+                result = self.convert_if_needed(video_file_path, job_id)
+            finally:
+                with self._process_lock:
+                    self._running.pop(job_id, None)
+                    self._cancelled.discard(job_id)
+            if callback:
+                callback(result)
+
+        try:
+            priority = -os.path.getsize(video_file_path)
+        except OSError:
+            priority = 0
+        # 提交前就登记任务：调度线程取出任务后、ffmpeg启动前取消时，cancel() 也能找到它
+        with self._process_lock:
+            self._running[job_id] = None
+        try:
+            self.scheduler.submit(job_id, run, priority)
+        except RuntimeError:
+            with self._process_lock:
+                self._running.pop(job_id, None)
+            raise
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        取消转码任务：尚未开始的移出队列；正在进行的直接结束ffmpeg进程
+        （收到SIGTERM后ffmpeg会先冲刷编码器缓冲，输出反正要删除，不必等待），未完成的输出文件随后删除
+
+        Returns:
+            是否取消了任务
+        """
+        with self._process_lock:
+            if job_id not in self._running:
+                return False
+            if self.scheduler.cancel(job_id):
+                self._running.pop(job_id)
+                return True
+            # 已被调度线程取出：ffmpeg尚未启动时 _run_ffmpeg 不再启动它，已启动时结束进程
+            self._cancelled.add(job_id)
+            process = self._running[job_id]
+        if process is not None and process.poll() is None:
+            process.kill()
+            logger.info(f"已终止转码进程: {job_id}")
+        return True
+
+    def get_stats(self):
+        """转码队列统计"""
+        return self.scheduler.get_stats()
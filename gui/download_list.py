@@ -0,0 +1,287 @@
+"""
+虚拟化下载列表模块
+所有任务的进度快照保存在 DownloadListModel 中，Treeview 只包含当前可见的几十行：
+滚动、筛选和排序时重新填充可见窗口，任务再多界面也不会变慢。
+Treeview 的项目ID就是下载ID，选中项目和下载任务之间可以直接互查
+"""
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.progress_state import ProgressSnapshot
+
+
+# 行高（像素），与 Treeview 样式中的 rowheight 一致
+ROW_HEIGHT = 18
+
+# 列标题占用的高度（像素），用于根据控件高度计算可见行数
+HEADING_HEIGHT = 24
+
+# 鼠标滚轮每格滚动的行数
+WHEEL_ROWS = 3
+
+# 状态筛选选项：显示名称 -> 包含的状态（None表示全部）
+STATUS_FILTERS = {
+    '全部': None,
+    '进行中': ('waiting', 'downloading', 'converting'),
+    '已暂停': ('paused',),
+    '已完成': ('completed', 'skipped'),
+    '失败': ('error', 'cancelled'),
+}
+
+# 可排序的列 -> 排序依据（速度只在下载中时有意义）
+SORT_KEYS = {
+    'speed': lambda progress: progress.speed if progress.status == 'downloading' else 0.0,
+    'size': lambda progress: progress.total_bytes,
+}
+
+
+class DownloadListModel:
+    """下载列表的数据（任务快照、筛选和排序），不依赖Tk"""
+
+    def __init__(self):
+        self._rows: Dict[str, ProgressSnapshot] = {}  # 按添加顺序
+        self._statuses: Optional[Tuple[str, ...]] = None
+        self._sort_key: Optional[str] = None
+        self._descending = True
+        self._view: List[str] = []
+        self._positions: Optional[Dict[str, int]] = None
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, download_id: str) -> bool:
+        return download_id in self._rows
+
+    def get(self, download_id: str) -> Optional[ProgressSnapshot]:
+        return self._rows.get(download_id)
+
+    def update(self, snapshots: Dict[str, ProgressSnapshot]) -> bool:
+        """
+        添加或更新任务快照
+
+        Returns:
+            可见行的顺序或成员是否需要重新计算（新增任务、筛选状态或排序字段发生变化）
+        """
+        sort = SORT_KEYS.get(self._sort_key)
+        for download_id, progress in snapshots.items():
+            old = self._rows.get(download_id)
+            self._rows[download_id] = progress
+            if self._dirty:
+                continue
+            if old is None:
+                self._dirty = True
+            elif self._statuses is not None and (old.status in self._statuses) != (progress.status in self._statuses):
+                self._dirty = True
+            elif sort is not None and sort(old) != sort(progress):
+                self._dirty = True
+        return self._dirty
+
+    def remove(self, download_ids: Iterable[str]) -> int:
+        """移除任务，返回移除的数量"""
+        removed = sum(self._rows.pop(download_id, None) is not None for download_id in download_ids)
+        if removed:
+            self._dirty = True
+        return removed
+
+    def ids_with_status(self, statuses: Iterable[str]) -> List[str]:
+        """状态属于 statuses 的所有任务（不受筛选影响）"""
+        statuses = set(statuses)
+        return [download_id for download_id, progress in self._rows.items() if progress.status in statuses]
+
+    def set_filter(self, statuses: Optional[Iterable[str]]):
+        """只显示指定状态的任务，None表示全部"""
+        self._statuses = tuple(statuses) if statuses is not None else None
+        self._dirty = True
+
+    def set_sort(self, key: Optional[str], descending: bool = True):
+        """按 SORT_KEYS 中的字段排序，None表示按添加顺序"""
+        self._sort_key = key if key in SORT_KEYS else None
+        self._descending = descending
+        self._dirty = True
+
+    @property
+    def sort_state(self) -> Tuple[Optional[str], bool]:
+        return self._sort_key, self._descending
+
+    def view(self) -> List[str]:
+        """筛选、排序后的下载ID列表（只在数据变化影响顺序时重新计算）"""
+        if self._dirty:
+            rows = self._rows
+            if self._statuses is None:
+                view = list(rows)
+            else:
+                view = [download_id for download_id, progress in rows.items() if progress.status in self._statuses]
+            sort = SORT_KEYS.get(self._sort_key)
+            if sort is not None:
+                # 稳定排序：排序字段相同的任务保持添加顺序
+                view.sort(key=lambda download_id: sort(rows[download_id]), reverse=self._descending)
+            self._view = view
+            self._positions = None
+            self._dirty = False
+        return self._view
+
+    def index(self, download_id: str) -> Optional[int]:
+        """任务在当前视图中的位置（不在视图中时返回None）"""
+        view = self.view()
+        if self._positions is None:
+            self._positions = {download_id: index for index, download_id in enumerate(view)}
+        return self._positions.get(download_id)
+
+
+class VirtualDownloadList:
+    """只渲染可见窗口的下载列表（Treeview + 自管理的垂直滚动条）"""
+
+    def __init__(self, parent, columns: Tuple[str, ...],
+                 formatter: Callable[[ProgressSnapshot], Tuple[tuple, str]]):
+        """
+        Args:
+            parent: 父容器（列表占用其第0行第0列，滚动条占用第0行第1列和第1行第0列）
+            columns: 列标题
+            formatter: 把进度快照格式化为 (各列显示值, 状态标签) 的函数
+        """
+        self.model = DownloadListModel()
+        self.formatter = formatter
+        self.tree = ttk.Treeview(parent, columns=columns, show='headings', height=8)
+        self.first = 0          # 可见窗口第一行在视图中的位置
+        self.rows = 8           # 可见行数
+        self._rendered: Dict[str, Tuple[ProgressSnapshot, tuple, tuple]] = {}  # 下载ID -> 已显示的 (快照, 值, 标签)
+        self._selected = set()  # 选中的下载ID（包括滚出可见窗口的）
+        self._stale = True
+
+        self.v_scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.yview)
+        h_scrollbar = ttk.Scrollbar(parent, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=h_scrollbar.set)
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
+
+        self.tree.bind('<Configure>', self._on_resize)
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        self.tree.bind('<MouseWheel>', lambda e: self._scroll_rows(-WHEEL_ROWS if e.delta > 0 else WHEEL_ROWS))
+        self.tree.bind('<Button-4>', lambda e: self._scroll_rows(-WHEEL_ROWS))
+        self.tree.bind('<Button-5>', lambda e: self._scroll_rows(WHEEL_ROWS))
+
+    def update(self, snapshots: Dict[str, ProgressSnapshot]):
+        """添加或更新任务，只有影响可见窗口时才重新渲染"""
+        if not snapshots:
+            return
+        if self.model.update(snapshots) or any(download_id in self._rendered for download_id in snapshots):
+            self._stale = True
+
+    def remove(self, download_ids: Iterable[str]) -> int:
+        """移除任务，返回移除的数量"""
+        download_ids = list(download_ids)
+        self._selected.difference_update(download_ids)
+        removed = self.model.remove(download_ids)
+        self._stale = self._stale or bool(removed)
+        return removed
+
+    def set_filter(self, statuses: Optional[Iterable[str]]):
+        self.model.set_filter(statuses)
+        self.first = 0
+        self._stale = True
+
+    def set_sort(self, key: Optional[str], descending: bool = True):
+        self.model.set_sort(key, descending)
+        self.first = 0
+        self._stale = True
+
+    def selection(self) -> List[str]:
+        """选中的下载ID（按视图顺序）"""
+        if not self._selected:
+            return []
+        index = self.model.index
+        return sorted((download_id for download_id in self._selected if index(download_id) is not None),
+                      key=index)
+
+    def select(self, download_id: str):
+        """只选中指定任务"""
+        self._selected = {download_id}
+        if self.tree.exists(download_id):
+            self.tree.selection_set(download_id)
+
+    def identify_row(self, y: int) -> Optional[str]:
+        """鼠标位置所在行的下载ID"""
+        return self.tree.identify_row(y) or None
+
+    def yview(self, *args):
+        """滚动条回调（moveto 比例 / scroll 数量 units|pages）"""
+        total = len(self.model.view())
+        if args[0] == 'moveto':
+            self._scroll_to(int(float(args[1]) * total))
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            self._scroll_rows(amount * self.rows if args[2] == 'pages' else amount)
+
+    def refresh(self):
+        """把可见窗口同步到Treeview（数据没有影响可见窗口时直接返回）"""
+        if not self._stale:
+            return
+        self._stale = False
+        view = self.model.view()
+        self.first = max(0, min(self.first, len(view) - self.rows))
+        wanted = view[self.first:self.first + self.rows]
+        tree = self.tree
+
+        wanted_set = set(wanted)
+        gone = [download_id for download_id in tree.get_children() if download_id not in wanted_set]
+        if gone:
+            tree.delete(*gone)
+            for download_id in gone:
+                self._rendered.pop(download_id, None)
+
+        for position, download_id in enumerate(wanted):
+            progress = self.model.get(download_id)
+            row_tag = 'evenrow' if (self.first + position) % 2 == 0 else 'oddrow'
+            rendered = self._rendered.get(download_id)
+            if rendered is not None and rendered[0] is progress and rendered[2][0] == row_tag:
+                if tree.index(download_id) != position:
+                    tree.move(download_id, '', position)
+                continue
+            values, status_tag = self.formatter(progress)
+            tags = (row_tag, status_tag) if status_tag else (row_tag,)
+            if rendered is None:
+                tree.insert('', position, iid=download_id, values=values, tags=tags)
+            else:
+                if tree.index(download_id) != position:
+                    tree.move(download_id, '', position)
+                if (values, tags) != rendered[1:]:
+                    # 快照变了但显示内容相同（如只有字节数变化不足0.1%）时不更新
+                    tree.item(download_id, values=values, tags=tags)
+            self._rendered[download_id] = (progress, values, tags)
+
+        visible = [download_id for download_id in wanted if download_id in self._selected]
+        if tuple(visible) != tree.selection():
+            tree.selection_set(visible)
+        self._update_scrollbar(len(view))
+
+    def _update_scrollbar(self, total: int):
+        if total <= self.rows:
+            self.v_scrollbar.set(0.0, 1.0)
+        else:
+            self.v_scrollbar.set(self.first / total, (self.first + self.rows) / total)
+
+    def _scroll_to(self, first: int):
+        first = max(0, min(first, len(self.model.view()) - self.rows))
+        if first != self.first:
+            self.first = first
+            self._stale = True
+            self.refresh()
+
+    def _scroll_rows(self, amount: int):
+        self._scroll_to(self.first + amount)
+        return 'break'
+
+    def _on_resize(self, event):
+        rows = max(1, (event.height - HEADING_HEIGHT) // ROW_HEIGHT)
+        if rows != self.rows:
+            self.rows = rows
+            self._stale = True
+            self.refresh()
+
+    def _on_select(self, event):
+        # 可见窗口之外的选中项保持不变
+        visible = set(self.tree.get_children())
+        self._selected = (self._selected - visible) | set(self.tree.selection())
@@ -3,31 +3,67 @@
 提供用户友好的视频下载界面
 """
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, scrolledtext
+from tkinter import ttk, filedialog, messagebox, scrolledtext, simpledialog
 import threading
 import os
-from datetime import datetime
+import time
 
 from core.downloader import VideoDownloader
 from core.config_manager import config_manager
+from core.daemon_client import DaemonClient, RemoteDownloader
+from core.bandwidth import parse_rate_limit
+from gui.download_list import ROW_HEIGHT, STATUS_FILTERS, VirtualDownloadList
 from utils.logger import logger
+from utils.formatters import format_bytes, format_speed
 from utils.validators import URLValidator
 
 
+# 关闭窗口时等待下载任务停止的最长时间（秒）
+CLOSE_WAIT_SECONDS = 5
+
+# 进度刷新间隔（毫秒）：每次批量处理这段时间内有变化的任务
+PROGRESS_REFRESH_MS = 250
+
+# 没有任务变化时，统计信息（含当前时间段）的刷新间隔（秒）
+STATS_REFRESH_SECONDS = 5
+
+# 状态显示（带图标）
+STATUS_DISPLAY = {
+    'waiting': '⏳ 等待中',
+    'downloading': '⬇️ 下载中',
+    'converting': '🔄 转码中',
+    'completed': '✅ 已完成',
+    'error': '❌ 错误',
+    'cancelled': '⏹️ 已取消',
+    'paused': '⏸️ 已暂停',
+    'skipped': '⏭️ 已跳过'
+}
+
+# 可以点击标题排序的列 -> 排序字段
+SORTABLE_COLUMNS = {'速度': 'speed', '大小': 'size'}
+
+# 已结束的状态（"清除已完成"会移除这些任务）
+FINISHED_STATUSES = ('completed', 'error', 'cancelled', 'skipped')
+
+
 class MainWindow:
     """主窗口类"""
     
     def __init__(self):
         self.root = tk.Tk()
-        self.downloader = VideoDownloader()
-        self.download_items = {}  # 存储下载项目的GUI元素
+        # 下载守护进程正在运行时作为它的前端，关闭窗口不影响守护进程中的下载
+        client = DaemonClient.connect(config_manager)
+        self.remote = client is not None
+        self.downloader = RemoteDownloader(client) if self.remote else VideoDownloader()
+        self.stats_updated = 0.0
         self.setup_window()
         self.create_widgets()
         self.setup_bindings()
+        if self.remote:
+            self.status_var.set(f"已连接下载守护进程: {client.base_url}")
         
-        # 启动进度更新线程
-        self.update_thread = threading.Thread(target=self.update_progress_loop, daemon=True)
-        self.update_thread.start()
+        # 在主线程中定时批量处理下载器发布的进度变化
+        self.root.after(PROGRESS_REFRESH_MS, self.process_progress_events)
     
     def setup_window(self):
         """设置窗口属性"""
@@ -130,8 +166,17 @@ class MainWindow:
     def create_download_list_section(self, parent):
         """创建下载列表区域"""
         # 下载列表标签 - 使用更大的字体和图标
-        list_label = ttk.Label(parent, text="📥 下载列表", font=('Microsoft YaHei UI', 10, 'bold'))
-        list_label.grid(row=3, column=0, sticky=(tk.W, tk.N), pady=(0, 5))
+        label_frame = ttk.Frame(parent)
+        label_frame.grid(row=3, column=0, sticky=(tk.W, tk.N), pady=(0, 5))
+        list_label = ttk.Label(label_frame, text="📥 下载列表", font=('Microsoft YaHei UI', 10, 'bold'))
+        list_label.pack(anchor=tk.W)
+
+        # 按状态筛选
+        self.filter_var = tk.StringVar(value='全部')
+        filter_combo = ttk.Combobox(label_frame, textvariable=self.filter_var, values=list(STATUS_FILTERS),
+                                    state='readonly', width=8)
+        filter_combo.pack(anchor=tk.W, pady=(5, 0))
+        filter_combo.bind('<<ComboboxSelected>>', lambda e: self.filter_download_list())
 
         # 创建下载列表容器框架
         list_frame = ttk.LabelFrame(parent, text="", padding="5")
@@ -139,9 +184,10 @@ class MainWindow:
         list_frame.columnconfigure(0, weight=1)
         list_frame.rowconfigure(0, weight=1)
 
-        # 创建Treeview用于显示下载列表
+        # 创建下载列表：Treeview中只保留可见的行，滚动时从列表数据中重新填充
         columns = ('标题', '状态', '进度', '速度', '大小', '时间')
-        self.download_tree = ttk.Treeview(list_frame, columns=columns, show='headings', height=8)
+        self.download_list = VirtualDownloadList(list_frame, columns, self.format_download_row)
+        self.download_tree = self.download_list.tree
 
         # 设置列标题和宽度 - 优化列宽分配，确保内容完整显示
         column_configs = {
@@ -156,24 +202,13 @@ class MainWindow:
         for col in columns:
             config = column_configs[col]
             self.download_tree.heading(col, text=col, anchor='center')
+            if col in SORTABLE_COLUMNS:
+                self.download_tree.heading(col, command=lambda c=col: self.sort_download_list(c))
             self.download_tree.column(col,
                                     width=config['width'],
                                     minwidth=config['minwidth'],
                                     anchor=config['anchor'])
 
-        # 添加垂直滚动条
-        v_scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.download_tree.yview)
-        self.download_tree.configure(yscrollcommand=v_scrollbar.set)
-
-        # 添加水平滚动条
-        h_scrollbar = ttk.Scrollbar(list_frame, orient=tk.HORIZONTAL, command=self.download_tree.xview)
-        self.download_tree.configure(xscrollcommand=h_scrollbar.set)
-
-        # 放置组件
-        self.download_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
-
         # 配置框架的行列权重
         list_frame.rowconfigure(1, weight=0)  # 水平滚动条行不扩展
 
@@ -191,7 +226,7 @@ class MainWindow:
         style.configure("Treeview",
                        background="#FFFFFF",
                        foreground="#333333",
-                       rowheight=18,  # 进一步降低行高，更紧凑
+                       rowheight=ROW_HEIGHT,  # 进一步降低行高，更紧凑
                        fieldbackground="#FFFFFF",
                        font=('Microsoft YaHei UI', 9))
 
@@ -225,8 +260,11 @@ class MainWindow:
     def create_context_menu(self):
         """创建右键菜单"""
         self.context_menu = tk.Menu(self.root, tearoff=0)
+        self.context_menu.add_command(label="暂停", command=self.pause_selected_download)
+        self.context_menu.add_command(label="继续", command=self.resume_selected_download)
         self.context_menu.add_command(label="取消下载", command=self.cancel_selected_download)
         self.context_menu.add_command(label="重新下载", command=self.retry_selected_download)
+        self.context_menu.add_command(label="任务限速...", command=self.limit_selected_download)
         self.context_menu.add_separator()
         self.context_menu.add_command(label="打开文件夹", command=self.open_download_folder)
         self.context_menu.add_command(label="复制链接", command=self.copy_selected_url)
@@ -598,8 +636,7 @@ class MainWindow:
         try:
             download_id = self.downloader.start_download(
                 normalized_url,
-                config_manager.get_download_path(),
-                self.on_download_progress
+                config_manager.get_download_path()
             )
 
             if download_id:
@@ -688,168 +725,179 @@ class MainWindow:
 
     def clear_completed(self):
         """清除已完成的下载"""
-        # 获取已完成的项目
-        completed_items = []
-        for item in self.download_tree.get_children():
-            values = self.download_tree.item(item)['values']
-            if len(values) > 1 and values[1] in ['已完成', '错误', '已取消']:
-                completed_items.append(item)
-
-        # 删除GUI中的项目
-        for item in completed_items:
-            self.download_tree.delete(item)
+        removed = self.download_list.remove(self.download_list.model.ids_with_status(FINISHED_STATUSES))
+        self.download_list.refresh()
 
         # 清除下载器中的记录
         self.downloader.clear_completed_downloads()
 
-        self.status_var.set(f"已清除 {len(completed_items)} 个已完成的下载")
+        self.status_var.set(f"已清除 {removed} 个已完成的下载")
+
+    def filter_download_list(self):
+        """按状态筛选下载列表"""
+        self.download_list.set_filter(STATUS_FILTERS[self.filter_var.get()])
+        self.download_list.refresh()
+
+    def sort_download_list(self, column):
+        """点击速度/大小列标题排序：降序 -> 升序 -> 按添加顺序"""
+        key = SORTABLE_COLUMNS[column]
+        current, descending = self.download_list.model.sort_state
+        if current != key:
+            key, descending = key, True
+        elif descending:
+            descending = False
+        else:
+            key = None
+        self.download_list.set_sort(key, descending)
+        for col, col_key in SORTABLE_COLUMNS.items():
+            arrow = (' ▼' if descending else ' ▲') if col_key == key else ''
+            self.download_tree.heading(col, text=col + arrow)
+        self.download_list.refresh()
 
     def open_settings(self):
         """打开设置对话框"""
         try:
             from gui.settings_dialog import SettingsDialog
-            settings_dialog = SettingsDialog(self.root)
+            # 并发数、限速和时间段规则修改后立即应用到进行中的下载
+            settings_dialog = SettingsDialog(self.root, on_apply=self.apply_download_settings)
             settings_dialog.show()
         except Exception as e:
             logger.error(f"打开设置对话框失败: {e}")
             messagebox.showerror("错误", f"打开设置对话框失败: {e}")
 
+    def apply_download_settings(self):
+        """设置保存后应用并发数、限速、时间段规则和重试设置"""
+        if self.remote:
+            self.downloader.client.reload_config()
+            return
+        self.downloader.set_max_concurrent(config_manager.get_max_concurrent_downloads())
+        self.downloader.apply_bandwidth_config()
+        self.downloader.apply_retry_config()
+
     def add_download_item(self, download_id, url):
         """添加下载项目到列表"""
-        # 计算行索引用于交替颜色
-        row_count = len(self.download_tree.get_children())
-        row_tag = 'evenrow' if row_count % 2 == 0 else 'oddrow'
-
-        # 插入新项目
-        item = self.download_tree.insert('', 'end', values=(
-            '🔄 获取视频信息中...', '⏳ 等待中', '0%', '', '', datetime.now().strftime('%H:%M:%S')
-        ), tags=(row_tag,))
-
-        # 存储映射关系
-        self.download_items[download_id] = item
-
-    def on_download_progress(self, download_id, progress):
-        """下载进度回调"""
-        # 这个方法在下载线程中调用，需要线程安全
-        pass  # 实际更新在update_progress_loop中进行
-
-    def update_progress_loop(self):
-        """进度更新循环（在主线程中运行）"""
-        while True:
-            try:
-                self.update_download_list()
-                self.update_statistics()
-            except Exception as e:
-                logger.error(f"更新进度失败: {e}")
-
-            # 每秒更新一次
-            threading.Event().wait(1)
-
-    def update_download_list(self):
-        """更新下载列表显示"""
-        downloads = self.downloader.get_all_downloads()
-
-        for download_id, progress in downloads.items():
-            if download_id in self.download_items:
-                item = self.download_items[download_id]
-
-                # 状态映射（带图标）
-                status_map = {
-                    'waiting': '⏳ 等待中',
-                    'downloading': '⬇️ 下载中',
-                    'completed': '✅ 已完成',
-                    'error': '❌ 错误',
-                    'cancelled': '⏹️ 已取消',
-                    'paused': '⏸️ 已暂停'
-                }
-
-                # 格式化进度显示
-                if progress.progress > 0:
-                    progress_text = f"{progress.progress:.1f}%"
-                    # 添加进度条效果
-                    bar_length = 10
-                    filled_length = int(bar_length * progress.progress / 100)
-                    bar = '█' * filled_length + '░' * (bar_length - filled_length)
-                    progress_display = f"{progress_text} {bar}"
-                else:
-                    progress_display = "0%"
-
-                # 格式化速度显示
-                speed_display = progress.speed if progress.speed else ""
-                if speed_display and not speed_display.endswith('/s'):
-                    speed_display = f"{speed_display}/s" if speed_display != "" else ""
-
-                # 格式化文件大小
-                size_display = progress.file_size if progress.file_size else ""
+        progress = self.downloader.get_download_progress(download_id)
+        if progress is not None:
+            self.download_list.update({download_id: progress})
+            self.download_list.refresh()
 
-                # 更新项目值
-                values = (
-                    progress.title or '🔄 获取视频信息中...',
-                    status_map.get(progress.status, progress.status),
-                    progress_display,
-                    speed_display,
-                    size_display,
-                    progress.start_time.strftime('%H:%M:%S') if progress.start_time else ''
-                )
-
-                # 确定状态标签
-                status_tag = self.get_status_tag(progress.status)
-
-                # 在主线程中更新GUI
-                self.root.after(0, lambda i=item, v=values, t=status_tag: self.update_tree_item(i, v, t))
+    def process_progress_events(self):
+        """批量处理下载器发布的进度变化（在主线程中运行），只重新渲染受影响的可见行"""
+        try:
+            changes = self.downloader.progress_channel.drain()
+            if changes:
+                # 一次取出所有变化任务的快照，渲染期间不受下载线程的更新影响
+                self.download_list.update(self.downloader.get_all_downloads(changes))
+                self.download_list.refresh()
+            if changes or time.monotonic() - self.stats_updated >= STATS_REFRESH_SECONDS:
+                self.update_statistics()
+        except Exception as e:
+            logger.error(f"更新进度失败: {e}")
+
+        self.root.after(PROGRESS_REFRESH_MS, self.process_progress_events)
+
+    def format_download_row(self, progress):
+        """生成下载列表一行的显示值和状态标签"""
+        # 格式化进度显示
+        if progress.progress > 0:
+            progress_text = f"{progress.progress:.1f}%"
+            # 添加进度条效果
+            bar_length = 10
+            filled_length = int(bar_length * progress.progress / 100)
+            bar = '█' * filled_length + '░' * (bar_length - filled_length)
+            progress_display = f"{progress_text} {bar}"
+        else:
+            progress_display = "0%"
+
+        # 速度和文件大小（进度中只保存数值，在这里格式化）
+        speed_display = format_speed(progress.speed) if progress.status == 'downloading' else ""
+        size_display = format_bytes(progress.total_bytes) if progress.total_bytes else ""
+
+        values = (
+            progress.title or '🔄 获取视频信息中...',
+            STATUS_DISPLAY.get(progress.status, progress.status),
+            progress_display,
+            speed_display,
+            size_display,
+            time.strftime('%H:%M:%S', time.localtime(progress.start_time)) if progress.start_time else ''
+        )
+        return values, self.get_status_tag(progress.status)
 
     def get_status_tag(self, status):
         """获取状态对应的标签"""
         tag_map = {
             'downloading': 'downloading',
+            'converting': 'downloading',
             'completed': 'completed',
             'error': 'error',
             'cancelled': 'error',
-            'paused': 'paused'
+            'paused': 'paused',
+            'skipped': 'completed'
         }
         return tag_map.get(status, '')
 
-    def update_tree_item(self, item, values, status_tag):
-        """更新树形控件项目"""
-        # 获取当前标签
-        current_tags = list(self.download_tree.item(item, 'tags'))
-
-        # 移除旧的状态标签，保留行颜色标签
-        new_tags = [tag for tag in current_tags if tag in ['oddrow', 'evenrow']]
-
-        # 添加新的状态标签
-        if status_tag:
-            new_tags.append(status_tag)
-
-        # 更新项目
-        self.download_tree.item(item, values=values, tags=new_tags)
-
     def update_statistics(self):
         """更新统计信息"""
         stats = self.downloader.get_download_statistics()
-        stats_text = f"总计: {stats['total']} | 下载中: {stats['downloading']} | 已完成: {stats['completed']} | 错误: {stats['error']}"
-        self.root.after(0, lambda: self.stats_var.set(stats_text))
+        stats_text = f"总计: {stats['total']} | 下载中: {stats['downloading']} | 已暂停: {stats['paused']} | 已完成: {stats['completed']} | 已跳过: {stats['skipped']} | 错误: {stats['error']}"
+        schedule = getattr(self.downloader, 'active_schedule', None)
+        if schedule:
+            stats_text = f"时段: {schedule.name} | " + stats_text
+        self.stats_var.set(stats_text)
+        self.stats_updated = time.monotonic()
 
     def show_context_menu(self, event):
         """显示右键菜单"""
         # 选择点击的项目
-        item = self.download_tree.identify_row(event.y)
-        if item:
-            self.download_tree.selection_set(item)
+        download_id = self.download_list.identify_row(event.y)
+        if download_id:
+            self.download_list.select(download_id)
             self.context_menu.post(event.x_root, event.y_root)
 
+    def pause_selected_download(self):
+        """暂停选中的下载（保留已下载的部分，腾出槽位给其他任务）"""
+        paused = [download_id for download_id in self.download_list.selection()
+                  if self.downloader.pause_download(download_id)]
+        if paused:
+            self.status_var.set(f"已暂停 {len(paused)} 个下载")
+
+    def resume_selected_download(self):
+        """继续选中的已暂停下载"""
+        resumed = [download_id for download_id in self.download_list.selection()
+                   if self.downloader.resume_download(download_id)]
+        if resumed:
+            self.status_var.set(f"已继续 {len(resumed)} 个下载")
+
     def cancel_selected_download(self):
         """取消选中的下载"""
-        selected = self.download_tree.selection()
+        selected = self.download_list.selection()
         if not selected:
             return
 
-        # 找到对应的download_id
-        for download_id, item in self.download_items.items():
-            if item in selected:
-                if self.downloader.cancel_download(download_id):
-                    self.status_var.set(f"已取消下载: {download_id}")
-                break
+        download_id = selected[0]
+        if self.downloader.cancel_download(download_id):
+            self.status_var.set(f"已取消下载: {download_id}")
+
+    def limit_selected_download(self):
+        """设置选中任务的速度上限（立即生效）"""
+        selected = self.download_list.selection()
+        if not selected:
+            return
+
+        download_id = selected[0]
+        current = self.downloader.get_job_rate_limit(download_id)
+        value = simpledialog.askstring(
+            "任务限速", "速度上限 (如: 500K, 2M；纯数字单位为KB/s，0表示不限速):",
+            initialvalue=str(current // 1024), parent=self.root)
+        if value is None:
+            return
+        try:
+            rate = parse_rate_limit(value)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return
+        self.downloader.set_job_rate_limit(download_id, rate)
+        self.status_var.set(f"任务限速: {format_speed(rate) or '不限速'}")
 
     def retry_selected_download(self):
         """重新下载选中项目"""
@@ -868,29 +916,30 @@ class MainWindow:
 
     def copy_selected_url(self):
         """复制选中项目的URL"""
-        selected = self.download_tree.selection()
+        selected = self.download_list.selection()
         if not selected:
             return
 
-        # 找到对应的URL
-        for download_id, item in self.download_items.items():
-            if item in selected:
-                progress = self.downloader.get_download_progress(download_id)
-                if progress:
-                    self.root.clipboard_clear()
-                    self.root.clipboard_append(progress.url)
-                    self.status_var.set("链接已复制到剪贴板")
-                break
+        progress = self.download_list.model.get(selected[0])
+        if progress:
+            self.root.clipboard_clear()
+            self.root.clipboard_append(progress.url)
+            self.status_var.set("链接已复制到剪贴板")
 
     def on_closing(self):
         """窗口关闭事件"""
         # 询问是否确认退出
         if messagebox.askokcancel("退出", "确定要退出视频下载器吗？"):
-            # 取消所有正在进行的下载
-            downloads = self.downloader.get_all_downloads()
-            for download_id, progress in downloads.items():
-                if progress.status in ['waiting', 'downloading']:
-                    self.downloader.cancel_download(download_id)
+            if self.remote:
+                # 下载在守护进程中继续
+                self.downloader.close()
+                self.root.destroy()
+                return
+
+            # 取消所有未结束的下载和转码，等待传输中断、临时文件清理完成后再退出
+            self.status_var.set("正在停止下载任务...")
+            self.root.update_idletasks()
+            self.downloader.cancel_all(wait=CLOSE_WAIT_SECONDS)
 
             self.root.destroy()
 
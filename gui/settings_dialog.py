@@ -15,8 +15,14 @@ from utils.logger import logger
 class SettingsDialog:
     """设置对话框类"""
     
-    def __init__(self, parent):
+    def __init__(self, parent, on_apply=None):
+        """
+        Args:
+            parent: 父窗口
+            on_apply: 设置保存后的回调（用于立即应用限速等可在运行时修改的设置）
+        """
         self.parent = parent
+        self.on_apply = on_apply
         self.dialog = None
         self.settings = {}
         
@@ -207,6 +213,34 @@ class SettingsDialog:
                                    values=["高质量 (CRF 18)", "中等质量 (CRF 23)", "低质量 (CRF 28)"],
                                    state="readonly", width=20)
         quality_combo.pack(side=tk.LEFT, padx=(5, 0))
+
+        # 转码编码器设置
+        encoder_frame = ttk.Frame(format_frame)
+        encoder_frame.grid(row=5, column=0, sticky=tk.W, pady=(10, 0))
+
+        ttk.Label(encoder_frame, text="编码器:").pack(side=tk.LEFT)
+        self.convert_encoder_var = tk.StringVar()
+        ttk.Combobox(encoder_frame, textvariable=self.convert_encoder_var,
+                     values=["auto", "libx264", "h264_nvenc", "h264_qsv", "h264_vaapi"],
+                     state="readonly", width=12).pack(side=tk.LEFT, padx=(5, 15))
+
+        ttk.Label(encoder_frame, text="预设:").pack(side=tk.LEFT)
+        self.convert_preset_var = tk.StringVar()
+        ttk.Combobox(encoder_frame, textvariable=self.convert_preset_var,
+                     values=["ultrafast", "superfast", "veryfast", "faster", "fast",
+                             "medium", "slow", "slower", "veryslow"],
+                     state="readonly", width=10).pack(side=tk.LEFT, padx=(5, 0))
+
+        threads_frame = ttk.Frame(format_frame)
+        threads_frame.grid(row=6, column=0, sticky=tk.W, pady=(10, 0))
+
+        ttk.Label(threads_frame, text="并发转码数:").pack(side=tk.LEFT)
+        self.convert_workers_var = tk.StringVar()
+        ttk.Entry(threads_frame, textvariable=self.convert_workers_var, width=5).pack(side=tk.LEFT, padx=(5, 15))
+        ttk.Label(threads_frame, text="每任务线程数:").pack(side=tk.LEFT)
+        self.convert_threads_var = tk.StringVar()
+        ttk.Entry(threads_frame, textvariable=self.convert_threads_var, width=5).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Label(threads_frame, text="(0表示按CPU核心数自动)", foreground="gray").pack(side=tk.LEFT, padx=(5, 0))
         
         format_frame.columnconfigure(0, weight=1)
         
@@ -246,9 +280,66 @@ class SettingsDialog:
         rate_frame = ttk.Frame(advanced_frame)
         rate_frame.grid(row=5, column=0, sticky=tk.W)
         
+        ttk.Label(rate_frame, text="全部下载:").grid(row=0, column=0, sticky=tk.W)
         self.rate_limit_var = tk.StringVar()
-        ttk.Entry(rate_frame, textvariable=self.rate_limit_var, width=15).pack(side=tk.LEFT)
-        ttk.Label(rate_frame, text="KB/s (0表示无限制)").pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Entry(rate_frame, textvariable=self.rate_limit_var, width=15).grid(row=0, column=1, padx=(5, 0))
+        ttk.Label(rate_frame, text="KB/s (0表示无限制)").grid(row=0, column=2, sticky=tk.W, padx=(5, 0))
+
+        ttk.Label(rate_frame, text="单个任务:").grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        self.job_rate_limit_var = tk.StringVar()
+        ttk.Entry(rate_frame, textvariable=self.job_rate_limit_var, width=15).grid(
+            row=1, column=1, padx=(5, 0), pady=(5, 0))
+        ttk.Label(rate_frame, text="KB/s (修改后立即对进行中的下载生效)").grid(
+            row=1, column=2, sticky=tk.W, padx=(5, 0), pady=(5, 0))
+
+        # 分段下载
+        ttk.Label(advanced_frame, text="分段下载:", font=('Microsoft YaHei UI', 9, 'bold')).grid(
+            row=6, column=0, sticky=tk.W, pady=(15, 5))
+
+        segment_frame = ttk.Frame(advanced_frame)
+        segment_frame.grid(row=7, column=0, sticky=tk.W)
+
+        self.segmented_download_var = tk.BooleanVar()
+        ttk.Checkbutton(segment_frame, text="多连接分段下载（适用于按连接限速的CDN）",
+                       variable=self.segmented_download_var).grid(row=0, column=0, columnspan=2, sticky=tk.W)
+
+        ttk.Label(segment_frame, text="连接数:").grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        self.segment_count_var = tk.StringVar()
+        ttk.Entry(segment_frame, textvariable=self.segment_count_var, width=10).grid(
+            row=1, column=1, sticky=tk.W, padx=(5, 0), pady=(5, 0))
+
+        # 分片并发（HLS/DASH）
+        ttk.Label(advanced_frame, text="分片并发 (HLS/DASH):", font=('Microsoft YaHei UI', 9, 'bold')).grid(
+            row=8, column=0, sticky=tk.W, pady=(15, 5))
+
+        fragment_frame = ttk.Frame(advanced_frame)
+        fragment_frame.grid(row=9, column=0, sticky=tk.W)
+
+        ttk.Label(fragment_frame, text="分片并发数:").grid(row=0, column=0, sticky=tk.W)
+        self.fragment_concurrency_var = tk.StringVar()
+        ttk.Entry(fragment_frame, textvariable=self.fragment_concurrency_var, width=10).grid(
+            row=0, column=1, sticky=tk.W, padx=(5, 0))
+
+        self.adaptive_fragments_var = tk.BooleanVar()
+        ttk.Checkbutton(fragment_frame, text="根据吞吐量和服务器错误自动调整，上限:",
+                       variable=self.adaptive_fragments_var).grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        self.fragment_concurrency_max_var = tk.StringVar()
+        ttk.Entry(fragment_frame, textvariable=self.fragment_concurrency_max_var, width=10).grid(
+            row=1, column=1, sticky=tk.W, padx=(5, 0), pady=(5, 0))
+
+        # 时间段规则（规则本身在 settings.ini 的 [SCHEDULE] 中编辑）
+        ttk.Label(advanced_frame, text="时间段规则:", font=('Microsoft YaHei UI', 9, 'bold')).grid(
+            row=10, column=0, sticky=tk.W, pady=(15, 5))
+
+        schedule_frame = ttk.Frame(advanced_frame)
+        schedule_frame.grid(row=11, column=0, sticky=tk.W)
+
+        self.schedule_enabled_var = tk.BooleanVar()
+        ttk.Checkbutton(schedule_frame, text="按时间段调整并发数和全局限速",
+                       variable=self.schedule_enabled_var).grid(row=0, column=0, sticky=tk.W)
+        rules = "\n".join(f"{name} = {text}" for name, text in config_manager.get_schedule_rules())
+        ttk.Label(schedule_frame, text=rules or "未配置规则（在 settings.ini 的 [SCHEDULE] 中添加）",
+                 foreground='gray').grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
         
         advanced_frame.columnconfigure(0, weight=1)
         
@@ -301,13 +392,24 @@ class SettingsDialog:
                 "23": "中等质量 (CRF 23)", 
                 "28": "低质量 (CRF 28)"
             }
-            convert_crf = getattr(config_manager, 'convert_quality_crf', '23')
+            convert_crf = config_manager.get('DEFAULT', 'convert_quality_crf', '23')
             self.convert_quality_var.set(quality_map.get(convert_crf, "中等质量 (CRF 23)"))
+            self.convert_encoder_var.set(config_manager.get('CONVERT', 'encoder', 'auto'))
+            self.convert_preset_var.set(config_manager.get('CONVERT', 'preset', 'medium'))
+            self.convert_workers_var.set(config_manager.get('CONVERT', 'workers', '0'))
+            self.convert_threads_var.set(config_manager.get('CONVERT', 'threads', '0'))
             
             # 高级设置
             self.proxy_var.set(config_manager.get('ADVANCED', 'proxy'))
             self.user_agent_var.set(config_manager.get('ADVANCED', 'user_agent'))
             self.rate_limit_var.set(config_manager.get('ADVANCED', 'rate_limit'))
+            self.job_rate_limit_var.set(config_manager.get('ADVANCED', 'job_rate_limit', '0'))
+            self.segmented_download_var.set(config_manager.getboolean('ADVANCED', 'segmented_download'))
+            self.segment_count_var.set(config_manager.get('ADVANCED', 'segment_count', '4'))
+            self.fragment_concurrency_var.set(config_manager.get('ADVANCED', 'fragment_concurrency', '4'))
+            self.fragment_concurrency_max_var.set(config_manager.get('ADVANCED', 'fragment_concurrency_max', '16'))
+            self.adaptive_fragments_var.set(config_manager.getboolean('ADVANCED', 'adaptive_fragments', True))
+            self.schedule_enabled_var.set(config_manager.getboolean('SCHEDULE', 'enabled'))
             
         except Exception as e:
             logger.error(f"加载设置失败: {e}")
@@ -350,14 +452,27 @@ class SettingsDialog:
             }
             crf_value = quality_crf_map.get(self.convert_quality_var.get(), "23")
             config_manager.set('DEFAULT', 'convert_quality_crf', crf_value)
+            config_manager.set('CONVERT', 'encoder', self.convert_encoder_var.get())
+            config_manager.set('CONVERT', 'preset', self.convert_preset_var.get())
+            config_manager.set('CONVERT', 'workers', self.convert_workers_var.get())
+            config_manager.set('CONVERT', 'threads', self.convert_threads_var.get())
             
             # 保存高级设置
             config_manager.set('ADVANCED', 'proxy', self.proxy_var.get())
             config_manager.set('ADVANCED', 'user_agent', self.user_agent_var.get())
-            config_manager.set('ADVANCED', 'rate_limit', self.rate_limit_var.get())
+            config_manager.set('ADVANCED', 'rate_limit', self.rate_limit_var.get() or "0")
+            config_manager.set('ADVANCED', 'job_rate_limit', self.job_rate_limit_var.get() or "0")
+            config_manager.set('ADVANCED', 'segmented_download', str(self.segmented_download_var.get()))
+            config_manager.set('ADVANCED', 'segment_count', self.segment_count_var.get())
+            config_manager.set('ADVANCED', 'fragment_concurrency', self.fragment_concurrency_var.get())
+            config_manager.set('ADVANCED', 'fragment_concurrency_max', self.fragment_concurrency_max_var.get())
+            config_manager.set('ADVANCED', 'adaptive_fragments', str(self.adaptive_fragments_var.get()))
+            config_manager.set('SCHEDULE', 'enabled', str(self.schedule_enabled_var.get()))
             
             # 写入配置文件
             config_manager.save_config()
+            if self.on_apply:
+                self.on_apply()
             
             messagebox.showinfo("成功", "设置已保存！\n部分设置需要重启程序后生效。")
             logger.info("用户设置已更新")
@@ -395,17 +510,37 @@ class SettingsDialog:
                 messagebox.showerror("错误", "超时时间必须在10-300秒之间")
                 return False
                 
+            # 验证转码并发数和线程数
+            convert_workers = int(self.convert_workers_var.get())
+            convert_threads = int(self.convert_threads_var.get())
+            if convert_workers < 0 or convert_threads < 0:
+                messagebox.showerror("错误", "并发转码数和线程数不能为负数")
+                return False
+
+            # 验证分段数
+            segment_count = int(self.segment_count_var.get())
+            if segment_count < 1 or segment_count > 16:
+                messagebox.showerror("错误", "分段连接数必须在1-16之间")
+                return False
+
+            # 验证分片并发数
+            fragment_concurrency = int(self.fragment_concurrency_var.get())
+            fragment_concurrency_max = int(self.fragment_concurrency_max_var.get())
+            if not 1 <= fragment_concurrency <= 32 or not 1 <= fragment_concurrency_max <= 32:
+                messagebox.showerror("错误", "分片并发数和上限必须在1-32之间")
+                return False
+
             # 验证速度限制
-            rate_limit = self.rate_limit_var.get()
-            if rate_limit and rate_limit != "0":
-                try:
-                    rate_value = int(rate_limit)
-                    if rate_value < 0:
-                        messagebox.showerror("错误", "速度限制不能为负数")
+            for rate_limit in (self.rate_limit_var.get(), self.job_rate_limit_var.get()):
+                if rate_limit and rate_limit != "0":
+                    try:
+                        rate_value = int(rate_limit)
+                        if rate_value < 0:
+                            messagebox.showerror("错误", "速度限制不能为负数")
+                            return False
+                    except ValueError:
+                        messagebox.showerror("错误", "速度限制必须是数字")
                         return False
-                except ValueError:
-                    messagebox.showerror("错误", "速度限制必须是数字")
-                    return False
                     
             return True
             
@@ -432,10 +567,21 @@ class SettingsDialog:
                 self.video_quality_var.set("best")
                 self.auto_convert_var.set(True)
                 self.convert_quality_var.set("中等质量 (CRF 23)")
+                self.convert_encoder_var.set("auto")
+                self.convert_preset_var.set("medium")
+                self.convert_workers_var.set("0")
+                self.convert_threads_var.set("0")
                 
                 self.proxy_var.set("")
                 self.user_agent_var.set("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
                 self.rate_limit_var.set("0")
+                self.job_rate_limit_var.set("0")
+                self.segmented_download_var.set(False)
+                self.segment_count_var.set("4")
+                self.fragment_concurrency_var.set("4")
+                self.fragment_concurrency_max_var.set("16")
+                self.adaptive_fragments_var.set(True)
+                self.schedule_enabled_var.set(False)
                 
                 messagebox.showinfo("成功", "设置已重置为默认值")
                 
@@ -10,17 +10,24 @@ from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from core.downloader import VideoDownloader
 from utils.logger import logger
 from core.config_manager import config_manager
+from core.daemon_client import DaemonClient, RemoteDownloader
 from utils.validators import URLValidator
+from utils.formatters import format_duration, format_speed
 
 
 class InteractiveCLI:
     """交互式命令行界面"""
     
     def __init__(self):
-        self.downloader = VideoDownloader()
+        # 下载守护进程正在运行时作为它的前端，否则在本进程中下载
+        self.client = DaemonClient.connect(config_manager)
+        if self.client is not None:
+            self.downloader = RemoteDownloader(self.client)
+        else:
+            from core.downloader import VideoDownloader
+            self.downloader = VideoDownloader()
         self.current_url = None
         self.current_quality = "best"
         self.current_output = config_manager.get_download_path()
@@ -166,25 +173,27 @@ class InteractiveCLI:
         print(f"   目录: {self.current_output}")
         print()
         
+        download_id = None
         try:
-            # 创建下载任务
-            download_id = self.downloader.create_download(self.current_url, self.current_output)
+            # 创建下载任务并提交到调度队列（连接守护进程时由守护进程下载）
+            download_id = self.downloader.start_download(self.current_url, self.current_output)
             if not download_id:
                 print("❌ 创建下载任务失败")
                 return
-                
-            # 开始下载
-            self.downloader.start_download(download_id)
             
             # 监控进度
             print("📊 下载进度:")
             while True:
-                progress = self.downloader.get_progress(download_id)
+                progress = self.downloader.get_download_progress(download_id)
+                if progress is None:
+                    # 守护进程的事件流还没有送来这个任务
+                    time.sleep(0.5)
+                    continue
                 
                 if progress.status == 'downloading':
                     percent = progress.progress if progress.progress is not None else 0
-                    speed = progress.speed if progress.speed is not None else "未知"
-                    eta = progress.eta if progress.eta is not None else "未知"
+                    speed = format_speed(progress.speed) or "未知"
+                    eta = format_duration(progress.eta) or "未知"
                     
                     # 进度条
                     bar_length = 30
@@ -193,20 +202,33 @@ class InteractiveCLI:
                     
                     print(f"\r   [{bar}] {percent:.1f}% | {speed} | 剩余: {eta}", end="", flush=True)
                     
+                elif progress.status == 'converting':
+                    print("\r   正在转换格式..." + " " * 40, end="", flush=True)
+                    
                 elif progress.status == 'completed':
                     print(f"\n✅ {media_type}下载完成!")
-                    print(f"   文件: {progress.filename}")
+                    print(f"   标题: {progress.title or progress.url}")
                     break
                     
-                elif progress.status == 'error':
-                    print(f"\n❌ 下载失败: {progress.error}")
+                elif progress.status == 'skipped':
+                    print(f"\n⏭️ 已下载过，跳过: {progress.title or progress.url}")
+                    break
+                    
+                elif progress.status in ('error', 'cancelled'):
+                    print(f"\n❌ 下载失败: {progress.error_message or '任务已取消'}")
                     break
                     
                 time.sleep(0.5)
                 
         except KeyboardInterrupt:
-            print("\n⚠️ 用户中断下载")
-            self.downloader.cancel_download(download_id)
+            if self.client is not None:
+                # 只断开本进程，任务在守护进程中继续下载
+                print("\n⚠️ 已停止显示进度，任务在下载守护进程中继续")
+            elif download_id:
+                print("\n⚠️ 用户中断下载")
+                self.downloader.cancel_download(download_id)
+                # 等待下载线程中断传输并删除临时文件
+                self.downloader.wait_idle(5)
         except Exception as e:
             print(f"\n❌ 下载失败: {e}")
             
@@ -308,6 +330,8 @@ class InteractiveCLI:
         
         print("🎉 欢迎使用视频下载器交互式终端版!")
         print("💡 提示: 随时按 Ctrl+C 退出程序")
+        if self.client is not None:
+            print(f"📡 已连接下载守护进程: {self.client.base_url}")
         print()
         
         while True:
@@ -354,12 +378,11 @@ def main():
         logger.info("视频下载器交互式终端版启动")
         logger.info("=" * 50)
         
-        # 检查依赖
-        try:
-            import yt_dlp
-            import requests
-        except ImportError as e:
-            print(f"❌ 缺少依赖项: {e}")
+        # 检查依赖（只查找模块，不实际导入）
+        import importlib.util
+        missing = [name for name in ('yt_dlp', 'requests') if importlib.util.find_spec(name) is None]
+        if missing:
+            print(f"❌ 缺少依赖项: {', '.join(missing)}")
             print("请运行: pip install -r requirements.txt")
             return 1
             
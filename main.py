@@ -16,14 +16,12 @@ from core.config_manager import config_manager
 
 
 def check_dependencies():
-    """检查依赖项"""
-    try:
-        import yt_dlp
-        import requests
-        logger.info("依赖项检查通过")
-        return True
-    except ImportError as e:
-        error_msg = f"缺少必要的依赖项: {e}\n\n请运行以下命令安装依赖:\npip install -r requirements.txt"
+    """检查依赖项（只查找模块，不实际导入，yt_dlp在首次下载时才加载）"""
+    import importlib.util
+
+    missing = [name for name in ('yt_dlp', 'requests') if importlib.util.find_spec(name) is None]
+    if missing:
+        error_msg = f"缺少必要的依赖项: {', '.join(missing)}\n\n请运行以下命令安装依赖:\npip install -r requirements.txt"
         logger.error(error_msg)
         
         root = tk.Tk()
@@ -32,6 +30,9 @@ def check_dependencies():
         root.destroy()
         return False
 
+    logger.info("依赖项检查通过")
+    return True
+
 
 def create_directories():
     """创建必要的目录"""
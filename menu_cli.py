@@ -152,6 +152,7 @@ def handle_download(audio_only=False):
     
     try:
         from core.downloader import VideoDownloader
+        from utils.formatters import format_speed
         import time
         
         downloader = VideoDownloader()
@@ -166,7 +167,7 @@ def handle_download(audio_only=False):
                 
                 if progress.status == 'downloading':
                     percent = progress.progress or 0
-                    speed = progress.speed or "未知"
+                    speed = format_speed(progress.speed) or "未知"
                     print(f"\r   进度: {percent:.1f}% | 速度: {speed}", end="", flush=True)
                     
                 elif progress.status == 'completed':
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分片并发基准测试
+启动一个本地HLS模拟服务器（m3u8播放列表 + 随机内容分片，每个请求带固定延迟并按连接限速），
+比较顺序下载、固定并发和自适应并发的耗时，并校验合并结果与分片内容逐字节一致。
+可用 --max-server-conns 模拟服务器在并发过高时返回503（或用 --overload-status 429 模拟限流），
+验证自适应控制器的降并发行为
+"""
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+import functools
+import http.server
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+CHUNK_SIZE = 16 * 1024
+
+
+class HLSHandler(http.server.SimpleHTTPRequestHandler):
+    """HLS模拟服务器：每个请求先等待latency秒，再按rate_limit限速发送"""
+
+    latency = 0.0
+    rate_limit = 0
+    max_connections = 0   # 同时处理的分片请求上限，超过时返回overload_status，0表示不限制
+    overload_status = 503
+    active = 0
+    requests = 0
+    rejected = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            return super().do_GET()
+        is_fragment = path.endswith('.ts')
+        with HLSHandler.lock:
+            HLSHandler.requests += 1
+            overloaded = is_fragment and self.max_connections and HLSHandler.active >= self.max_connections
+            if overloaded:
+                HLSHandler.rejected += 1
+            elif is_fragment:
+                HLSHandler.active += 1
+        if overloaded:
+            self.send_error(self.overload_status, 'Server overloaded')
+            return
+        try:
+            self._send_file(path, is_fragment)
+        finally:
+            if is_fragment:
+                with HLSHandler.lock:
+                    HLSHandler.active -= 1
+
+    def _send_file(self, path, is_fragment):
+        if is_fragment and self.latency:
+            time.sleep(self.latency)
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp2t' if is_fragment else 'application/vnd.apple.mpegurl')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        for offset in range(0, len(data), CHUNK_SIZE):
+            chunk = data[offset:offset + CHUNK_SIZE]
+            try:
+                self.wfile.write(chunk)
+            except OSError:
+                return
+            if is_fragment and self.rate_limit:
+                time.sleep(len(chunk) / self.rate_limit)
+
+
+def create_stream(directory: str, fragments: int, fragment_kb: int) -> str:
+    """生成播放列表和分片，返回全部分片内容的sha256"""
+    digest = hashlib.sha256()
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:4',
+             '#EXT-X-MEDIA-SEQUENCE:0', '#EXT-X-PLAYLIST-TYPE:VOD']
+    for index in range(fragments):
+        data = os.urandom(fragment_kb * 1024)
+        digest.update(data)
+        with open(os.path.join(directory, f'seg{index:04d}.ts'), 'wb') as f:
+            f.write(data)
+        lines += ['#EXTINF:4.000,', f'seg{index:04d}.ts']
+    lines.append('#EXT-X-ENDLIST')
+    with open(os.path.join(directory, 'index.m3u8'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    return digest.hexdigest()
+
+
+def start_server(directory: str):
+    handler = functools.partial(HLSHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def download(url: str, output: str, concurrency: int, maximum: int, adaptive: bool, retries: int) -> float:
+    """用下载器实际使用的YoutubeDL类下载HLS流，返回耗时（秒）"""
+    from core.segmented import SegmentedYoutubeDL
+
+    params = {
+        'quiet': True,
+        'noprogress': True,
+        'continuedl': False,
+        'fragment_retries': retries,
+        'skip_unavailable_fragments': False,
+        'concurrent_fragment_downloads': max(concurrency, maximum) if adaptive else concurrency,
+        'adaptive_fragments': adaptive,
+        'fragment_concurrency_initial': concurrency,
+    }
+    info = {'id': 'bench', 'url': url, 'ext': 'mp4', 'protocol': 'm3u8_native'}
+    start = time.perf_counter()
+    with SegmentedYoutubeDL(params) as ydl:
+        success, _ = ydl.dl(output, info)
+    elapsed = time.perf_counter() - start
+    if not success:
+        raise RuntimeError("下载失败")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分片并发基准测试')
+    parser.add_argument('--fragments', type=int, default=60, help='分片数 (默认: 60)')
+    parser.add_argument('--fragment-kb', type=int, default=256, help='每个分片的大小，单位KB (默认: 256)')
+    parser.add_argument('--latency-ms', type=int, default=100, help='每个分片请求的延迟，单位毫秒 (默认: 100)')
+    parser.add_argument('--rate-kb', type=int, default=2048,
+                        help='每个连接的限速，单位KB/s，0表示不限速 (默认: 2048)')
+    parser.add_argument('--max-server-conns', type=int, default=0,
+                        help='服务器同时处理的分片请求上限，超过时返回错误 (默认: 不限制)')
+    parser.add_argument('--overload-status', type=int, choices=[503, 429], default=503,
+                        help='超过上限时返回的状态码：503（服务器过载）或429（限流） (默认: 503)')
+    parser.add_argument('-c', '--concurrency', type=int, nargs='+', default=[1, 4, 8],
+                        help='要比较的固定并发数 (默认: 1 4 8)')
+    parser.add_argument('--adaptive-initial', type=int, default=4, help='自适应并发的初始值 (默认: 4)')
+    parser.add_argument('--adaptive-max', type=int, default=16, help='自适应并发的上限 (默认: 16)')
+    parser.add_argument('--retries', type=int, default=10, help='分片重试次数 (默认: 10)')
+    args = parser.parse_args()
+
+    HLSHandler.latency = args.latency_ms / 1000
+    HLSHandler.rate_limit = args.rate_kb * 1024
+    HLSHandler.max_connections = args.max_server_conns
+    HLSHandler.overload_status = args.overload_status
+
+    with tempfile.TemporaryDirectory(prefix='bench_fragments_') as tmp:
+        stream_dir = os.path.join(tmp, 'stream')
+        os.makedirs(stream_dir)
+        expected = create_stream(stream_dir, args.fragments, args.fragment_kb)
+        server = start_server(stream_dir)
+        url = f"http://127.0.0.1:{server.server_address[1]}/index.m3u8"
+        total_mb = args.fragments * args.fragment_kb / 1024
+        print(f"HLS流: {args.fragments} 个分片 x {args.fragment_kb} KB ({total_mb:.1f} MB) | "
+              f"请求延迟 {args.latency_ms} ms | 每连接限速 "
+              f"{f'{args.rate_kb} KB/s' if args.rate_kb else '无'} | 服务器并发上限 "
+              f"{f'{args.max_server_conns}（超过时返回{args.overload_status}）' if args.max_server_conns else '无'}")
+
+        runs = [(f"固定并发 {n:2d}", n, False) for n in args.concurrency]
+        runs.append((f"自适应 {args.adaptive_initial}-{args.adaptive_max}", args.adaptive_initial, True))
+
+        failed = False
+        baseline = None
+        try:
+            for index, (label, concurrency, adaptive) in enumerate(runs):
+                # 每次运行使用单独的目录，失败的运行留下的分片文件不会被下一次续传
+                run_dir = os.path.join(tmp, f'run{index}')
+                os.makedirs(run_dir)
+                output = os.path.join(run_dir, 'out.mp4')
+                HLSHandler.requests = HLSHandler.rejected = 0
+                try:
+                    elapsed = download(url, output, concurrency, args.adaptive_max, adaptive, args.retries)
+                except Exception as e:
+                    print(f"❌ {label}: {e}")
+                    failed = True
+                    continue
+                identical = sha256(output) == expected
+                failed |= not identical
+                baseline = baseline or elapsed
+                print(f"{'✅' if identical else '❌'} {label}: {elapsed:6.2f} 秒 | "
+                      f"{total_mb / elapsed:6.1f} MB/s | 加速 {baseline / elapsed:4.1f}x | "
+                      f"请求 {HLSHandler.requests} ({args.overload_status}: {HLSHandler.rejected}) | "
+                      f"{'内容一致' if identical else '内容不一致'}")
+                os.remove(output)
+        finally:
+            server.shutdown()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
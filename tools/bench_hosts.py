@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+平台限流调度基准测试
+模拟多个平台：每个平台能承受的同时请求数不同，超过时返回429，并在一段时间内拒绝该平台的所有请求（封禁）。
+用下载器实际使用的调度器执行一份混合URL列表，比较不按平台限流（被限流即失败）
+和按平台限流（并发上限 + 启动间隔 + 退避后重新排队）的完成数、429次数和总耗时
+"""
+
+import sys
+import time
+import random
+import argparse
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+class ThrottledError(Exception):
+    """模拟平台返回的 HTTP 429"""
+
+    status = 429
+
+
+class SimulatedHost:
+    """模拟平台：超过可承受的并发时返回429并封禁一段时间"""
+
+    def __init__(self, name: str, tolerance: int, ban_seconds: float):
+        self.name = name
+        self.tolerance = tolerance
+        self.ban_seconds = ban_seconds
+        self.active = 0
+        self.banned_until = 0.0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def download(self, seconds: float):
+        with self.lock:
+            now = time.monotonic()
+            if now < self.banned_until or self.active >= self.tolerance:
+                self.rejected += 1
+                self.banned_until = max(self.banned_until, now + self.ban_seconds)
+                raise ThrottledError(f"HTTP Error 429: Too Many Requests ({self.name})")
+            self.active += 1
+        try:
+            time.sleep(seconds)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def run(hosts, jobs, workers: int, limited: bool, args) -> dict:
+    """执行一次批量任务，返回统计结果"""
+    from core.scheduler import DownloadScheduler
+    from core.host_limits import HostLimiter, throttle_status
+
+    for host in hosts.values():
+        host.active = host.rejected = 0
+        host.banned_until = 0.0
+    limiter = HostLimiter(max_per_host=args.per_host, interval=args.interval,
+                          backoff_base=args.backoff, backoff_max=args.backoff * 8,
+                          throttle_retries=args.retries) if limited else None
+    scheduler = DownloadScheduler(workers, name="bench", limiter=limiter)
+    done = threading.Semaphore(0)
+    results = {'completed': 0, 'failed': 0}
+    lock = threading.Lock()
+
+    def submit(job_id, host_name, seconds, attempt=0):
+        def task():
+            try:
+                hosts[host_name].download(seconds)
+            except ThrottledError as e:
+                if limiter is not None and attempt < limiter.throttle_retries:
+                    limiter.record_throttled(host_name, throttle_status(e))
+                    submit(job_id, host_name, seconds, attempt + 1)
+                    return
+                with lock:
+                    results['failed'] += 1
+            else:
+                if limiter is not None:
+                    limiter.record_success(host_name)
+                with lock:
+                    results['completed'] += 1
+            done.release()
+        scheduler.submit(job_id, task, key=host_name if limited else None)
+
+    start = time.perf_counter()
+    for index, (host_name, seconds) in enumerate(jobs):
+        submit(f'job{index}', host_name, seconds)
+    for _ in jobs:
+        done.acquire()
+    results['elapsed'] = time.perf_counter() - start
+    results['rejected'] = sum(host.rejected for host in hosts.values())
+    scheduler.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='平台限流调度基准测试')
+    parser.add_argument('-j', '--jobs', type=int, default=8, help='并发任务数 (默认: 8)')
+    parser.add_argument('--per-host', type=int, default=2, help='每个平台的并发上限 (默认: 2)')
+    parser.add_argument('--interval', type=float, default=0.05, help='同一平台任务启动间隔，秒 (默认: 0.05)')
+    parser.add_argument('--backoff', type=float, default=0.5, help='被限流后的退避时长，秒 (默认: 0.5)')
+    parser.add_argument('--retries', type=int, default=3, help='被限流后重新排队的次数 (默认: 3)')
+    parser.add_argument('--job-seconds', type=float, default=0.3, help='单个任务的耗时，秒 (默认: 0.3)')
+    parser.add_argument('--seed', type=int, default=1, help='随机种子 (默认: 1)')
+    args = parser.parse_args()
+
+    # 平台名, 可承受的并发数, 封禁时长, 任务数
+    profile = [('bilibili', 2, 1.0, 20), ('youtube', 6, 0.5, 20), ('vimeo', 3, 1.0, 10)]
+    hosts = {name: SimulatedHost(name, tolerance, ban) for name, tolerance, ban, _ in profile}
+    random.seed(args.seed)
+    # 列表前半部分集中在同一个平台，模拟按来源整理的URL列表
+    jobs = [(name, args.job_seconds * random.uniform(0.5, 1.5))
+            for name, _, _, count in profile for _ in range(count)]
+    print(f"任务: {len(jobs)} 个（" + "，".join(f"{name} {count} 个/可承受并发 {tolerance}"
+                                          for name, tolerance, _, count in profile)
+          + f"）| 并发 {args.jobs} | 每平台上限 {args.per_host}")
+
+    for label, limited in (("不按平台限流", False), ("按平台限流  ", True)):
+        result = run(hosts, jobs, args.jobs, limited, args)
+        print(f"{'✅' if not result['failed'] else '❌'} {label}: {result['elapsed']:5.2f} 秒 | "
+              f"完成 {result['completed']}/{len(jobs)} | 失败 {result['failed']} | "
+              f"429 {result['rejected']} 次 | {result['completed'] / result['elapsed']:.1f} 个/秒")
+
+
+if __name__ == '__main__':
+    main()
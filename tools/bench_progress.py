@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进度回调基准测试
+用合成的yt-dlp进度回调（按到达时间随机抖动的小数据块）驱动下载器的 _progress_hook，
+比较每次回调都更新进度（progress_interval = 0）和按间隔采样时的单次回调耗时、
+通知调用方的次数，以及上报速度相对真实平均速度的波动
+"""
+
+import sys
+import time
+import random
+import argparse
+import statistics
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def synthetic_callbacks(total: int, chunk: int, rate: float, jitter: float, seed: int):
+    """生成 (到达时间, 已下载字节数)：平均速度为rate，每块的到达间隔随机抖动"""
+    rng = random.Random(seed)
+    now, downloaded = 0.0, 0
+    while downloaded < total:
+        downloaded = min(total, downloaded + chunk)
+        now += chunk / rate * rng.uniform(1 - jitter, 1 + jitter)
+        yield now, downloaded
+
+
+def run(downloader, callbacks, interval: float, total: int) -> dict:
+    """用合成回调驱动一次下载，返回耗时、通知次数和上报的速度"""
+    from core.downloader import DownloadProgress
+    from core.progress_sampler import ProgressSampler
+
+    download_id = f"bench_{interval}"
+    downloader.downloads[download_id] = DownloadProgress()
+    downloader.progress_sampler = ProgressSampler(interval=interval)
+    clock = [0.0]
+    original = time.monotonic
+    speeds = []
+    notified = 0
+    elapsed = 0.0
+    try:
+        # 采样器按合成的到达时间计时
+        time.monotonic = lambda: clock[0]
+        for arrival, downloaded in callbacks:
+            clock[0] = arrival
+            d = {'status': 'downloading', 'downloaded_bytes': downloaded, 'total_bytes': total,
+                 'tmpfilename': 'bench.part', 'filename': 'bench'}
+            start = time.perf_counter()
+            updated = downloader._progress_hook(download_id, d)
+            elapsed += time.perf_counter() - start
+            if updated:
+                notified += 1
+                speeds.append(downloader.downloads[download_id].speed)
+    finally:
+        time.monotonic = original
+        downloader.progress_sampler.remove(download_id)
+        downloader.downloads.pop(download_id, None)
+        downloader.progress_channel.drain()
+    return {'elapsed': elapsed, 'notified': notified, 'speeds': speeds[2:]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='进度回调基准测试')
+    parser.add_argument('--size', type=int, default=200, help='模拟下载的大小，MB (默认: 200)')
+    parser.add_argument('--rate', type=float, default=50, help='平均速度，MB/s (默认: 50)')
+    parser.add_argument('--chunk', type=int, default=16, help='每次回调的数据块大小，KB (默认: 16)')
+    parser.add_argument('--jitter', type=float, default=0.8, help='到达间隔的随机抖动比例 (默认: 0.8)')
+    parser.add_argument('--interval', type=float, default=0.5, help='采样间隔，秒 (默认: 0.5)')
+    parser.add_argument('--seed', type=int, default=1, help='随机种子 (默认: 1)')
+    args = parser.parse_args()
+
+    from core.downloader import VideoDownloader
+
+    downloader = VideoDownloader(max_concurrent=1)
+    downloader.journal.update = lambda *a, **k: None   # 不把合成任务写入任务日志
+    total = args.size * 1024 * 1024
+    rate = args.rate * 1024 * 1024
+    callbacks = list(synthetic_callbacks(total, args.chunk * 1024, rate, args.jitter, args.seed))
+    print(f"合成回调: {len(callbacks)} 次（{args.size} MB，平均 {args.rate} MB/s，"
+          f"每块 {args.chunk} KB，到达间隔抖动 ±{args.jitter:.0%}）")
+
+    for label, interval in (("每次回调都更新", 0.0), (f"每 {args.interval} 秒采样", args.interval)):
+        result = run(downloader, callbacks, interval, total)
+        speeds = result['speeds']
+        spread = statistics.pstdev(speeds) / rate if len(speeds) > 1 else 0.0
+        print(f"{label}: 单次回调 {result['elapsed'] / len(callbacks) * 1e6:6.2f} 微秒 | "
+              f"通知 {result['notified']} 次 | 速度波动 {spread:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分段下载基准测试
+启动一个支持Range、按连接限速的本地HTTP服务器，比较单连接下载和多连接分段下载的耗时，
+并校验下载结果与源文件逐字节一致。可用 --drop-rate 模拟连接中途断开，验证分段重试
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+import functools
+import http.server
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+CHUNK_SIZE = 16 * 1024
+
+
+class ThrottledRangeHandler(http.server.SimpleHTTPRequestHandler):
+    """支持Range的静态文件处理器，每个连接单独限速"""
+
+    rate_limit = 0      # 每个连接的速度上限（字节/秒），0表示不限速
+    drop_rate = 0.0     # 每个数据块后断开连接的概率
+    connections = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            return super().do_GET()
+        with ThrottledRangeHandler.lock:
+            ThrottledRangeHandler.connections += 1
+
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                data = f.read(min(CHUNK_SIZE, remaining))
+                if not data:
+                    break
+                try:
+                    self.wfile.write(data)
+                except OSError:
+                    return
+                remaining -= len(data)
+                if self.drop_rate and remaining and random.random() < self.drop_rate:
+                    self.close_connection = True
+                    return
+                if self.rate_limit:
+                    time.sleep(len(data) / self.rate_limit)
+
+
+def start_server(directory: str, rate_limit: int, drop_rate: float):
+    """在随机端口启动测试服务器"""
+    ThrottledRangeHandler.rate_limit = rate_limit
+    ThrottledRangeHandler.drop_rate = drop_rate
+    handler = functools.partial(ThrottledRangeHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def download(url: str, output: str, segments: int, retries: int) -> float:
+    """用下载器实际使用的YoutubeDL类下载一个直链，返回耗时（秒）"""
+    from core.segmented import SegmentedYoutubeDL
+
+    params = {
+        'quiet': True,
+        'noprogress': True,
+        'continuedl': False,
+        'retries': retries,
+        'segment_count': segments,
+        'segment_retries': retries,
+    }
+    info = {'id': 'bench', 'url': url, 'ext': 'mp4', 'protocol': 'http'}
+    start = time.perf_counter()
+    with SegmentedYoutubeDL(params) as ydl:
+        success, _ = ydl.dl(output, info)
+    elapsed = time.perf_counter() - start
+    if not success:
+        raise RuntimeError("下载失败")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分段下载基准测试')
+    parser.add_argument('--size-mb', type=int, default=32, help='测试文件大小，单位MB (默认: 32)')
+    parser.add_argument('--rate-kb', type=int, default=2048,
+                        help='服务器每个连接的限速，单位KB/s，0表示不限速 (默认: 2048)')
+    parser.add_argument('-s', '--segments', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='要比较的分段数 (默认: 1 2 4 8)')
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help='每个数据块后断开连接的概率，用于验证分段重试 (默认: 0)')
+    parser.add_argument('--retries', type=int, default=10, help='重试次数 (默认: 10)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_segmented_') as tmp:
+        source = os.path.join(tmp, 'source.mp4')
+        with open(source, 'wb') as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+        expected = sha256(source)
+
+        server = start_server(tmp, args.rate_kb * 1024, args.drop_rate)
+        url = f"http://127.0.0.1:{server.server_address[1]}/source.mp4"
+        print(f"测试文件: {args.size_mb} MB | 每连接限速: "
+              f"{f'{args.rate_kb} KB/s' if args.rate_kb else '无'} | 断线概率: {args.drop_rate}")
+
+        failed = False
+        baseline = None
+        try:
+            for segments in args.segments:
+                output = os.path.join(tmp, f'out_{segments}.mp4')
+                ThrottledRangeHandler.connections = 0
+                try:
+                    elapsed = download(url, output, segments, args.retries)
+                except Exception as e:
+                    print(f"❌ {segments:2d} 个连接: {e}")
+                    failed = True
+                    continue
+                identical = sha256(output) == expected
+                failed |= not identical
+                baseline = baseline or elapsed
+                speed = args.size_mb / elapsed
+                print(f"{'✅' if identical else '❌'} {segments:2d} 个连接: {elapsed:6.2f} 秒 | "
+                      f"{speed:6.1f} MB/s | 加速 {baseline / elapsed:4.1f}x | "
+                      f"请求数 {ThrottledRangeHandler.connections} | "
+                      f"{'内容一致' if identical else '内容不一致'}")
+                os.remove(output)
+        finally:
+            server.shutdown()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CLI启动耗时基准测试
+多次运行 `python cli_main.py --version` 等轻量命令，检查启动时间是否超出预算
+"""
+
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# 需要测量的命令（均不应导入yt_dlp）
+COMMANDS = {
+    'version': ['--version'],
+    'list-platforms': ['--list-platforms'],
+    'help': ['--help'],
+}
+
+
+def measure(args, runs):
+    """运行命令若干次，返回每次耗时（毫秒）"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=PROJECT_ROOT,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def check_lazy_imports():
+    """确认 --version 路径没有加载yt_dlp、requests和tkinter"""
+    code = (
+        "import sys, runpy; sys.argv = ['cli_main.py', '--version']\n"
+        "try:\n"
+        "    runpy.run_path('cli_main.py', run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "heavy = [m for m in ('yt_dlp', 'requests', 'tkinter') if m in sys.modules]\n"
+        "sys.stderr.write(','.join(heavy))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True)
+    loaded = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else ''
+    return [name for name in loaded.split(',') if name and name.isidentifier()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI启动耗时基准测试')
+    parser.add_argument('-n', '--runs', type=int, default=10, help='每个命令的运行次数 (默认: 10)')
+    parser.add_argument('--budget-ms', type=float, default=150.0,
+                        help='相对于空解释器的启动开销预算，单位毫秒 (默认: 150)')
+    args = parser.parse_args()
+
+    baseline = statistics.median(measure(['-c', 'pass'], args.runs))
+    print(f"空解释器启动: {baseline:.0f} ms (中位数)")
+
+    over_budget = False
+    for name, cli_args in COMMANDS.items():
+        timings = measure([str(PROJECT_ROOT / 'cli_main.py'), *cli_args], args.runs)
+        median = statistics.median(timings)
+        overhead = median - baseline
+        status = "✅" if overhead <= args.budget_ms else "❌"
+        over_budget |= overhead > args.budget_ms
+        print(f"{status} {name:15s} 中位数 {median:6.0f} ms | 最小 {min(timings):6.0f} ms | "
+              f"最大 {max(timings):6.0f} ms | 开销 {overhead:6.0f} ms (预算 {args.budget_ms:.0f} ms)")
+
+    heavy = check_lazy_imports()
+    if heavy:
+        print(f"❌ --version 路径加载了重量级模块: {', '.join(heavy)}")
+        over_budget = True
+    else:
+        print("✅ --version 路径未加载 yt_dlp / requests / tkinter")
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,86 +2,159 @@
 # -*- coding: utf-8 -*-
 """
 视频格式转换工具
-将AV1等新格式转换为兼容性更好的H.264格式
+将AV1等新格式转换为兼容性更好的H.264格式（能直接封装时不重新编码）
+批量模式并行探测和转换，按文件大小从大到小调度；
+探测和转换结果记录在媒体库目录的索引中，重复运行时只处理新增或修改过的文件
 """
 
 import os
 import sys
+import json
+import time
+import tempfile
+import threading
 import subprocess
 import argparse
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def convert_video_to_h264(input_path, output_path=None, quality='medium'):
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.ffmpeg_probe import get_ffmpeg_capabilities
+from core.media_probe import (COMPATIBLE_AUDIO_CODECS, ConversionPlan, MediaInfo, conversion_args,
+                              plan_conversion, probe_media)
+from core.convert_index import ConvertIndex
+from utils.formatters import format_bytes, format_duration
+
+# 需要处理的视频扩展名
+VIDEO_EXTENSIONS = {'.mp4', '.mkv', '.avi', '.mov', '.webm', '.flv'}
+
+# 质量设置
+QUALITY_CRF = {
+    'high': '18',      # 高质量
+    'medium': '23',    # 中等质量（推荐）
+    'low': '28'        # 低质量，文件更小
+}
+
+
+def default_jobs():
+    """默认并发转换数：每个libx264进程本身是多线程的，按每4个核心一个任务估算"""
+    return max(1, (os.cpu_count() or 1) // 4)
+
+
+def build_convert_command(ffmpeg_path, input_path, output_path, plan, quality='medium', threads=0):
+    """
+    生成转换命令
+
+    Args:
+        ffmpeg_path: ffmpeg路径
+        input_path: 输入文件
+        output_path: 输出文件
+        plan: 转换决策
+        quality: 质量设置 ('high', 'medium', 'low')
+        threads: libx264线程数，0表示由ffmpeg自动决定
+    """
+    video_args = [
+        '-c:v', 'libx264',           # 使用H.264编码器
+        '-preset', 'medium',         # 编码速度预设
+        '-crf', QUALITY_CRF.get(quality, QUALITY_CRF['medium']),
+        '-pix_fmt', 'yuv420p',       # 8位4:2:0，保证兼容
+        '-threads', str(threads),
+    ]
+    return [
+        ffmpeg_path,
+        '-hide_banner',
+        '-i', str(input_path),
+        *conversion_args(plan, video_args),
+        '-y',                        # 覆盖输出文件
+        str(output_path)
+    ]
+
+
+def plan_for_media(media, force=False):
+    """根据探测结果生成转换决策"""
+    plan = plan_conversion(media)
+    if force and plan.action != ConversionPlan.FULL:
+        plan = ConversionPlan(ConversionPlan.FULL, "强制完整转码",
+                              copy_audio=media is not None and media.audio_codec in COMPATIBLE_AUDIO_CODECS)
+    return plan
+
+
+def plan_for_file(ffmpeg, input_path, force=False):
+    """探测文件并返回 (探测结果, 转换决策)"""
+    media = probe_media(ffmpeg.ffprobe_path, input_path) if ffmpeg.ffprobe_available else None
+    return media, plan_for_media(media, force)
+
+
+def convert_video_to_h264(input_path, output_path=None, quality='medium', force=False):
     """
-    将视频转换为H.264格式
-    
+    将视频转换为H.264/MP4格式
+
+    先用一次ffprobe探测全部流，再选择代价最小的路径：直接封装、
+    仅转码音频或完整转码；已符合要求的文件直接跳过
+
     Args:
         input_path: 输入视频文件路径
         output_path: 输出视频文件路径（可选）
         quality: 质量设置 ('high', 'medium', 'low')
+        force: 是否强制完整转码
     """
     input_path = Path(input_path)
-    
+
     if not input_path.exists():
         print(f"错误：输入文件不存在: {input_path}")
         return False
-    
+
     # 如果没有指定输出路径，在原文件名后加_h264
     if output_path is None:
-        output_path = input_path.parent / f"{input_path.stem}_h264{input_path.suffix}"
+        output_path = input_path.parent / f"{input_path.stem}_h264.mp4"
     else:
         output_path = Path(output_path)
-    
-    # 质量设置
-    quality_settings = {
-        'high': ['-crf', '18'],      # 高质量
-        'medium': ['-crf', '23'],    # 中等质量（推荐）
-        'low': ['-crf', '28']        # 低质量，文件更小
-    }
-    
-    crf_setting = quality_settings.get(quality, quality_settings['medium'])
-    
-    # FFmpeg命令
-    cmd = [
-        'ffmpeg',
-        '-i', str(input_path),
-        '-c:v', 'libx264',           # 使用H.264编码器
-        '-preset', 'medium',         # 编码速度预设
-        *crf_setting,                # 质量设置
-        '-c:a', 'aac',               # 音频使用AAC编码
-        '-b:a', '128k',              # 音频比特率
-        '-movflags', '+faststart',   # 优化网络播放
-        '-y',                        # 覆盖输出文件
-        str(output_path)
-    ]
-    
+
+    ffmpeg = get_ffmpeg_capabilities()
+    if not ffmpeg.available:
+        print("❌ 错误：未找到ffmpeg，请确保已安装ffmpeg并添加到PATH")
+        return False
+
+    # 一次ffprobe调用决定转换路径
+    media, plan = plan_for_file(ffmpeg, input_path, force)
+    if plan.action == ConversionPlan.NONE:
+        print(f"⏭️  跳过: {input_path.name}（{plan.reason}）")
+        return True
+
+    cmd = build_convert_command(ffmpeg.ffmpeg_path, input_path, output_path, plan, quality)
+
     print(f"开始转换: {input_path.name}")
     print(f"输出文件: {output_path}")
-    print(f"质量设置: {quality}")
+    print(f"转换路径: {plan.description}（{plan.reason}）")
+    if plan.action == ConversionPlan.FULL:
+        print(f"质量设置: {quality}")
     print("转换中，请稍候...")
-    
+
     try:
         # 执行转换
-        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
-        
+        start = time.time()
+        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='replace')
+        elapsed = time.time() - start
+
         if result.returncode == 0:
-            print("✅ 转换成功！")
-            
+            print(f"✅ 转换成功！（{plan.description}，耗时 {elapsed:.1f} 秒）")
+
             # 显示文件大小对比
             original_size = input_path.stat().st_size / (1024 * 1024)
             converted_size = output_path.stat().st_size / (1024 * 1024)
-            
+
             print(f"原文件大小: {original_size:.1f} MB")
             print(f"转换后大小: {converted_size:.1f} MB")
             print(f"大小变化: {((converted_size - original_size) / original_size * 100):+.1f}%")
-            
+
             return True
         else:
             print("❌ 转换失败！")
             print("错误信息:")
             print(result.stderr)
             return False
-            
+
     except FileNotFoundError:
         print("❌ 错误：未找到ffmpeg，请确保已安装ffmpeg并添加到PATH")
         return False
@@ -89,75 +162,336 @@ def convert_video_to_h264(input_path, output_path=None, quality='medium'):
         print(f"❌ 转换过程中出错: {e}")
         return False
 
-def batch_convert_directory(directory, quality='medium'):
+
+def scan_video_files(directory):
+    """
+    单次遍历目录树，收集视频文件（跳过本工具生成的 *_h264.mp4）
+
+    Returns:
+        [(路径, 大小, 修改时间ns), ...]
+    """
+    video_files = []
+    stack = [str(directory)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    stem, ext = os.path.splitext(entry.name)
+                    if ext.lower() in VIDEO_EXTENSIONS and not stem.endswith('_h264'):
+                        stat = entry.stat()
+                        video_files.append((Path(entry.path), stat.st_size, stat.st_mtime_ns))
+        except OSError as e:
+            print(f"⚠️ 无法读取目录: {e}")
+    return video_files
+
+
+class BatchProgress:
+    """批量转换的聚合进度（按媒体时长计算，由ffmpeg -progress 输出驱动）"""
+
+    def __init__(self, total_files, total_duration):
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.total_files = total_files
+        self.total_duration = total_duration
+        self.finished_files = 0
+        self.finished_duration = 0.0
+        self.running = {}   # 文件 -> 已处理的媒体时长（秒）
+
+    def update(self, key, seconds):
+        with self.lock:
+            self.running[key] = seconds
+
+    def finish(self, key, duration):
+        with self.lock:
+            self.running.pop(key, None)
+            self.finished_files += 1
+            self.finished_duration += duration
+
+    def render(self):
+        """生成一行进度文本"""
+        with self.lock:
+            done = self.finished_duration + sum(self.running.values())
+            running = len(self.running)
+            finished = self.finished_files
+        elapsed = max(time.time() - self.start_time, 0.001)
+        percent = done / self.total_duration * 100 if self.total_duration else 0.0
+        speed = done / elapsed
+        eta = (self.total_duration - done) / speed if speed > 0 else 0
+        return (f"🎞️ [{finished}/{self.total_files}] {percent:5.1f}% | 转换中 {running} | "
+                f"速度 {speed:.1f}x | 已用 {format_duration(elapsed)} | 剩余 {format_duration(eta)}")
+
+
+def run_ffmpeg_with_progress(cmd, on_progress, processes):
+    """
+    运行ffmpeg并解析 -progress 输出
+
+    Args:
+        cmd: ffmpeg命令
+        on_progress: 回调，参数为已处理的媒体时长（秒）
+        processes: 正在运行的进程集合（用于中断时终止）
+
+    Returns:
+        (返回码, 错误输出)
+    """
+    cmd = [cmd[0], '-nostats', '-loglevel', 'error', '-progress', 'pipe:1', *cmd[1:]]
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file,
+                                   stdin=subprocess.DEVNULL, text=True, encoding='utf-8', errors='replace')
+        processes.add(process)
+        try:
+            for line in process.stdout:
+                key, _, value = line.strip().partition('=')
+                # out_time_ms 实际单位也是微秒
+                if key in ('out_time_us', 'out_time_ms') and value.isdigit():
+                    on_progress(int(value) / 1_000_000)
+            process.wait()
+        finally:
+            processes.discard(process)
+        stderr_file.seek(0)
+        return process.returncode, stderr_file.read().decode('utf-8', errors='replace')
+
+
+def _convert_one(ffmpeg, item, quality, threads, progress, processes, index=None):
+    """转换单个文件，返回报告条目"""
+    input_path = item['path']
+    output_path = input_path.parent / f"{input_path.stem}_h264.mp4"
+    cmd = build_convert_command(ffmpeg.ffmpeg_path, input_path, output_path, item['plan'],
+                                quality, threads)
+    key = str(input_path)
+    start = time.time()
+    try:
+        returncode, stderr = run_ffmpeg_with_progress(cmd, lambda seconds: progress.update(key, seconds),
+                                                      processes)
+        error = None if returncode == 0 else (stderr.strip().splitlines() or ["ffmpeg失败"])[-1]
+    except OSError as e:
+        error = str(e)
+    progress.finish(key, item['duration'])
+
+    entry = item['entry']
+    entry['elapsed'] = round(time.time() - start, 3)
+    if error:
+        entry['status'] = 'error'
+        entry['error'] = error
+        if output_path.exists():
+            output_path.unlink()
+    else:
+        entry['status'] = 'converted'
+        entry['output'] = str(output_path)
+        entry['output_size'] = output_path.stat().st_size
+    if index:
+        index.put_result(entry['file'], entry['status'], entry.get('output'), entry.get('error'),
+                         entry['elapsed'])
+    return entry
+
+
+def batch_convert_directory(directory, quality='medium', jobs=None, report_path=None, force=False,
+                            use_index=True):
     """
     批量转换目录中的视频文件
+
+    单次遍历收集文件，并行探测，再按文件大小从大到小并行转换（大文件先开始，
+    避免最后只剩一个大文件在跑），最后写出JSON汇总报告
+
+    Args:
+        directory: 目录
+        quality: 质量设置
+        jobs: 并发转换数，默认按CPU核心数计算
+        report_path: 汇总报告路径，默认为目录下的 convert_report.json
+        force: 是否强制完整转码
+        use_index: 是否使用媒体库目录下的转换索引（跳过未变化的文件）
+
+    Returns:
+        汇总报告字典
     """
     directory = Path(directory)
-    
+
     if not directory.exists():
         print(f"错误：目录不存在: {directory}")
-        return
-    
-    # 查找视频文件
-    video_extensions = {'.mp4', '.mkv', '.avi', '.mov', '.webm', '.flv'}
-    video_files = []
-    
-    for ext in video_extensions:
-        video_files.extend(directory.rglob(f"*{ext}"))
-    
+        return None
+
+    ffmpeg = get_ffmpeg_capabilities()
+    if not ffmpeg.available:
+        print("❌ 错误：未找到ffmpeg，请确保已安装ffmpeg并添加到PATH")
+        return None
+
+    jobs = jobs or default_jobs()
+    threads = max(1, (os.cpu_count() or 1) // jobs)
+    start_time = time.time()
+
+    video_files = scan_video_files(directory)
     if not video_files:
         print("未找到视频文件")
-        return
-    
-    print(f"找到 {len(video_files)} 个视频文件")
-    
-    success_count = 0
-    for video_file in video_files:
-        print(f"\n处理: {video_file.relative_to(directory)}")
-        
-        # 检查是否已经是H.264格式
+        return None
+    print(f"找到 {len(video_files)} 个视频文件，并发数 {jobs}（每个任务 {threads} 线程）")
+
+    index = ConvertIndex.for_directory(directory) if use_index else None
+    records = index.load() if index else {}
+    if index:
+        index.prune(str(path.relative_to(directory)) for path, _, _ in video_files)
+
+    entries = []
+    candidates = []
+
+    def add_file(path, size, media, plan):
+        entry = {
+            'file': str(path.relative_to(directory)),
+            'size': size,
+            'action': plan.action,
+            'reason': plan.reason,
+            'status': 'skipped' if plan.action == ConversionPlan.NONE else 'pending',
+        }
+        entries.append(entry)
+        if plan.action != ConversionPlan.NONE:
+            candidates.append({'path': path, 'plan': plan, 'entry': entry,
+                               'duration': media.duration if media else 0.0})
+
+    # 未变化的文件直接使用索引中的探测结果，已转换过的跳过
+    to_probe = []
+    index_hits = 0
+    for path, size, mtime_ns in video_files:
+        record = records.get(str(path.relative_to(directory)))
+        if not ConvertIndex.matches(record, size, mtime_ns):
+            to_probe.append((path, size, mtime_ns))
+            continue
+        index_hits += 1
+        if record['status'] == 'converted' and record['output'] and os.path.exists(record['output']):
+            entries.append({'file': record['path'], 'size': size, 'action': record['action'],
+                            'reason': '此前已转换', 'status': 'skipped', 'output': record['output']})
+            continue
+        media = MediaInfo.from_dict(str(path), record['probe']) if record['probe'] else None
+        add_file(path, size, media, plan_for_media(media, force))
+
+    # 并行探测新增或修改过的文件（ffprobe以I/O为主，使用更多线程）
+    probed = []
+    with ThreadPoolExecutor(max_workers=jobs * 4) as executor:
+        futures = {executor.submit(plan_for_file, ffmpeg, path, force): (path, size, mtime_ns)
+                   for path, size, mtime_ns in to_probe}
+        for future in as_completed(futures):
+            path, size, mtime_ns = futures[future]
+            media, plan = future.result()
+            add_file(path, size, media, plan)
+            probed.append({'path': str(path.relative_to(directory)), 'size': size, 'mtime_ns': mtime_ns,
+                           'probe': media.to_dict() if media else None,
+                           'action': plan.action, 'reason': plan.reason})
+    if index:
+        index.put_probes(probed)
+    print(f"探测完成（{format_duration(time.time() - start_time)}）：索引命中 {index_hits} 个，"
+          f"新探测 {len(probed)} 个；需要转换 {len(candidates)} 个，跳过 {len(entries) - len(candidates)} 个")
+
+    # 大文件优先
+    candidates.sort(key=lambda item: item['entry']['size'], reverse=True)
+    progress = BatchProgress(len(candidates), sum(item['duration'] for item in candidates))
+    processes = set()
+    interrupted = False
+
+    if candidates:
+        executor = ThreadPoolExecutor(max_workers=jobs)
+        futures = [executor.submit(_convert_one, ffmpeg, item, quality, threads, progress, processes, index)
+                   for item in candidates]
         try:
-            result = subprocess.run([
-                'ffprobe', '-v', 'quiet', '-select_streams', 'v:0',
-                '-show_entries', 'stream=codec_name', '-of', 'csv=p=0',
-                str(video_file)
-            ], capture_output=True, text=True)
-            
-            codec = result.stdout.strip()
-            if codec in ['h264', 'avc']:
-                print(f"⏭️  跳过（已是H.264格式）")
-                continue
-                
-        except:
-            pass  # 如果检查失败，继续转换
-        
-        if convert_video_to_h264(video_file, quality=quality):
-            success_count += 1
-    
-    print(f"\n✅ 批量转换完成！成功转换 {success_count}/{len(video_files)} 个文件")
+            pending = set(futures)
+            while pending:
+                done = {future for future in pending if future.done()}
+                pending -= done
+                sys.stdout.write("\r" + progress.render().ljust(100))
+                sys.stdout.flush()
+                if pending:
+                    time.sleep(0.5)
+        except KeyboardInterrupt:
+            interrupted = True
+            print("\n⚠️ 用户中断，正在停止转换...")
+            for future in futures:
+                future.cancel()
+            for process in list(processes):
+                process.terminate()
+        executor.shutdown(wait=True)
+        print()
+
+    # 汇总
+    counts = {}
+    for entry in entries:
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    actions = {}
+    for item in candidates:
+        action = item['entry']['action']
+        actions[action] = actions.get(action, 0) + 1
+    elapsed = time.time() - start_time
+    report = {
+        'directory': str(directory.resolve()),
+        'quality': quality,
+        'jobs': jobs,
+        'interrupted': interrupted,
+        'total_files': len(entries),
+        'index_hits': index_hits,
+        'probed': len(probed),
+        'counts': counts,
+        'actions': actions,
+        'input_bytes': sum(item['entry']['size'] for item in candidates),
+        'output_bytes': sum(entry.get('output_size', 0) for entry in entries),
+        'media_seconds': round(progress.total_duration, 3),
+        'encode_seconds': round(sum(entry.get('elapsed', 0) for entry in entries), 3),
+        'wall_seconds': round(elapsed, 3),
+        'files': sorted(entries, key=lambda entry: entry['file']),
+    }
+
+    if index:
+        index.close()
+
+    report_path = Path(report_path) if report_path else directory / 'convert_report.json'
+    try:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        print(f"⚠️ 写入汇总报告失败: {e}")
+        report_path = None
+
+    print(f"✅ 批量转换完成！成功 {counts.get('converted', 0)}，跳过 {counts.get('skipped', 0)}，"
+          f"失败 {counts.get('error', 0)}，总耗时 {format_duration(elapsed)}")
+    print(f"   数据量: {format_bytes(report['input_bytes'])} -> {format_bytes(report['output_bytes'])}")
+    for entry in entries:
+        if entry['status'] == 'error':
+            print(f"   ❌ {entry['file']}: {entry['error']}")
+    if report_path:
+        print(f"📄 汇总报告: {report_path}")
+    return report
+
 
 def main():
     parser = argparse.ArgumentParser(description='视频格式转换工具')
     parser.add_argument('input', help='输入视频文件或目录路径')
     parser.add_argument('-o', '--output', help='输出文件路径（仅单文件转换时有效）')
-    parser.add_argument('-q', '--quality', choices=['high', 'medium', 'low'], 
+    parser.add_argument('-q', '--quality', choices=['high', 'medium', 'low'],
                        default='medium', help='转换质量 (默认: medium)')
-    parser.add_argument('-b', '--batch', action='store_true', 
+    parser.add_argument('-b', '--batch', action='store_true',
                        help='批量转换目录中的所有视频文件')
-    
+    parser.add_argument('-f', '--force', action='store_true',
+                       help='强制完整转码（默认能直接封装或只转码音频时不重新编码视频）')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N',
+                       help=f'批量模式的并发转换数 (默认: {default_jobs()}，按CPU核心数计算)')
+    parser.add_argument('--no-index', action='store_true',
+                       help='批量模式不使用转换索引，重新探测所有文件')
+    parser.add_argument('--report', metavar='FILE',
+                       help='批量模式的JSON汇总报告路径 (默认: <目录>/convert_report.json)')
+
     args = parser.parse_args()
-    
+
     input_path = Path(args.input)
-    
+
     if not input_path.exists():
         print(f"错误：路径不存在: {input_path}")
         sys.exit(1)
-    
+
     if args.batch or input_path.is_dir():
-        batch_convert_directory(input_path, args.quality)
+        report = batch_convert_directory(input_path, args.quality, args.jobs, args.report, args.force,
+                                         not args.no_index)
+        if report is None or report['counts'].get('error') or report['interrupted']:
+            sys.exit(1)
     else:
-        convert_video_to_h264(input_path, args.output, args.quality)
+        if not convert_video_to_h264(input_path, args.output, args.quality, args.force):
+            sys.exit(1)
 
 if __name__ == '__main__':
     main()
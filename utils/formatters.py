@@ -0,0 +1,33 @@
+"""
+格式化工具模块
+将字节数、速度、时长等数值格式化为可读文本（仅在显示时调用）
+"""
+
+
+def format_bytes(bytes_value) -> str:
+    """格式化字节数为可读格式"""
+    bytes_value = float(bytes_value or 0)
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if bytes_value < 1024.0:
+            return f"{bytes_value:.1f} {unit}"
+        bytes_value /= 1024.0
+    return f"{bytes_value:.1f} TB"
+
+
+def format_speed(bytes_per_second) -> str:
+    """格式化下载速度"""
+    if not bytes_per_second:
+        return ""
+    return f"{format_bytes(bytes_per_second)}/s"
+
+
+def format_duration(seconds) -> str:
+    """格式化时长为 HH:MM:SS 或 MM:SS"""
+    if seconds is None or seconds < 0:
+        return ""
+    total_seconds = int(seconds)
+    hours, remainder = divmod(total_seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
@@ -3,7 +3,7 @@ URL验证工具模块
 验证各种视频平台的URL格式
 """
 import re
-from urllib.parse import urlparse
+from urllib.parse import urlparse, parse_qs
 
 
 class URLValidator:
@@ -41,6 +41,27 @@ class URLValidator:
         ]
     }
     
+    # 从URL中直接提取视频ID的模式（无需网络请求）
+    VIDEO_ID_PATTERNS = {
+        'youtube': [
+            r'(?:https?://)?(?:www\.|m\.)?youtube\.com/watch\?(?:.*&)?v=(?P<id>[\w-]{11})',
+            r'(?:https?://)?(?:www\.)?youtu\.be/(?P<id>[\w-]{11})',
+            r'(?:https?://)?(?:www\.|m\.)?youtube\.com/shorts/(?P<id>[\w-]{11})',
+        ],
+        'twitter': [
+            r'(?:https?://)?(?:www\.|mobile\.)?(?:twitter|x)\.com/(?:\w+|i/web)/status/(?P<id>\d+)',
+        ],
+        'instagram': [
+            r'(?:https?://)?(?:www\.)?instagram\.com/(?:p|reel|tv)/(?P<id>[\w-]+)',
+        ],
+        'tiktok': [
+            r'(?:https?://)?(?:www\.)?tiktok\.com/@[\w.-]+/video/(?P<id>\d+)',
+        ],
+        'bilibili': [
+            r'(?:https?://)?(?:www\.|m\.)?bilibili\.com/video/(?P<id>BV[\w]+|av\d+)',
+        ],
+    }
+
     @classmethod
     def is_valid_url(cls, url):
         """检查URL是否有效"""
@@ -88,6 +109,31 @@ class URLValidator:
         
         return url
     
+    @classmethod
+    def extract_video_id(cls, url):
+        """
+        从URL中提取 (平台, 视频ID)，不发起网络请求
+
+        Returns:
+            (platform, video_id) 元组，无法识别时返回None
+        """
+        if not url:
+            return None
+
+        url = url.strip()
+        for platform, patterns in cls.VIDEO_ID_PATTERNS.items():
+            for pattern in patterns:
+                match = re.match(pattern, url, re.IGNORECASE)
+                if match:
+                    video_id = match.group('id')
+                    # B站多P视频用p参数区分
+                    if platform == 'bilibili':
+                        page = parse_qs(urlparse(cls.normalize_url(url)).query).get('p')
+                        if page and page[0] not in ('', '1'):
+                            video_id = f"{video_id}_p{page[0]}"
+                    return platform, video_id
+        return None
+
     @classmethod
     def get_supported_platforms(cls):
         """获取支持的平台列表"""